@@ -1,17 +1,53 @@
 """
 Analytics module for TikTok data analysis
 """
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from textblob import TextBlob
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from collections import Counter
-import re
+
+try:
+    from .sentiment_cache import SentimentCache
+    from .word_index import count_words
+    from .metrics import stage
+except ImportError:
+    from sentiment_cache import SentimentCache
+    from word_index import count_words
+    from metrics import stage
+
+
+# Bump whenever the sentiment/engagement scoring logic changes so stored rows
+# with an older version can be picked up by the backfill job.
+SCORER_VERSION = 1
+
+# Field names of the per-text results returned by analyze_sentiment_*
+RESULT_FIELDS = {
+    'vader': ('compound', 'sentiment'),
+    'textblob': ('polarity', 'subjectivity', 'sentiment'),
+}
+
+# Below this many uncached texts, process pool startup costs more than it saves
+PARALLEL_MIN_TEXTS = 20_000
+PARALLEL_CHUNK_SIZE = 2_000
+
+# Most recent buckets returned per timeline by build_aggregates
+TIMELINE_MAX_POINTS = {'hourly': 48, 'daily': 60, 'weekly': 52}
 
 
 class TikTokAnalyzer:
-    def __init__(self):
-        """Initialize analyzer with sentiment tools"""
+    def __init__(self, cache=None, use_cache=True):
+        """
+        Initialize analyzer with sentiment tools
+        
+        Args:
+            cache: SentimentCache to use; a default one is created if None
+            use_cache: Set False to always score texts from scratch
+        """
         self.vader = SentimentIntensityAnalyzer()
+        self.cache = (cache or SentimentCache()) if use_cache else None
     
     def calculate_engagement_rate(self, df):
         """
@@ -44,8 +80,21 @@ class TikTokAnalyzer:
         Returns:
             Dictionary with polarity and subjectivity
         """
+        return dict(zip(RESULT_FIELDS['textblob'], self._textblob_tuple(text)))
+    
+    def analyze_sentiment_vader(self, text):
+        """
+        Analyze sentiment using VADER
+        
+        Returns:
+            Dictionary with compound score and sentiment label
+        """
+        return dict(zip(RESULT_FIELDS['vader'], self._vader_tuple(text)))
+    
+    def _textblob_tuple(self, text):
+        """TextBlob (polarity, subjectivity, sentiment) without building a dict"""
         if not text or pd.isna(text):
-            return {'polarity': 0, 'subjectivity': 0, 'sentiment': 'neutral'}
+            return (0, 0, 'neutral')
         
         try:
             blob = TextBlob(str(text))
@@ -58,27 +107,17 @@ class TikTokAnalyzer:
             else:
                 sentiment = 'neutral'
             
-            return {
-                'polarity': round(polarity, 3),
-                'subjectivity': round(blob.sentiment.subjectivity, 3),
-                'sentiment': sentiment
-            }
+            return (round(polarity, 3), round(blob.sentiment.subjectivity, 3), sentiment)
         except:
-            return {'polarity': 0, 'subjectivity': 0, 'sentiment': 'neutral'}
+            return (0, 0, 'neutral')
     
-    def analyze_sentiment_vader(self, text):
-        """
-        Analyze sentiment using VADER
-        
-        Returns:
-            Dictionary with compound score and sentiment label
-        """
+    def _vader_tuple(self, text):
+        """VADER (compound, sentiment) without building a dict"""
         if not text or pd.isna(text):
-            return {'compound': 0, 'sentiment': 'neutral'}
+            return (0, 'neutral')
         
         try:
-            scores = self.vader.polarity_scores(str(text))
-            compound = scores['compound']
+            compound = self.vader.polarity_scores(str(text))['compound']
             
             if compound >= 0.05:
                 sentiment = 'positive'
@@ -87,21 +126,24 @@ class TikTokAnalyzer:
             else:
                 sentiment = 'neutral'
             
-            return {
-                'compound': round(compound, 3),
-                'sentiment': sentiment
-            }
+            return (round(compound, 3), sentiment)
         except:
-            return {'compound': 0, 'sentiment': 'neutral'}
+            return (0, 'neutral')
     
-    def add_sentiment_analysis(self, df, method='vader', text_column='caption'):
+    def add_sentiment_analysis(self, df, method='vader', text_column='caption', workers=None):
         """
         Add sentiment analysis to DataFrame
         
+        Each distinct text is scored once. Texts missing from the sentiment cache are
+        scored serially, or across a process pool when workers > 1 and there are at least
+        PARALLEL_MIN_TEXTS of them, and the score/label columns are built as arrays.
+        
         Args:
             df: DataFrame with text column
             method: 'vader' or 'textblob'
             text_column: Name of column containing text to analyze
+            workers: Process pool size (default SENTIMENT_WORKERS env, else 1: serial, as the
+                API process should be); batch and benchmark runs may pass more
             
         Returns:
             DataFrame with sentiment columns added
@@ -110,17 +152,101 @@ class TikTokAnalyzer:
             return df
         
         df = df.copy()
+        if method != 'vader':
+            method = 'textblob'
+        
+        codes, uniques = pd.factorize(df[text_column], use_na_sentinel=True)
+        results = [None] * len(uniques)
+        keys = [None] * len(uniques)
+        missing = []
+        
+        for i, text in enumerate(uniques):
+            if self.cache is not None and text and not pd.isna(text):
+                keys[i] = self.cache.make_key(method, SCORER_VERSION, text)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    results[i] = tuple(cached[f] for f in RESULT_FIELDS[method])
+                    continue
+            missing.append(i)
+        
+        with stage(f"sentiment_{method}", rows=len(missing)):
+            scored = self._score_texts([uniques[i] for i in missing], method, workers)
+        for i, result in zip(missing, scored):
+            results[i] = result
+            if keys[i] is not None:
+                self.cache.put(keys[i], dict(zip(RESULT_FIELDS[method], result)))
+        
+        if self.cache is not None:
+            self.cache.flush()
+        
+        # NaN texts get code -1 and map to the neutral default in the last slot
+        neutral = self._vader_tuple(None) if method == 'vader' else self._textblob_tuple(None)
+        score_lookup = np.array([r[0] for r in results] + [neutral[0]], dtype=float)
+        label_lookup = np.array([r[-1] for r in results] + [neutral[-1]], dtype=object)
+        
+        df['sentiment_score'] = score_lookup[codes]
+        df['sentiment'] = label_lookup[codes]
+        
+        return df
+    
+    def _score_texts(self, texts, method, workers=None):
+        """Score texts as tuples, fanning out to a process pool for large batches"""
+        if workers is None:
+            workers = int(os.environ.get("SENTIMENT_WORKERS") or 1)
+        
+        if workers > 1 and len(texts) >= PARALLEL_MIN_TEXTS:
+            chunk_size = max(PARALLEL_CHUNK_SIZE, -(-len(texts) // (workers * 4)))
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            try:
+                # Spawn, not fork: callers run in threads of a process holding HTTP, SQLite
+                # and DuckDB state that a forked child must not inherit
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         mp_context=multiprocessing.get_context("spawn")) as pool:
+                    scored = []
+                    for part in pool.map(_score_chunk, [method] * len(chunks), chunks):
+                        scored.extend(part)
+                    return scored
+            except Exception as e:
+                print(f"[WARN] Parallel sentiment scoring failed, falling back to serial: {e}")
+        
+        scorer = self._vader_tuple if method == 'vader' else self._textblob_tuple
+        return [scorer(text) for text in texts]
+    
+    def score_videos(self, df, method='vader'):
+        """
+        Add engagement rate, sentiment and scorer version to videos before storage
+        
+        Args:
+            df: DataFrame with scraped videos
+            method: 'vader' or 'textblob'
+            
+        Returns:
+            DataFrame with engagement_rate, sentiment, sentiment_score and scorer_version
+        """
+        if df.empty:
+            return df
+        
+        df = self.calculate_engagement_rate(df)
+        df = self.add_sentiment_analysis(df, method=method, text_column='caption')
+        df['scorer_version'] = SCORER_VERSION
+        return df
+    
+    def score_comments(self, df, method='vader'):
+        """
+        Add sentiment and scorer version to comments before storage
         
-        if method == 'vader':
-            sentiments = df[text_column].apply(self.analyze_sentiment_vader)
-            df['sentiment_score'] = sentiments.apply(lambda x: x['compound'])
-            df['sentiment_score'] = sentiments.apply(lambda x: x['compound'])
-            df['sentiment'] = sentiments.apply(lambda x: x['sentiment'])
-        else:
-            sentiments = df[text_column].apply(self.analyze_sentiment_textblob)
-            df['sentiment_score'] = sentiments.apply(lambda x: x['polarity'])
-            df['sentiment'] = sentiments.apply(lambda x: x['sentiment'])
+        Args:
+            df: DataFrame with scraped comments
+            method: 'vader' or 'textblob'
+            
+        Returns:
+            DataFrame with sentiment, sentiment_score and scorer_version
+        """
+        if df.empty:
+            return df
         
+        df = self.add_sentiment_analysis(df, method=method, text_column='text')
+        df['scorer_version'] = SCORER_VERSION
         return df
     
     def extract_word_frequency(self, df, top_n=20):
@@ -137,34 +263,9 @@ class TikTokAnalyzer:
         if df.empty or 'caption' not in df.columns:
             return []
         
-        # Combine all captions
-        all_text = ' '.join(df['caption'].dropna().astype(str))
-        
-        # Remove hashtags, mentions, URLs, and special characters
-        all_text = re.sub(r'#\w+', '', all_text)
-        all_text = re.sub(r'@\w+', '', all_text)
-        all_text = re.sub(r'http\S+', '', all_text)
-        all_text = re.sub(r'[^\w\s]', '', all_text)
-        
-        # Convert to lowercase and split
-        words = all_text.lower().split()
-        
-        # Remove common stop words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
-            'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-            'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that',
-            'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'my',
-            'your', 'his', 'her', 'its', 'our', 'their'
-        }
-        
-        words = [w for w in words if w not in stop_words and len(w) > 2]
-        
-        # Count frequency
-        word_counts = Counter(words)
-        
-        return word_counts.most_common(top_n)
+        # Hashtags, mentions, URLs, punctuation and stop words are dropped (see word_index.count_words);
+        # for date ranges over stored data, WordIndex.top merges per-day counts instead
+        return count_words(df['caption'].dropna().astype(str)).most_common(top_n)
     
     def aggregate_by_time(self, df, freq='D'):
         """
@@ -223,6 +324,81 @@ class TikTokAnalyzer:
         
         return df.nlargest(top_n, metric)
     
+    def build_aggregates(self, df, top_n=10, timelines=('hourly', 'daily', 'weekly'), max_points=None):
+        """
+        Dashboard aggregates computed in one vectorized pass
+        
+        Args:
+            df: DataFrame of videos
+            top_n: Number of top posts and authors to return
+            timelines: Which of 'hourly', 'daily' and 'weekly' to compute
+            max_points: Most recent buckets kept per timeline, so the payload stays small
+                for any corpus (see TIMELINE_MAX_POINTS)
+            
+        Returns:
+            Dictionary with kpis, sentiment, timelines (hourly/daily/weekly), top_posts and top_authors
+        """
+        metrics = ['views', 'likes', 'comments', 'shares', 'saves']
+        if df.empty:
+            return {
+                'kpis': {'videos': 0, **{m: 0 for m in metrics}, 'avg_engagement_rate': 0.0},
+                'sentiment': self.get_sentiment_distribution(df),
+                'timelines': {name: [] for name in timelines},
+                'top_posts': [],
+                'top_authors': []
+            }
+        
+        df = df.copy()
+        for col in metrics:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64') if col in df.columns else 0
+        if 'engagement_rate' not in df.columns:
+            df = self.calculate_engagement_rate(df)
+        df['engagement_rate'] = pd.to_numeric(df['engagement_rate'], errors='coerce')
+        
+        avg_engagement = df['engagement_rate'].mean()
+        kpis = {'videos': int(len(df)), **{m: int(df[m].sum()) for m in metrics}}
+        kpis['avg_engagement_rate'] = round(float(avg_engagement), 2) if pd.notna(avg_engagement) else 0.0
+        
+        max_points = {**TIMELINE_MAX_POINTS, **(max_points or {})}
+        series = {}
+        for name, freq, fmt in (('hourly', 'h', '%Y-%m-%d %H:00'), ('daily', 'D', '%Y-%m-%d'), ('weekly', 'W', '%Y-%m-%d')):
+            if name not in timelines:
+                continue
+            agg = self.aggregate_by_time(df, freq=freq)
+            if agg.empty:
+                series[name] = []
+                continue
+            agg = agg.tail(max_points[name])
+            agg = agg.astype({c: 'int64' for c in agg.columns if c != 'publish_date'})
+            agg.insert(0, 'date', agg.pop('publish_date').dt.strftime(fmt))
+            series[name] = agg.to_dict(orient='records')
+        
+        post_columns = [c for c in ('video_id', 'video_url', 'caption', 'author', 'publish_date', *metrics,
+                                    'engagement_rate', 'sentiment') if c in df.columns]
+        top_posts = df.nlargest(top_n, 'views')[post_columns].copy()
+        if 'caption' in top_posts.columns:
+            top_posts['caption'] = top_posts['caption'].fillna('').astype(str).str.slice(0, 140)
+        if 'publish_date' in top_posts.columns:
+            top_posts['publish_date'] = pd.to_datetime(top_posts['publish_date'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+        top_posts['engagement_rate'] = top_posts['engagement_rate'].round(2)
+        
+        top_authors = pd.DataFrame()
+        if 'author' in df.columns:
+            top_authors = df.groupby('author').agg(
+                video_count=('video_id', 'count'),
+                views=('views', 'sum'),
+                likes=('likes', 'sum'),
+                avg_engagement_rate=('engagement_rate', 'mean')
+            ).round(2).sort_values('views', ascending=False).head(top_n).reset_index()
+        
+        return {
+            'kpis': kpis,
+            'sentiment': {k: int(v) for k, v in self.get_sentiment_distribution(df).items()},
+            'timelines': series,
+            'top_posts': top_posts.astype(object).where(top_posts.notna(), None).to_dict(orient='records'),
+            'top_authors': top_authors.astype(object).where(top_authors.notna(), None).to_dict(orient='records')
+        }
+    
     def get_sentiment_distribution(self, df):
         """
         Get distribution of sentiment categories
@@ -241,3 +417,17 @@ class TikTokAnalyzer:
             'neutral': sentiment_counts.get('neutral', 0),
             'negative': sentiment_counts.get('negative', 0)
         }
+
+
+# Process pool workers load the VADER lexicon once, in the initializer
+_worker_analyzer = None
+
+
+def _init_worker():
+    global _worker_analyzer
+    _worker_analyzer = TikTokAnalyzer(use_cache=False)
+
+
+def _score_chunk(method, texts):
+    scorer = _worker_analyzer._vader_tuple if method == 'vader' else _worker_analyzer._textblob_tuple
+    return [scorer(text) for text in texts]
@@ -1,109 +1,441 @@
 import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+from postgrest.types import ReturnMethod
 from datetime import datetime
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from .storage import (
+        Storage, SCORE_COLUMNS, PAGE_KEYS, CONTENT_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+        encode_cursor, decode_cursor, content_hash, until_bound, StorageError,
+    )
+    from .metrics import observe_stage
+except ImportError:
+    from storage import (
+        Storage, SCORE_COLUMNS, PAGE_KEYS, CONTENT_FIELDS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+        encode_cursor, decode_cursor, content_hash, until_bound, StorageError,
+    )
+    from metrics import observe_stage
+
+# Bulk upserts are split into chunks sent by a bounded thread pool, each retried with backoff
+UPSERT_BATCH_SIZE = int(os.environ.get("SUPABASE_UPSERT_BATCH_SIZE", 500))
+UPSERT_CONCURRENCY = int(os.environ.get("SUPABASE_UPSERT_CONCURRENCY", 4))
+UPSERT_RETRIES = int(os.environ.get("SUPABASE_UPSERT_RETRIES", 3))
+UPSERT_BACKOFF = 0.5
+# Ids per lookup when fetching stored content hashes (keeps the in.() filter URL short)
+HASH_LOOKUP_SIZE = 200
+
+# HTTP connection pool shared by every request for the app's lifetime
+POOL_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_MAX_CONNECTIONS", 20))
+POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", 10))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30))
+POOL_TIMEOUT = float(os.environ.get("SUPABASE_POOL_TIMEOUT", 120))
+# Seconds a liveness probe result is reused by /api/health
+PROBE_TTL = float(os.environ.get("SUPABASE_PROBE_TTL", 30))
+
+
+def _quote(value: str) -> str:
+    """Quote a value for use inside a PostgREST or=() filter"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+class SupabasePool:
+    """
+    One Supabase client and HTTP connection pool for the life of the app.
+
+    The client is built on first use (or at startup by the API lifespan) and its
+    keep-alive connections are reused by every SupabaseManager handed out.
+    """
 
-class SupabaseManager:
     def __init__(self, url: str = None, key: str = None):
+        self.url = url or os.environ.get("SUPABASE_URL")
+        self.key = key or os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("SUPABASE_KEY")
+        self.limits = httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        )
+        self._client: Optional[Client] = None
+        self._http: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "in_flight": 0, "errors": 0, "clients_created": 0}
+        self._probe: Optional[Dict[str, Any]] = None
+        self._probe_lock = threading.Lock()
+
+    def _on_request(self, request):
+        request.extensions["pulse_started"] = time.perf_counter()
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+
+    def _on_response(self, response):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            if response.status_code >= 500:
+                self._stats["errors"] += 1
+        # Time to response headers and bytes sent, per request through the pool
+        request = response.request
+        started = request.extensions.get("pulse_started")
+        if started is not None:
+            observe_stage(
+                "supabase_http", time.perf_counter() - started,
+                bytes=int(request.headers.get("content-length") or 0),
+                error=response.status_code >= 400,
+            )
+
+    def client(self) -> Optional[Client]:
+        """The shared client, created on first use; None without credentials"""
+        if self._client is not None or not self.url or not self.key:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                self._http = httpx.Client(
+                    limits=self.limits,
+                    timeout=POOL_TIMEOUT,
+                    event_hooks={"request": [self._on_request], "response": [self._on_response]},
+                )
+                options = SyncClientOptions(httpx_client=self._http, postgrest_client_timeout=POOL_TIMEOUT)
+                self._client = create_client(self.url, self.key, options=options)
+                self._stats["clients_created"] += 1
+            return self._client
+
+    def close(self):
+        """Close pooled connections; the next client() call starts a new pool"""
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._client = self._http = None
+            self._probe = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters, pool limits and open/idle connections"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = self._client is not None
+        stats["max_connections"] = self.limits.max_connections
+        stats["max_keepalive_connections"] = self.limits.max_keepalive_connections
+        stats["keepalive_expiry"] = self.limits.keepalive_expiry
+        # httpx keeps its pool private; report connection counts when the transport exposes them
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        stats["connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+        return stats
+
+    def probe(self, max_age: float = PROBE_TTL) -> Dict[str, Any]:
+        """
+        Liveness of the database through the shared pool, cached for max_age seconds
+
+        Returns:
+            Dictionary with ok, latency_ms, checked_at, age_seconds and error
+        """
+        with self._probe_lock:
+            now = time.monotonic()
+            if self._probe is None or now - self._probe["_at"] > max_age:
+                client = self.client()
+                started = time.perf_counter()
+                error = None
+                if client is None:
+                    error = "Supabase credentials missing"
+                else:
+                    try:
+                        client.table("videos").select("video_id").limit(1).execute()
+                    except Exception as e:
+                        error = str(e)
+                self._probe = {
+                    "ok": error is None,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "checked_at": datetime.now().isoformat(),
+                    "error": error,
+                    "_at": time.monotonic(),
+                }
+            probe = {k: v for k, v in self._probe.items() if k != "_at"}
+            probe["age_seconds"] = round(time.monotonic() - self._probe["_at"], 1)
+            return probe
+
+
+_pool: Optional[SupabasePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SupabasePool:
+    """The process-wide SupabasePool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SupabasePool()
+        return _pool
+
+
+def close_pool():
+    """Close the process-wide pool (API shutdown)"""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+
+
+class SupabaseManager(Storage):
+    name = "supabase"
+
+    def __init__(self, url: str = None, key: str = None, pool: Optional[SupabasePool] = None):
         """
         Initialize Supabase connection
+
+        Args:
+            url / key: Credentials for a dedicated pool; the shared pool (get_pool) otherwise
+            pool: Pool to draw the client from
         """
-        self.url = url or os.environ.get("SUPABASE_URL")
-        self.key = key or os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("SUPABASE_KEY")
+        # Per-chunk results of the most recent save_videos/save_comments call
+        self.last_upsert_report: List[Dict[str, Any]] = []
+        self.pool = pool or (SupabasePool(url, key) if url or key else get_pool())
+        self.url, self.key = self.pool.url, self.pool.key
         
         if not self.url or not self.key:
             print("[WARN] Supabase credentials missing. Database operations will fail.")
-            self.client = None
-        else:
-            self.client = create_client(self.url, self.key)
+        self.client = self.pool.client()
 
     def is_connected(self) -> bool:
         return self.client is not None
 
-    def save_videos(self, videos: List[Dict[str, Any]]):
-        """
-        Save videos to Supabase with deduplication (upsert)
+    def health(self) -> Dict[str, Any]:
+        return {"pool": self.pool.stats(), "probe": self.pool.probe()}
+
+    def _stored_hashes(self, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        id_col = PAGE_KEYS[table][1]
+        stored = {}
+        for i in range(0, len(ids), HASH_LOOKUP_SIZE):
+            result = (
+                self.client.table(table)
+                .select(f"{id_col},content_hash")
+                .in_(id_col, ids[i:i + HASH_LOOKUP_SIZE])
+                .execute()
+            )
+            stored.update((r[id_col], r.get("content_hash")) for r in result.data or [])
+        return stored
+
+    def get_watermarks(self, scrape_type: str, targets: List[str]) -> Dict[str, datetime]:
         """
-        if not self.client or not videos:
-            return 0
+        Newest publish_date stored per target of a scrape type
         
-        # Prepare data for Supabase
-        # We ensure numeric fields are integers and dates are handled
-        formatted_videos = []
-        for v in videos:
-            formatted = {
-                "video_id": str(v.get("video_id", "")),
-                "video_url": v.get("video_url", ""),
-                "caption": v.get("caption", ""),
-                "author": v.get("author", ""),
-                "likes": int(v.get("likes", 0)),
-                "comments": int(v.get("comments", 0)),
-                "shares": int(v.get("shares", 0)),
-                "saves": int(v.get("saves", 0)),
-                "views": int(v.get("views", 0)),
-                "publish_date": v.get("publish_date"),
-                "hashtags": v.get("hashtags", ""),
-                "mentions": v.get("mentions", ""),
-                "thumbnail_url": v.get("thumbnail_url", ""),
+        Returns:
+            {target: datetime} for the targets that have a watermark
+        """
+        if not self.client or not targets:
+            return {}
+        try:
+            result = (
+                self.client.table("scrape_watermarks")
+                .select("target,newest_publish_date")
+                .eq("scrape_type", scrape_type)
+                .in_("target", list(targets))
+                .execute()
+            )
+            return {
+                r["target"]: datetime.fromisoformat(str(r["newest_publish_date"]).replace("Z", "+00:00")).replace(tzinfo=None)
+                for r in result.data or [] if r.get("newest_publish_date")
             }
-            formatted_videos.append(formatted)
+        except Exception as e:
+            print(f"[ERROR] Supabase get_watermarks error: {e}")
+            return {}
 
+    def get_ingest_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Ingest checkpoint of an Apify run
+        
+        Returns:
+            The ingest_runs row, or None if the run was never ingested (or the lookup failed)
+        """
+        if not self.client:
+            return None
         try:
-            # upsert will update if video_id exists, or insert if it doesn't
-            # This relies on video_id being the Primary Key in Supabase
-            result = self.client.table("videos").upsert(formatted_videos, on_conflict="video_id").execute()
-            return len(result.data) if hasattr(result, 'data') else len(formatted_videos)
+            result = self.client.table("ingest_runs").select("*").eq("run_id", str(run_id)).limit(1).execute()
+            return result.data[0] if result.data else None
         except Exception as e:
-            print(f"[ERROR] Supabase save_videos error: {e}")
-            return 0
+            print(f"[ERROR] Supabase get_ingest_run error: {e}")
+            return None
 
-    def save_comments(self, comments: List[Dict[str, Any]]):
+    def upsert_chunked(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        on_conflict: str,
+        batch_size: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        retries: Optional[int] = None,
+    ) -> int:
         """
-        Save comments to Supabase with deduplication
+        Upsert rows in chunks, several chunks in flight at once, retrying each with backoff
+        
+        Rows sharing a conflict key are collapsed (last one wins) first, since Postgres
+        rejects an upsert that touches the same row twice.
+        
+        Args:
+            table: Table name
+            rows: Formatted rows
+            on_conflict: Primary key column(s), comma-separated
+            batch_size: Rows per request (default SUPABASE_UPSERT_BATCH_SIZE)
+            max_workers: Concurrent requests (default SUPABASE_UPSERT_CONCURRENCY)
+            retries: Retries per chunk after the first attempt (default SUPABASE_UPSERT_RETRIES)
+            
+        Returns:
+            Number of rows saved; per-chunk results are kept in last_upsert_report
         """
-        if not self.client or not comments:
+        self.last_upsert_report = []
+        if not self.client or not rows:
             return 0
         
-        formatted_comments = []
-        for c in comments:
-            formatted = {
-                "comment_id": str(c.get("comment_id", "")),
-                "video_id": str(c.get("video_id", "")),
-                "author": c.get("author", ""),
-                "text": c.get("text", ""),
-                "likes": int(c.get("likes", 0)),
-                "date": c.get("date"),
+        batch_size = max(1, batch_size or UPSERT_BATCH_SIZE)
+        max_workers = max(1, max_workers or UPSERT_CONCURRENCY)
+        retries = UPSERT_RETRIES if retries is None else retries
+        
+        key_columns = [c.strip() for c in on_conflict.split(",")]
+        rows = list({tuple(row[c] for c in key_columns): row for row in rows}.values())
+        chunks = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        
+        def send(index_chunk):
+            index, chunk = index_chunk
+            started = time.perf_counter()
+            error = None
+            for attempt in range(1, retries + 2):
+                try:
+                    self.client.table(table).upsert(
+                        chunk, on_conflict=on_conflict, returning=ReturnMethod.minimal
+                    ).execute()
+                    error = None
+                    break
+                except Exception as e:
+                    error = str(e)
+                    if attempt <= retries:
+                        time.sleep(UPSERT_BACKOFF * 2 ** (attempt - 1) + random.uniform(0, UPSERT_BACKOFF))
+            return {
+                "chunk": index,
+                "rows": len(chunk),
+                "saved": 0 if error else len(chunk),
+                "attempts": attempt,
+                "seconds": round(time.perf_counter() - started, 3),
+                "error": error,
             }
-            formatted_comments.append(formatted)
+        
+        if len(chunks) == 1 or max_workers == 1:
+            report = [send(item) for item in enumerate(chunks)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+                report = list(pool.map(send, enumerate(chunks)))
+        
+        self.last_upsert_report = report
+        failed = [r for r in report if r["error"]]
+        for r in failed:
+            print(f"[ERROR] Supabase upsert {table} chunk {r['chunk']} ({r['rows']} rows) failed after {r['attempts']} attempts: {r['error']}")
+        saved = sum(r["saved"] for r in report)
+        if len(chunks) > 1:
+            print(f"[INFO] Upserted {saved}/{len(rows)} {table} rows in {len(chunks)} chunks ({len(failed)} failed)")
+        return saved
 
-        try:
-            result = self.client.table("comments").upsert(formatted_comments, on_conflict="comment_id").execute()
-            return len(result.data) if hasattr(result, 'data') else len(formatted_comments)
-        except Exception as e:
-            print(f"[ERROR] Supabase save_comments error: {e}")
-            return 0
+    def get_page(
+        self,
+        table: str,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        author: Optional[str] = None,
+        hashtag: Optional[str] = None,
+        video_ids: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """
+        Fetch one page of a table, newest first, with filters pushed down to the database
+        
+        Args:
+            table: 'videos' or 'comments'
+            cursor: Cursor returned with the previous page, None for the first page
+            limit: Page size (capped at MAX_PAGE_SIZE)
+            since / until: Inclusive bounds on the date column (a date-only until covers that whole day)
+            author: Exact author name
+            hashtag: Hashtag (videos only), matched as a whole entry of the hashtags list
+            video_ids: Restrict comments to these videos
+            columns: Columns to select (the keyset columns are always included); all if None
+            
+        Returns:
+            (DataFrame, next_cursor) where next_cursor is None on the last page
 
-    def get_all_videos(self) -> pd.DataFrame:
-        """Fetch all videos from Supabase"""
+        Raises:
+            StorageError: The request failed (a transient error is not an empty last page)
+        """
         if not self.client:
-            return pd.DataFrame()
+            return pd.DataFrame(), None
+        
+        date_col, id_col = PAGE_KEYS[table]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        
+        select = "*"
+        if columns:
+            select = ",".join(dict.fromkeys([date_col, id_col, *columns]))
         
         try:
-            result = self.client.table("videos").select("*").order("publish_date", desc=True).execute()
-            return pd.DataFrame(result.data) if result.data else pd.DataFrame()
+            query = self.client.table(table).select(select)
+            if since:
+                query = query.gte(date_col, since)
+            if until:
+                inclusive, bound = until_bound(until)
+                query = query.lte(date_col, bound) if inclusive else query.lt(date_col, bound)
+            if author:
+                query = query.eq("author", author.lstrip("@"))
+            if hashtag and table == "videos":
+                tag = re.escape(hashtag.lstrip("#").strip())
+                query = query.filter("hashtags", "imatch", f"(^|, ){tag}(,|$)")
+            if video_ids is not None:
+                if not video_ids:
+                    return pd.DataFrame(), None
+                query = query.in_("video_id", video_ids)
+            if cursor:
+                last_date, last_id = decode_cursor(cursor)
+                query = query.or_(
+                    f"{date_col}.lt.{_quote(last_date)},"
+                    f"and({date_col}.eq.{_quote(last_date)},{id_col}.lt.{_quote(last_id)})"
+                )
+            
+            result = query.order(date_col, desc=True).order(id_col, desc=True).limit(limit).execute()
+            rows = result.data or []
+        except ValueError:
+            raise
         except Exception as e:
-            print(f"[ERROR] Supabase get_all_videos error: {e}")
-            return pd.DataFrame()
+            print(f"[ERROR] Supabase get_page({table}) error: {e}")
+            raise StorageError(f"{self.name} get_page({table}) failed: {e}") from e
+        
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][date_col], rows[-1][id_col])
+        return (pd.DataFrame(rows) if rows else pd.DataFrame()), next_cursor
 
-    def get_all_comments(self) -> pd.DataFrame:
-        """Fetch all comments from Supabase"""
+    def get_unscored(self, table: str, scorer_version: int, limit: int = 1000) -> pd.DataFrame:
+        """
+        Fetch rows that were never scored or were scored by an older scorer version
+        
+        Args:
+            table: 'videos' or 'comments'
+            scorer_version: Current scorer version
+            limit: Maximum number of rows to return
+        """
         if not self.client:
             return pd.DataFrame()
         
         try:
-            result = self.client.table("comments").select("*").order("date", desc=True).execute()
+            result = (
+                self.client.table(table)
+                .select("*")
+                .or_(f"scorer_version.is.null,scorer_version.lt.{scorer_version}")
+                .limit(limit)
+                .execute()
+            )
             return pd.DataFrame(result.data) if result.data else pd.DataFrame()
         except Exception as e:
-            print(f"[ERROR] Supabase get_all_comments error: {e}")
+            print(f"[ERROR] Supabase get_unscored error: {e}")
             return pd.DataFrame()
@@ -0,0 +1,124 @@
+"""
+Streaming export of videos and comments as NDJSON or Arrow IPC.
+
+Both writers consume an iterator of DataFrame pages (Storage.iter_pages)
+and yield bytes per page, so memory stays at one page whatever the corpus size.
+"""
+import io
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# Export column types per table: 'str', 'int', 'float' or 'timestamp'
+EXPORT_COLUMNS = {
+    "videos": {
+        "video_id": "str",
+        "video_url": "str",
+        "caption": "str",
+        "author": "str",
+        "likes": "int",
+        "comments": "int",
+        "shares": "int",
+        "saves": "int",
+        "views": "int",
+        "publish_date": "timestamp",
+        "hashtags": "str",
+        "mentions": "str",
+        "thumbnail_url": "str",
+        "sentiment": "str",
+        "sentiment_score": "float",
+        "engagement_rate": "float",
+        "scorer_version": "int",
+    },
+    "comments": {
+        "comment_id": "str",
+        "video_id": "str",
+        "author": "str",
+        "text": "str",
+        "likes": "int",
+        "date": "timestamp",
+        "sentiment": "str",
+        "sentiment_score": "float",
+        "scorer_version": "int",
+    },
+}
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def arrow_schema(table: str):
+    """Fixed Arrow schema for a table so every record batch matches"""
+    types = {
+        "str": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        # Stored times are naive (as scraped), so they are exported without a zone
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS[table].items()])
+
+
+def conform_page(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Select the export columns of a page in a fixed order and coerce their types"""
+    out = pd.DataFrame(index=df.index)
+    for name, kind in EXPORT_COLUMNS[table].items():
+        col = df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if kind == "int":
+            out[name] = pd.to_numeric(col, errors="coerce").astype("Int64")
+        elif kind == "float":
+            out[name] = pd.to_numeric(col, errors="coerce").astype("float64")
+        elif kind == "timestamp":
+            # utc=True only parses mixed offsets; naive values keep their wall time
+            out[name] = pd.to_datetime(col, errors="coerce", utc=True).dt.tz_localize(None)
+        else:
+            out[name] = col.astype(object).where(col.notna(), None).map(lambda v: v if v is None else str(v))
+    return out
+
+
+def iter_ndjson(pages: Iterable[pd.DataFrame], table: str) -> Iterator[bytes]:
+    """One JSON object per line, encoded a page at a time"""
+    for df in pages:
+        if df.empty:
+            continue
+        data = conform_page(df, table).to_json(orient="records", lines=True, date_format="iso", force_ascii=False)
+        yield (data if data.endswith("\n") else data + "\n").encode("utf-8")
+
+
+def iter_arrow(pages: Iterable[pd.DataFrame], table: str) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema first, then one record batch per page"""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed (pip install pyarrow)")
+
+    schema = arrow_schema(table)
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()
+    for df in pages:
+        if df.empty:
+            continue
+        batch = pa.Table.from_pandas(conform_page(df, table), schema=schema, preserve_index=False)
+        for record_batch in batch.to_batches():
+            writer.write_batch(record_batch)
+        yield drain()
+    writer.close()
+    yield drain()
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
+from fastapi.encoders import jsonable_encoder
 import os.path
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
@@ -11,30 +12,67 @@ import sys
 from datetime import datetime
 import pandas as pd
 import asyncio
+import time
+from contextlib import asynccontextmanager
 
 # Import modules from the same directory
 try:
-    from .scraper import scrape_hashtag_sync, scrape_user_sync, scrape_search_sync, TikTokScraper
-    from .analysis import TikTokAnalyzer
-    from .database import SupabaseManager
+    from .scraper import TikTokScraper, split_targets, TIME_ORDERED_TYPES, TERMINAL_STATUSES
+    from .analysis import TikTokAnalyzer, SCORER_VERSION
+    from .storage import (
+        get_storage, open_storage, close_storage, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor,
+        RUN_RUNNING, RUN_DONE, RUN_COUNTS, StorageError,
+    )
+    from .keywords import get_matcher
+    from .ingest import ingest_dataset, ingest_fanout
+    from .export import EXPORT_COLUMNS, CONTENT_TYPES, arrow_available, iter_ndjson, iter_arrow
+    from .response_cache import ResponseCache, bump_data_version, etag_matches, make_etag
+    from .records import VideoRecord, CommentRecord, records_frame, frame_records
+    from .word_index import WordIndex, SOURCES as WORD_SOURCES
+    from .metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_SECONDS, HTTP_IN_PROGRESS, stage
+    from .job_queue import JobQueue, JobWorkers
+    from .scrape_jobs import ScrapeJobRegistry, RUNNING, INGESTING, SUCCEEDED
 except (ImportError, ValueError):
     # Fallback for local testing or when relative imports fail
-    from scraper import scrape_hashtag_sync, scrape_user_sync, scrape_search_sync, TikTokScraper
-    from analysis import TikTokAnalyzer
-    from database import SupabaseManager
-except ImportError as e:
-    print(f"Import Error: {e}")
-    # Fallback/Dummy classes if imports fail
-    from scraper import TikTokScraper
-    scrape_hashtag_sync = None
-    class TikTokAnalyzer:
-        def calculate_engagement_rate(self, df): return df
-        def add_sentiment_analysis(self, df, **kwargs): return df
-    class SupabaseManager:
-        def __init__(self, **kwargs): pass
-        def is_connected(self): return False
-
-app = FastAPI(title="TikTok Pulse API")
+    from scraper import TikTokScraper, split_targets, TIME_ORDERED_TYPES, TERMINAL_STATUSES
+    from analysis import TikTokAnalyzer, SCORER_VERSION
+    from storage import (
+        get_storage, open_storage, close_storage, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor,
+        RUN_RUNNING, RUN_DONE, RUN_COUNTS, StorageError,
+    )
+    from keywords import get_matcher
+    from ingest import ingest_dataset, ingest_fanout
+    from export import EXPORT_COLUMNS, CONTENT_TYPES, arrow_available, iter_ndjson, iter_arrow
+    from response_cache import ResponseCache, bump_data_version, etag_matches, make_etag
+    from records import VideoRecord, CommentRecord, records_frame, frame_records
+    from word_index import WordIndex, SOURCES as WORD_SOURCES
+    from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_SECONDS, HTTP_IN_PROGRESS, stage
+    from job_queue import JobQueue, JobWorkers
+    from scrape_jobs import ScrapeJobRegistry, RUNNING, INGESTING, SUCCEEDED
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Open the storage client and its connection pool once and start the webhook job workers;
+    stop the workers and close storage on shutdown
+    """
+    try:
+        db = open_storage()
+        print(f"[INFO] Storage ready: {db.name} (connected={db.is_connected()})")
+    except Exception as e:
+        print(f"[ERROR] Storage startup failed: {e}")
+    try:
+        purged = job_queue.purge()
+        if purged:
+            print(f"[INFO] Purged {purged} finished webhook jobs")
+        job_workers.start()
+    except Exception as e:
+        print(f"[ERROR] Job workers failed to start: {e}")
+    yield
+    await job_workers.stop()
+    close_storage()
+
+app = FastAPI(title="TikTok Pulse API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -45,6 +83,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Request latency per route template (not raw path, to keep label sets bounded)"""
+    started = time.perf_counter()
+    HTTP_IN_PROGRESS.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_PROGRESS.dec()
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
+@app.exception_handler(StorageError)
+async def storage_unavailable(request: Request, exc: StorageError):
+    """A failed storage read is a 503, never a short or empty result"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
 # Initialize Analyzer
 try:
     analyzer = TikTokAnalyzer()
@@ -56,6 +119,57 @@ except:
 CONFIG_FILE = "config.json"
 DATA_CACHE = "data_cache.json"
 
+# Serialized /api/data and /api/aggregates responses, invalidated by data_changed()
+response_cache = ResponseCache()
+
+# Per-day word counts of captions and comments, updated on ingest; built from storage on first use
+word_index = WordIndex()
+
+REGISTRY.gauge(
+    "pulse_response_cache_entries", "Serialized responses held by the response cache",
+    collect=lambda: response_cache.stats()["entries"],
+)
+REGISTRY.gauge(
+    "pulse_response_cache_bytes", "Bytes held by the response cache",
+    collect=lambda: response_cache.stats()["bytes"],
+)
+REGISTRY.gauge(
+    "pulse_response_cache_hit_rate", "Response cache hits per lookup since startup",
+    collect=lambda: response_cache.stats()["hit_rate"],
+)
+REGISTRY.gauge(
+    "pulse_sentiment_cache_hit_rate", "Sentiment cache hits per lookup since startup",
+    collect=lambda: analyzer.cache.stats()["hit_rate"] if analyzer and analyzer.cache else None,
+)
+REGISTRY.gauge(
+    "pulse_job_queue_jobs", "Webhook jobs per status", ("status",),
+    collect=lambda: {(status,): n for status, n in job_queue.stats().items() if status in ("queued", "running", "succeeded", "failed")},
+)
+REGISTRY.gauge(
+    "pulse_job_queue_ready", "Webhook jobs due and waiting for a worker",
+    collect=lambda: job_queue.stats()["ready"],
+)
+REGISTRY.gauge(
+    "pulse_job_queue_oldest_ready_seconds", "Age of the oldest job waiting for a worker",
+    collect=lambda: job_queue.stats()["oldest_ready_seconds"],
+)
+REGISTRY.gauge(
+    "pulse_word_index_rows", "Rows counted by the word index", ("kind",),
+    collect=lambda: {(kind,): word_index.stats()[kind]["rows"] for kind in WORD_SOURCES},
+)
+
+# Progress of scrapes started through /api/scrape/async, streamed over SSE
+scrape_jobs = ScrapeJobRegistry()
+# Run watchers in flight (the event loop only keeps weak references to tasks)
+RUN_WATCHERS = set()
+
+# Groups added or deleted through /api/groups, kept for the lifetime of the process
+# (name -> group, or None once deleted) so server-side group= filters can see them.
+# Other instances never see them, so clients send the group definition with each request.
+RUNTIME_GROUPS = {}
+# Database pages a group-filtered /api/data request scans before returning what it matched
+GROUP_SCAN_PAGES = int(os.environ.get("GROUP_SCAN_PAGES", 10))
+
 def load_local_data():
     # Return empty structure as we can't reliably read/write cache file on Vercel
     return {"videos": [], "comments": []}
@@ -80,9 +194,65 @@ def load_config():
 
     if "groups" not in config or not isinstance(config["groups"], list):
         config["groups"] = []
+
+    if RUNTIME_GROUPS:
+        config["groups"] = [g for g in config["groups"] if g.get("name") not in RUNTIME_GROUPS]
+        config["groups"].extend(g for g in RUNTIME_GROUPS.values() if g)
         
     return config
 
+def data_changed(*_):
+    """Invalidate cached responses after a write (also usable as an ingest on_flush hook)"""
+    bump_data_version()
+
+def cached_json(request: Request, build):
+    """
+    Serve a JSON payload through the response cache, keyed by route, query string
+    and data version, with an ETag so unchanged responses are answered with 304.
+    Payloads carrying an "error" are not cached.
+    """
+    key = ResponseCache.make_key(request.url.path, request.query_params.multi_items())
+    cached = response_cache.get(key)
+    if cached:
+        body, etag = cached
+    else:
+        with stage("build" + request.url.path.removeprefix("/api").replace("/", "_")) as timer:
+            payload = build()
+            body = json.dumps(
+                jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+            timer.bytes = len(body)
+        if isinstance(payload, dict) and payload.get("error"):
+            etag = make_etag(body)
+        else:
+            etag = response_cache.put(key, body)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def score_results(videos, comments):
+    """Compute sentiment and engagement once at ingest so reads never re-score"""
+    if not analyzer:
+        return videos, comments
+    if videos:
+        videos = frame_records(analyzer.score_videos(records_frame(videos), method='vader'), VideoRecord)
+    if comments:
+        comments = frame_records(analyzer.score_comments(records_frame(comments), method='vader'), CommentRecord)
+    return videos, comments
+
+def save_watermarks(db, scrape_type, newest_by_target, started_at):
+    """
+    Advance per-target watermarks after a scrape.
+    Capped at the scrape's start: undated items are mapped with the current time.
+    """
+    if not db.is_connected():
+        return
+    cap = started_at.strftime('%Y-%m-%d %H:%M:%S')
+    db.save_watermarks(scrape_type, {t: min(d, cap) for t, d in newest_by_target.items() if d})
+
 def save_config(config):
     # Disabled for Vercel (Read-Only FS)
     print("WARNING: configuration save ignored on read-only filesystem")
@@ -112,6 +282,8 @@ def update_settings(request: SettingsRequest):
 
 @app.post("/api/groups")
 def add_group(group: KeywordGroup):
+    RUNTIME_GROUPS[group.name] = group.dict()
+    data_changed()
     config = load_config()
     config["groups"] = [g for g in config["groups"] if g["name"] != group.name]
     config["groups"].append(group.dict())
@@ -120,6 +292,8 @@ def add_group(group: KeywordGroup):
 
 @app.delete("/api/groups/{name}")
 def delete_group(name: str):
+    RUNTIME_GROUPS[name] = None
+    data_changed()
     config = load_config()
     config["groups"] = [g for g in config["groups"] if g["name"] != name]
     # save_config(config) # Disabled
@@ -133,10 +307,15 @@ class ScrapeRequest(BaseModel):
     apify_token: str
     scrape_comments: bool = False
     comments_limit: Optional[int] = 0
+    # Run comma-separated targets as parallel actor runs instead of one combined run
+    fan_out: bool = True
+    max_concurrency: Optional[int] = None
+    # Default the cutoff to the newest video stored for each target (ignored when since_date is set)
+    use_watermark: bool = True
 
 @app.get("/api/health")
 def health_check():
-    db = SupabaseManager()
+    db = get_storage()
     
     # Check if supabase library is actually working
     try:
@@ -149,53 +328,294 @@ def health_check():
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
         "supabase_library_loaded": lib_found,
-        "supabase_connected": db.is_connected(),
+        "storage_backend": db.name,
+        "storage_connected": db.is_connected(),
+        "supabase_connected": db.is_connected() if db.name == "supabase" else False,
+        "storage": db.health(),
         "supabase_url_detected": bool(os.environ.get("SUPABASE_URL")),
         "supabase_key_detected": bool(os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("SUPABASE_KEY")),
-        "environment": os.environ.get("RAILWAY_ENVIRONMENT", "vercel")
+        "environment": os.environ.get("RAILWAY_ENVIRONMENT", "vercel"),
+        "sentiment_cache": analyzer.cache.stats() if analyzer and analyzer.cache else None,
+        "response_cache": response_cache.stats(),
+        "word_index": word_index.stats(),
+        "jobs": {**job_queue.stats(), **job_workers.stats()},
+        "scrape_jobs": scrape_jobs.stats()
     }
 
+@app.get("/api/metrics")
+def get_metrics():
+    """Stage timings, row/byte/error counters, request latency and cache gauges in Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+def find_group(name):
+    """Look up a configured keyword group by name (404 if unknown)"""
+    for group in load_config()["groups"]:
+        if group.get("name") == name:
+            return group
+    raise HTTPException(status_code=404, detail=f"Unknown group: {name}")
+
+def request_group(group=None, keywords=None, exclude_keywords=None, exact_match=False):
+    """
+    The keyword group a request filters on: the definition sent with it (keywords,
+    exclude_keywords, exact_match), else the configured group named `group`, else None
+    """
+    if keywords:
+        return {"keywords": keywords, "exclude_keywords": exclude_keywords or [], "exact_match": exact_match}
+    return find_group(group) if group else None
+
+def fetch_video_page(db, cursor=None, limit=DEFAULT_PAGE_SIZE, group=None, **filters):
+    """
+    One page of videos, optionally restricted to a keyword group (see request_group).
+    Group matching runs in the API with the compiled matcher, so database pages are
+    scanned until `limit` matches are found or GROUP_SCAN_PAGES pages were read; the
+    cursor points at the last row consumed, so a short page may still have a next one.
+    """
+    if not group:
+        return db.get_page("videos", cursor=cursor, limit=limit, **filters)
+
+    matcher = get_matcher(group)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    matched = []
+    found = scanned = 0
+    while found < limit and scanned < GROUP_SCAN_PAGES:
+        scanned += 1
+        df, next_cursor = db.get_page("videos", cursor=cursor, limit=MAX_PAGE_SIZE, **filters)
+        if df.empty:
+            cursor = None
+            break
+        hits = df[matcher.match_frame(df)]
+        need = limit - found
+        if len(hits) > need:
+            hits = hits.iloc[:need]
+            last = hits.iloc[-1]
+            next_cursor = encode_cursor(last['publish_date'], last['video_id'])
+        matched.append(hits)
+        found += len(hits)
+        cursor = next_cursor
+        if not cursor:
+            break
+
+    df = pd.concat(matched, ignore_index=True) if matched else pd.DataFrame()
+    return df, cursor
+
 @app.get("/api/data")
-async def get_data():
+def get_data(
+    request: Request,
+    cursor: Optional[str] = None,
+    comments_cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    author: Optional[str] = None,
+    hashtag: Optional[str] = None,
+    group: Optional[str] = None,
+    keywords: Optional[List[str]] = Query(None),
+    exclude_keywords: Optional[List[str]] = Query(None),
+    exact_match: bool = False,
+):
+    """
+    One keyset page of videos and comments, newest first.
+    Pass next_cursor / next_comments_cursor back as cursor / comments_cursor for the next page.
+    A keyword group is given by its definition (repeated keywords / exclude_keywords, and
+    exact_match) or by the name of a configured group. Group pages may hold fewer than
+    `limit` videos and still have a next_cursor.
+    When author, hashtag or a group is set, comments are limited to the videos on the returned page.
+    Responses are cached until the next write and carry an ETag (If-None-Match gives 304).
+    """
+    group = request_group(group, keywords, exclude_keywords, exact_match)
+    return cached_json(request, lambda: build_data_page(
+        cursor, comments_cursor, limit, since, until, author, hashtag, group
+    ))
+
+def date_text(col):
+    """
+    Dates as 'YYYY-MM-DD HH:MM:SS'. Stored values are already ISO text (Supabase adds a 'T'
+    and sometimes fractions or an offset), so trimming the string avoids a parse/format round trip.
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col.dt.strftime('%Y-%m-%d %H:%M:%S')
+    return col.astype('string').str.replace('T', ' ', n=1, regex=False).str.slice(0, 19).astype(object)
+
+def build_data_page(cursor, comments_cursor, limit, since, until, author, hashtag, group):
+    """Payload of /api/data"""
     try:
-        config = load_config()
-        # local_data = load_local_data() # Skip local cache
-        videos = []
-        comments = []
+        df_videos = pd.DataFrame()
+        df_comments = pd.DataFrame()
+        next_cursor = None
+        next_comments_cursor = None
         
-        # Try Supabase First (Priority)
-        db = SupabaseManager()
+        # Read from the configured storage backend (Supabase by default)
+        db = get_storage()
         if db.is_connected():
-            df_videos = db.get_all_videos()
-            df_comments = db.get_all_comments()
-            if not df_videos.empty:
-                videos = df_videos.to_dict(orient='records')
-                print(f"[INFO] Loaded {len(videos)} videos from Supabase")
-            if not df_comments.empty:
-                comments = df_comments.to_dict(orient='records')
-
-        df_videos = pd.DataFrame(videos)
-        df_comments = pd.DataFrame(comments)
+            df_videos, next_cursor = fetch_video_page(
+                db, cursor=cursor, limit=limit, group=group,
+                since=since, until=until, author=author, hashtag=hashtag
+            )
+            video_ids = None
+            if author or hashtag or group:
+                video_ids = df_videos['video_id'].astype(str).tolist() if not df_videos.empty else []
+            df_comments, next_comments_cursor = db.get_page(
+                "comments", cursor=comments_cursor, limit=limit,
+                since=since, until=until, video_ids=video_ids
+            )
+            print(f"[INFO] Loaded {len(df_videos)} videos and {len(df_comments)} comments from {db.name}")
         
-        if not df_videos.empty and analyzer:
-            df_videos = analyzer.calculate_engagement_rate(df_videos)
-            df_videos = analyzer.add_sentiment_analysis(df_videos, method='vader')
-            if 'publish_date' in df_videos.columns:
-                df_videos['publish_date'] = pd.to_datetime(df_videos['publish_date']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        # Sentiment and engagement are stored at ingest (see score_results), so this is a pure read
+        if not df_videos.empty and 'publish_date' in df_videos.columns:
+            df_videos['publish_date'] = date_text(df_videos['publish_date'])
         
-        if not df_comments.empty and analyzer:
-            df_comments = analyzer.add_sentiment_analysis(df_comments, method='vader', text_column='text')
-            if 'date' in df_comments.columns:
-                df_comments['date'] = pd.to_datetime(df_comments['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        if not df_comments.empty and 'date' in df_comments.columns:
+            df_comments['date'] = date_text(df_comments['date'])
 
+        # Missing values (e.g. unscored rows) as null rather than NaN, which is not valid JSON
         return {
-            "videos": df_videos.to_dict(orient='records') if not df_videos.empty else [],
-            "comments": df_comments.to_dict(orient='records') if not df_comments.empty else []
+            "videos": df_videos.astype(object).where(df_videos.notna(), None).to_dict(orient='records') if not df_videos.empty else [],
+            "comments": df_comments.astype(object).where(df_comments.notna(), None).to_dict(orient='records') if not df_comments.empty else [],
+            "next_cursor": next_cursor,
+            "next_comments_cursor": next_comments_cursor
         }
+    except (HTTPException, StorageError):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"API Data Error: {e}")
         return {"videos": [], "comments": [], "error": str(e)}
 
+# Columns /api/aggregates needs; captions and hashtags are only used for group matching and top posts
+AGGREGATE_COLUMNS = [
+    "video_id", "video_url", "caption", "author", "publish_date", "hashtags",
+    "views", "likes", "comments", "shares", "saves", "engagement_rate", "sentiment"
+]
+
+@app.get("/api/aggregates")
+def get_aggregates(
+    request: Request,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    author: Optional[str] = None,
+    hashtag: Optional[str] = None,
+    group: Optional[str] = None,
+    keywords: Optional[List[str]] = Query(None),
+    exclude_keywords: Optional[List[str]] = Query(None),
+    exact_match: bool = False,
+    top_n: int = 10,
+    timelines: str = "daily",
+):
+    """
+    KPI totals, sentiment distribution, timelines and top posts/authors,
+    computed server-side so the dashboard never downloads raw rows for its charts.
+    `timelines` is a comma-separated subset of hourly,daily,weekly (default daily only,
+    which keeps the payload small; ask for the others when a chart needs them).
+    The keyword group is given as for /api/data. Cached and ETag-validated like /api/data.
+    """
+    group = request_group(group, keywords, exclude_keywords, exact_match)
+    return cached_json(request, lambda: build_aggregates_payload(
+        since, until, author, hashtag, group, top_n, timelines
+    ))
+
+def build_aggregates_payload(since, until, author, hashtag, group, top_n, timelines):
+    """Payload of /api/aggregates"""
+    if not analyzer:
+        raise HTTPException(status_code=503, detail="Analyzer unavailable")
+
+    top_n = max(1, min(top_n, 100))
+    timelines = [t.strip() for t in timelines.split(",") if t.strip()]
+    matcher = get_matcher(group) if group else None
+    db = get_storage()
+    if db.is_connected() and not matcher:
+        # Backends that can aggregate in SQL return the payload directly
+        pushed = db.aggregate_videos(
+            since=since, until=until, author=author, hashtag=hashtag,
+            top_n=top_n, timelines=timelines
+        )
+        if pushed is not None:
+            return pushed
+
+    frames = []
+    if db.is_connected():
+        for df in db.iter_pages(
+            "videos", columns=AGGREGATE_COLUMNS,
+            since=since, until=until, author=author, hashtag=hashtag
+        ):
+            if matcher:
+                df = df[matcher.match_frame(df)]
+            frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return analyzer.build_aggregates(df, top_n=top_n, timelines=timelines)
+
+@app.get("/api/words")
+def get_words(
+    request: Request,
+    source: str = "captions",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    top_n: int = 20,
+):
+    """
+    Most frequent words of captions or comments published between since and until
+    (inclusive days), merged from the per-day word index instead of re-tokenizing rows.
+    """
+    if source not in WORD_SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(WORD_SOURCES)}")
+    top_n = max(1, min(top_n, 500))
+
+    def build():
+        word_index.ensure_built(get_storage())
+        return {
+            "source": source,
+            "since": since,
+            "until": until,
+            "words": [{"word": w, "count": c} for w, c in word_index.top(source, since, until, top_n)],
+        }
+    return cached_json(request, build)
+
+@app.get("/api/export")
+def export_data(
+    table: str = "videos",
+    format: str = "ndjson",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    author: Optional[str] = None,
+    hashtag: Optional[str] = None,
+    group: Optional[str] = None,
+    keywords: Optional[List[str]] = Query(None),
+    exclude_keywords: Optional[List[str]] = Query(None),
+    exact_match: bool = False,
+    page_size: int = MAX_PAGE_SIZE,
+):
+    """
+    Stream a whole table as NDJSON or an Arrow IPC stream, one database page at a time.
+    hashtag and the keyword group (given as for /api/data) apply to videos only.
+    """
+    group = request_group(group, keywords, exclude_keywords, exact_match)
+    if table not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Unknown table: {table}")
+    if format not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow export requires pyarrow (pip install pyarrow)")
+    if table != "videos" and (hashtag or group):
+        raise HTTPException(status_code=400, detail="hashtag and group filters apply to videos only")
+
+    db = get_storage()
+    if not db.is_connected():
+        raise HTTPException(status_code=503, detail="Storage unavailable")
+
+    matcher = get_matcher(group) if group else None
+    pages = db.iter_pages(table, page_size=page_size, since=since, until=until, author=author, hashtag=hashtag)
+    if matcher:
+        pages = (df[matcher.match_frame(df)] for df in pages)
+
+    body = iter_ndjson(pages, table) if format == "ndjson" else iter_arrow(pages, table)
+    extension = "ndjson" if format == "ndjson" else "arrows"
+    return StreamingResponse(
+        body,
+        media_type=CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{extension}"'}
+    )
+
 @app.post("/api/scrape")
 async def run_scrape(request: ScrapeRequest):
     """
@@ -215,82 +635,265 @@ async def run_scrape(request: ScrapeRequest):
             except:
                 pass
 
-        if not scrape_hashtag_sync:
-            raise HTTPException(status_code=500, detail="Scraper module not loaded correctly")
-
-        results = []
-        loop = asyncio.get_event_loop()
-        
         comments_limit = request.comments_limit if request.scrape_comments else 0
         
-        if request.scrape_type == "Hashtag":
-            results = await loop.run_in_executor(None, scrape_hashtag_sync, 
-                        request.search_input, request.video_count, since_dt, request.apify_token, comments_limit)
-        elif request.scrape_type == "Username":
-            results = await loop.run_in_executor(None, scrape_user_sync, 
-                        request.search_input, request.video_count, since_dt, request.apify_token, comments_limit)
-        else: # Keyword
-            results = await loop.run_in_executor(None, scrape_search_sync, 
-                        request.search_input, request.video_count, since_dt, request.apify_token, comments_limit)
+        scraper = TikTokScraper(request.apify_token)
+        db = get_storage()
+        if not db.is_connected():
+            print(f"[WARN] No storage available ({db.name} offline).")
+        
+        started_at = datetime.now()
+        targets = split_targets(request.search_input)
+        watermarks = {}
+        # Only time-ordered results can stop at a watermark: hashtag and keyword results mix
+        # ages, so a cutoff would drop older unseen videos and stop refreshing their metrics
+        if request.use_watermark and not since_dt and request.scrape_type in TIME_ORDERED_TYPES and db.is_connected():
+            watermarks = db.get_watermarks(request.scrape_type, targets)
         
-        if results:
-            all_comments = []
-            for video in results:
-                if 'scraped_comments' in video:
-                    all_comments.extend(video['scraped_comments'])
-                    del video['scraped_comments']
-            
-            # Save to Supabase (Priority)
-            db = SupabaseManager()
-            if db.is_connected():
-                v_count = db.save_videos(results)
-                c_count = db.save_comments(all_comments) if all_comments else 0
-                print(f"[INFO] Saved {v_count} videos and {c_count} comments to Supabase")
+        if request.fan_out and len(targets) > 1:
+            # One run per target; results are streamed and de-duplicated as each run finishes
+            stats = await ingest_fanout(
+                scraper, db, request.scrape_type, request.search_input,
+                count=request.video_count,
+                since_date=since_dt,
+                comments_per_video=comments_limit,
+                transform=score_results,
+                max_concurrency=request.max_concurrency,
+                cutoffs=watermarks,
+                changed_only=True,
+                on_flush=data_changed,
+                on_saved=word_index.add_batch
+            )
+            newest = {r["target"]: r["newest_publish_date"] for r in stats["targets"] if r["status"] == "succeeded"}
+        else:
+            run_input = scraper.build_run_input(request.scrape_type, request.search_input, request.video_count, comments_limit)
+            dataset_id = await scraper.run_to_dataset(run_input)
+            if not dataset_id:
+                return {"success": False, "error": "No results found"}
             
+            # A combined run mixes targets, so watermarks only apply to single-target runs
+            single = targets[0] if len(targets) == 1 else None
+            # Stream the dataset into storage page by page instead of collecting it in memory
+            stats = await ingest_dataset(
+                scraper, db, dataset_id,
+                comments_per_video=comments_limit,
+                transform=score_results,
+                limit=request.video_count or 100,
+                since_date=since_dt or watermarks.get(single),
+                # Several profiles come back one after another, each newest first, so only a
+                # single-target run is time-ordered as a whole
+                time_ordered=bool(single) and request.scrape_type in TIME_ORDERED_TYPES,
+                changed_only=True,
+                on_flush=data_changed,
+                on_saved=word_index.add_batch
+            )
+            newest = {single: stats["newest_publish_date"]} if single else {}
+        save_watermarks(db, request.scrape_type, newest, started_at)
+        
+        if stats["videos"]:
+            print(f"[INFO] Saved {stats['saved_videos']} videos and {stats['saved_comments']} comments to {db.name}")
             return {
                 "success": True, 
-                "video_count": len(results), 
-                "comment_count": len(all_comments)
+                "video_count": stats["videos"], 
+                "comment_count": stats["comments"],
+                "unchanged_count": stats["unchanged_videos"],
+                "targets": stats.get("targets")
             }
         else:
-            return {"success": False, "error": "No results found"}
+            return {"success": False, "error": "No results found", "targets": stats.get("targets")}
             
     except Exception as e:
         print(f"Scrape Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_webhook_results(run_id: str, dataset_id: str, comments_limit: int = 0, apify_token: str = None):
-    """Background task to fetch and save findings from Apify"""
+async def process_webhook_results(run_id: str, dataset_id: str, comments_limit: int = 0, apify_token: str = None,
+                                  scrape_type: str = None, search_input: str = None, since_date: str = None,
+                                  use_watermark: bool = True):
+    """
+    Fetch and save a finished run's dataset (the 'webhook' job handler).
+
+    Videos older than since_date are skipped; without one, a single-target time-ordered
+    run stops at the target's watermark unless use_watermark is off (as in run_scrape).
+
+    The dataset offset is checkpointed in ingest_runs after every flushed batch, so a
+    failed or interrupted attempt resumes where it stopped, and a run already ingested
+    is skipped. Errors are re-raised so the job queue retries the run.
+    """
+    run_id = str(run_id)
+    scrape_jobs.update(run_id, INGESTING, create=True)
+    db = get_storage()
+    if not db.is_connected():
+        print(f"[WARN] No storage available ({db.name} offline).")
+    # Storage calls are blocking; keep them off the event loop the job workers share
+    checkpoint = await asyncio.to_thread(db.get_ingest_run, run_id) if db.is_connected() else None
+
+    if checkpoint and checkpoint.get("status") == RUN_DONE:
+        print(f"[INFO] Run {run_id} was already ingested; ignoring the repeated delivery.")
+        done = {k: int(checkpoint.get(k) or 0) for k in RUN_COUNTS}
+        scrape_jobs.update(run_id, SUCCEEDED, items_fetched=checkpoint.get("dataset_offset"), **done)
+        RUN_TOKENS.pop(run_id, None)
+        return {**done, "offset": checkpoint.get("dataset_offset"), "skipped": True}
+
+    # Resume from the last checkpoint; counts carry over from earlier attempts
+    resume = checkpoint and checkpoint.get("dataset_id") == dataset_id
+    offset = int(checkpoint.get("dataset_offset") or 0) if resume else 0
+    before = {k: int(checkpoint.get(k) or 0) if resume else 0 for k in RUN_COUNTS}
+    if offset:
+        print(f"[INFO] Resuming run {run_id} at dataset offset {offset}")
+
+    def totals(stats):
+        return {k: before[k] + stats[k] for k in RUN_COUNTS}
+
+    def on_flush(stats):
+        data_changed()
+        counts = totals(stats)
+        db.save_ingest_run(run_id, dataset_id, RUN_RUNNING, stats["offset"], counts)
+        scrape_jobs.update(run_id, items_fetched=stats["offset"], unchanged_videos=stats["unchanged_videos"], **counts)
+
     try:
+        started_at = datetime.now()
         config = load_config()
-        # Use the token passed in the webhook, or fallback to config/env
-        token = apify_token or config.get("apify_token") or os.environ.get("APIFY_TOKEN")
+        # Use the token delivered with the run, or fallback to config/env
+        token = apify_token or RUN_TOKENS.get(run_id) or config.get("apify_token") or os.environ.get("APIFY_TOKEN")
         scraper = TikTokScraper(token)
-        results = scraper.fetch_results(dataset_id, comments_per_video=comments_limit)
         
-        if results:
-            all_comments = []
-            for video in results:
-                if 'scraped_comments' in video:
-                    all_comments.extend(video['scraped_comments'])
-                    del video['scraped_comments']
-
-            # 1. Save to Supabase (PRIORITY)
-            db = SupabaseManager()
-            if db.is_connected():
-                v_count = db.save_videos(results)
-                c_count = db.save_comments(all_comments) if all_comments else 0
-                print(f"[INFO] Webhook saved {v_count} videos and {c_count} comments to Supabase.")
-            else:
-                print("[WARN] No storage available (Supabase offline).")
+        # 1. Stream into storage (PRIORITY), flushing fixed-size batches as pages arrive
+        targets = split_targets(search_input)
+        single = targets[0] if scrape_type and len(targets) == 1 else None
+        since_dt = None
+        if since_date:
+            try:
+                since_dt = datetime.fromisoformat(since_date)
+            except ValueError:
+                print(f"[WARN] Ignoring invalid since_date {since_date!r} for run {run_id}")
+        if not since_dt and use_watermark and single and scrape_type in TIME_ORDERED_TYPES and db.is_connected():
+            since_dt = (await asyncio.to_thread(db.get_watermarks, scrape_type, [single])).get(single)
+        stats = await ingest_dataset(
+            scraper, db, dataset_id,
+            comments_per_video=comments_limit,
+            transform=score_results,
+            since_date=since_dt,
+            offset=offset,
+            time_ordered=bool(single) and scrape_type in TIME_ORDERED_TYPES,
+            changed_only=True,
+            on_flush=on_flush,
+            on_saved=word_index.add_batch
+        )
+        if single:
+            await asyncio.to_thread(save_watermarks, db, scrape_type, {single: stats["newest_publish_date"]}, started_at)
+        counts = totals(stats)
+        await asyncio.to_thread(db.save_ingest_run, run_id, dataset_id, RUN_DONE, stats["offset"], counts)
+        scrape_jobs.update(
+            run_id, SUCCEEDED, items_fetched=stats["offset"], unchanged_videos=stats["unchanged_videos"], **counts
+        )
+        print(f"[INFO] Webhook saved {counts['saved_videos']} videos and {counts['saved_comments']} comments to {db.name}.")
         
-        print(f"Async Scrape Finished for run {run_id}. Saved results to Sheets.")
+        print(f"Async Scrape Finished for run {run_id} in {stats['seconds']}s ({stats['pages']} dataset pages).")
+        RUN_TOKENS.pop(run_id, None)
+        return {**counts, "offset": stats["offset"], "resumed_from": offset, "seconds": stats["seconds"]}
     except Exception as e:
         print(f"Webhook processing error: {e}")
+        raise
+
+def open_job_queue():
+    """The durable webhook queue; kept in memory if its file cannot be opened"""
+    try:
+        return JobQueue()
+    except Exception as e:
+        print(f"[WARN] Job queue file unavailable, queueing webhook jobs in memory: {e}")
+        return JobQueue(":memory:")
+
+async def run_webhook_job(payload):
+    run_id = str(payload["run_id"])
+    try:
+        return await process_webhook_results(**payload)
+    except Exception as e:
+        job = job_queue.get(run_id)
+        if job and job["attempts"] >= job_queue.max_attempts:
+            scrape_jobs.fail(run_id, str(e))
+        else:
+            scrape_jobs.update(run_id, error=f"{e} (retrying)")
+        raise
+
+def queue_webhook_job(run_id, dataset_id, comments_limit=0, apify_token=None, scrape_type=None, search_input=None,
+                      since_date=None, use_watermark=True):
+    """
+    Queue a finished run for the job workers; returns (job id, False if it was already queued).
+    The Apify token is kept in process memory only, never in the queue file.
+    """
+    if apify_token:
+        RUN_TOKENS[str(run_id)] = apify_token
+    job_id, queued = job_queue.enqueue("webhook", str(run_id), {
+        "run_id": run_id, "dataset_id": dataset_id, "comments_limit": comments_limit,
+        "scrape_type": scrape_type, "search_input": search_input,
+        "since_date": since_date, "use_watermark": use_watermark,
+    })
+    # Serverless hosts may not run the lifespan; start the workers on first use
+    job_workers.start()
+    job_workers.notify()
+    return job_id, queued
+
+async def watch_scrape_run(scraper, run_id, comments_limit, scrape_type, search_input, since_date=None, use_watermark=True):
+    """
+    Report a run's Apify status and items scraped until it ends, then queue its ingestion.
+    The webhook queues the same job; whichever arrives second is a no-op, so runs are
+    ingested even when Apify cannot reach the webhook URL (e.g. localhost).
+    """
+    try:
+        async for status, dataset_id, items in scraper.aiter_run_status(run_id):
+            if status == "SUCCEEDED":
+                scrape_jobs.update(run_id, INGESTING, apify_status=status, items_scraped=items)
+                queue_webhook_job(run_id, dataset_id, comments_limit, scraper.token, scrape_type, search_input,
+                                  since_date, use_watermark)
+            elif status in TERMINAL_STATUSES or status == "UNKNOWN":
+                scrape_jobs.update(run_id, apify_status=status, items_scraped=items)
+                scrape_jobs.fail(run_id, f"Apify run ended with status {status}")
+            else:
+                scrape_jobs.update(run_id, RUNNING, apify_status=status, items_scraped=items)
+    except Exception as e:
+        print(f"[WARN] Stopped following run {run_id}: {e}")
+
+# Finished Apify runs are processed by a worker pool from a durable queue, one job per runId
+job_queue = open_job_queue()
+# Apify tokens delivered with runs (run id -> token), used by their jobs in this process.
+# After a restart, jobs fall back to the configured APIFY_TOKEN.
+RUN_TOKENS = {}
+job_workers = JobWorkers(job_queue, {"webhook": run_webhook_job})
+
+@app.post("/api/backfill")
+def run_backfill(batch_size: int = 1000):
+    """Re-score stored rows whose scorer_version is missing or older than SCORER_VERSION"""
+    db = get_storage()
+    if not db.is_connected() or not analyzer:
+        raise HTTPException(status_code=503, detail="Storage or analyzer unavailable")
+
+    totals = {"videos": 0, "comments": 0}
+    for table, score, save, record in (
+        ("videos", analyzer.score_videos, db.save_videos, VideoRecord),
+        ("comments", analyzer.score_comments, db.save_comments, CommentRecord),
+    ):
+        while True:
+            df = db.get_unscored(table, SCORER_VERSION, limit=batch_size)
+            if df.empty:
+                break
+            saved = save(frame_records(score(df, method='vader'), record))
+            totals[table] += saved
+            # Stop instead of spinning on a batch that cannot be written
+            if saved < len(df):
+                print(f"[WARN] Backfill stopped on {table}: saved {saved} of {len(df)} rows")
+                break
+
+    if totals["videos"] or totals["comments"]:
+        data_changed()
+    print(f"[INFO] Backfill re-scored {totals['videos']} videos and {totals['comments']} comments")
+    return {"success": True, "scorer_version": SCORER_VERSION, **totals}
 
 @app.post("/api/webhook")
-async def apify_webhook(request: Request, background_tasks: BackgroundTasks):
-    """Webhook endpoint for Apify to notify completion"""
+async def apify_webhook(request: Request):
+    """
+    Webhook endpoint for Apify to notify completion.
+    The run is queued for the job workers; a redelivery of a queued or processed run is a no-op.
+    """
     try:
         data = await request.json()
         run_id = data.get("runId")
@@ -298,15 +901,65 @@ async def apify_webhook(request: Request, background_tasks: BackgroundTasks):
         sheet_url = data.get("sheetUrl")
         comments_limit = data.get("commentsLimit", 0)
         apify_token = data.get("apifyToken")
+        scrape_type = data.get("scrapeType")
+        search_input = data.get("searchInput")
+        since_date = data.get("sinceDate")
+        use_watermark = data.get("useWatermark", True)
         
         if run_id and dataset_id:
-            background_tasks.add_task(process_webhook_results, run_id, dataset_id, comments_limit, apify_token)
-            return {"status": "processing"}
+            job_id, queued = queue_webhook_job(run_id, dataset_id, comments_limit, apify_token, scrape_type, search_input,
+                                               since_date, use_watermark)
+            return {"status": "processing" if queued else "duplicate", "job_id": job_id}
         return {"status": "invalid payload"}
     except Exception as e:
         print(f"Webhook error: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.get("/api/jobs")
+def list_jobs(limit: int = 50):
+    """Queue counts, worker state and the most recent webhook jobs"""
+    return {
+        "stats": {**job_queue.stats(), **job_workers.stats()},
+        "jobs": job_queue.recent(max(1, min(limit, 500))),
+    }
+
+@app.get("/api/jobs/{run_id}")
+def get_job(run_id: str):
+    job = job_queue.get(run_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {run_id}")
+    return job
+
+@app.get("/api/scrape/jobs")
+def list_scrape_jobs(limit: int = 50):
+    """Scrapes started by this instance, newest first"""
+    return {"stats": scrape_jobs.stats(), "jobs": scrape_jobs.recent(max(1, min(limit, 200)))}
+
+@app.get("/api/scrape/jobs/{run_id}")
+def get_scrape_job(run_id: str):
+    job = scrape_jobs.get(run_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown scrape job: {run_id}")
+    return job
+
+@app.get("/api/scrape/jobs/{run_id}/events")
+async def stream_scrape_job(request: Request, run_id: str):
+    """
+    Server-Sent Events with a snapshot of the job on every change (event name = status),
+    closed once the job succeeds or fails. Reconnecting clients send Last-Event-ID.
+    """
+    if not scrape_jobs.get(run_id):
+        raise HTTPException(status_code=404, detail=f"Unknown scrape job: {run_id}")
+    try:
+        after = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        after = 0
+    return StreamingResponse(
+        scrape_jobs.events(run_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/api/scrape/async")
 async def run_scrape_async(request: ScrapeRequest):
     """Initiate a scrape job without waiting for it to finish (Vercel compatible)"""
@@ -326,26 +979,34 @@ async def run_scrape_async(request: ScrapeRequest):
         
         scraper = TikTokScraper(request.apify_token)
         
-        # Add comments limit to the webhook payload template
         comments_limit = request.comments_limit if request.scrape_comments else 0
         
         run_info = await scraper.start_scrape_async(
             request.scrape_type,
             request.search_input,
             request.video_count,
+            since_date=request.since_date,
             comments_per_video=comments_limit,
-            webhook_url=webhook_url
+            webhook_url=webhook_url,
+            use_watermark=request.use_watermark
         )
 
-        # We need to ensure Apify sends back the commentsLimit if we want it preserved
-        # However, scraper.py might need an update to include it in payload_template
-        # Let's fix scraper.py next.
-        
         if run_info and (isinstance(run_info, dict) and "id" in run_info):
+            run_id = run_info["id"]
+            scrape_jobs.create(run_id, scrape_type=request.scrape_type, search_input=request.search_input,
+                               video_count=request.video_count)
+            scrape_jobs.update(run_id, RUNNING, apify_status=run_info.get("status"))
+            watcher = asyncio.create_task(watch_scrape_run(
+                scraper, run_id, comments_limit, request.scrape_type, request.search_input,
+                request.since_date, request.use_watermark
+            ))
+            RUN_WATCHERS.add(watcher)
+            watcher.add_done_callback(RUN_WATCHERS.discard)
             return {
                 "success": True, 
                 "message": "Scrape initiated! Results will appear on the dashboard in a few minutes.",
-                "run_id": run_info.get("id")
+                "run_id": run_id,
+                "events_url": f"/api/scrape/jobs/{run_id}/events"
             }
         else:
             error_details = run_info.get("error") if isinstance(run_info, dict) else "Unknown error"
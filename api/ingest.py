@@ -0,0 +1,203 @@
+"""
+Streaming ingestion of Apify datasets into the database.
+
+Dataset pages are read with the async Apify client and mapped as they arrive;
+fixed-size batches are scored and written on a dedicated writer thread, so the
+next page is fetched while the previous batch is being written. At most one
+batch is in flight, which keeps peak memory at roughly two batches plus one page.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+try:
+    from .scraper import newest_publish_date
+    from .metrics import stage
+except (ImportError, ValueError):
+    from scraper import newest_publish_date
+    from metrics import stage
+
+
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 1000))
+
+
+async def ingest_pages(
+    pages,
+    db,
+    batch_size: int = INGEST_BATCH_SIZE,
+    transform: Optional[Callable[[List[Dict], List[Dict]], Tuple[List[Dict], List[Dict]]]] = None,
+    offset: Optional[int] = 0,
+    on_flush: Optional[Callable[[Dict[str, Any]], None]] = None,
+    changed_only: bool = False,
+    on_saved: Optional[Callable[[List[Dict], List[Dict]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Write an async stream of mapped pages to the database in fixed-size batches
+
+    Args:
+        pages: Async iterable of (offset after the page, videos, comments); the offset
+            may be None when the stream has no single dataset position (fan-out scrapes)
+        db: Storage backend; nothing is written when it is None or offline
+        batch_size: Videos (or comments) buffered before a flush
+        transform: Applied to (videos, comments) before saving, e.g. ingest-time scoring
+        offset: Offset the stream starts from
+        on_flush: Called from the writer thread after each flush with the running stats;
+            offset, pages, videos and comments cover everything flushed so far
+        changed_only: Skip rows whose stored content hash is unchanged (Storage.drop_unchanged),
+            before they are scored
+        on_saved: Called from the writer thread with each saved batch of (videos, comments),
+            e.g. to update the word index
+
+    Returns:
+        Dictionary with pages, videos, comments, saved_videos, saved_comments, unchanged_videos,
+        unchanged_comments, newest_publish_date, offset and seconds
+    """
+    started = time.perf_counter()
+    stats = {
+        "pages": 0, "videos": 0, "comments": 0,
+        "saved_videos": 0, "saved_comments": 0,
+        "unchanged_videos": 0, "unchanged_comments": 0,
+        "newest_publish_date": None,
+        "offset": offset, "seconds": 0.0,
+    }
+    connected = db is not None and db.is_connected()
+
+    def flush(videos, comments, covered_offset, covered_counts):
+        with stage("ingest_flush", rows=len(videos) + len(comments)):
+            if changed_only and connected:
+                fresh_videos = db.drop_unchanged("videos", videos)
+                fresh_comments = db.drop_unchanged("comments", comments)
+                stats["unchanged_videos"] += len(videos) - len(fresh_videos)
+                stats["unchanged_comments"] += len(comments) - len(fresh_comments)
+                videos, comments = fresh_videos, fresh_comments
+            if transform and (videos or comments):
+                with stage("ingest_transform", rows=len(videos) + len(comments)):
+                    videos, comments = transform(videos, comments)
+            if connected:
+                stats["saved_videos"] += db.save_videos(videos) if videos else 0
+                stats["saved_comments"] += db.save_comments(comments) if comments else 0
+                if on_saved and (videos or comments):
+                    on_saved(videos, comments)
+        stats["offset"] = covered_offset
+        if on_flush:
+            # Pages read after this batch are still buffered; report only what it covers
+            on_flush({**stats, **covered_counts})
+
+    def read_counts():
+        return {k: stats[k] for k in ("pages", "videos", "comments")}
+
+    loop = asyncio.get_running_loop()
+    videos_buf, comments_buf = [], []
+    page_offset = offset
+    pending = None
+    # A writer thread per ingestion keeps blocking upserts off the event loop
+    # without drawing on the shared default executor
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        async for page_offset, videos, comments in pages:
+            stats["pages"] += 1
+            stats["videos"] += len(videos)
+            stats["comments"] += len(comments)
+            newest = newest_publish_date(videos)
+            if newest and (stats["newest_publish_date"] or "") < newest:
+                stats["newest_publish_date"] = newest
+            videos_buf.extend(videos)
+            comments_buf.extend(comments)
+
+            if len(videos_buf) >= batch_size or len(comments_buf) >= batch_size:
+                if pending:
+                    await pending
+                pending = loop.run_in_executor(writer, flush, videos_buf, comments_buf, page_offset, read_counts())
+                videos_buf, comments_buf = [], []
+
+        if pending:
+            await pending
+        if videos_buf or comments_buf:
+            await loop.run_in_executor(writer, flush, videos_buf, comments_buf, page_offset, read_counts())
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+async def ingest_dataset(
+    scraper,
+    db,
+    dataset_id: str,
+    comments_per_video: int = 0,
+    batch_size: int = INGEST_BATCH_SIZE,
+    transform: Optional[Callable[[List[Dict], List[Dict]], Tuple[List[Dict], List[Dict]]]] = None,
+    limit: Optional[int] = None,
+    since_date=None,
+    offset: int = 0,
+    on_flush: Optional[Callable[[Dict[str, Any]], None]] = None,
+    time_ordered: bool = False,
+    changed_only: bool = False,
+    on_saved: Optional[Callable[[List[Dict], List[Dict]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a dataset into the database
+
+    Args:
+        scraper: TikTokScraper used to read the dataset (async client)
+        db: Storage backend; nothing is written when it is None or offline
+        dataset_id: Apify dataset ID
+        comments_per_video: Extract comments when > 0
+        batch_size / transform / on_flush / changed_only / on_saved: See ingest_pages
+        limit / since_date / time_ordered: Passed to TikTokScraper.aiter_mapped
+        offset: Dataset offset to start reading from
+
+    Returns:
+        Dictionary with pages, videos, comments, saved_videos, saved_comments, offset and seconds
+    """
+    pages = scraper.aiter_mapped(
+        dataset_id, comments_per_video=comments_per_video,
+        offset=offset, limit=limit, since_date=since_date, time_ordered=time_ordered
+    )
+    return await ingest_pages(
+        pages, db, batch_size=batch_size, transform=transform,
+        offset=offset, on_flush=on_flush, changed_only=changed_only, on_saved=on_saved
+    )
+
+
+async def ingest_fanout(
+    scraper,
+    db,
+    scrape_type: str,
+    search_input: str,
+    count: Optional[int] = None,
+    since_date=None,
+    comments_per_video: int = 0,
+    batch_size: int = INGEST_BATCH_SIZE,
+    transform: Optional[Callable[[List[Dict], List[Dict]], Tuple[List[Dict], List[Dict]]]] = None,
+    max_concurrency: Optional[int] = None,
+    cutoffs: Optional[Dict[str, Any]] = None,
+    changed_only: bool = False,
+    on_flush: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_saved: Optional[Callable[[List[Dict], List[Dict]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Fan a multi-target scrape out to one run per target and stream every run into the database
+
+    Returns:
+        The ingest_pages stats plus 'targets', the per-target reports of TikTokScraper.scrape_fanout
+    """
+    reports = []
+
+    async def pages():
+        async for _, videos, comments, report in scraper.scrape_fanout(
+            scrape_type, search_input, count=count, since_date=since_date,
+            comments_per_video=comments_per_video, max_concurrency=max_concurrency, cutoffs=cutoffs
+        ):
+            if report is not None:
+                reports.append(report)
+            else:
+                yield None, videos, comments
+
+    stats = await ingest_pages(
+        pages(), db, batch_size=batch_size, transform=transform,
+        offset=None, on_flush=on_flush, changed_only=changed_only, on_saved=on_saved
+    )
+    stats["targets"] = reports
+    return stats
@@ -0,0 +1,356 @@
+"""
+Durable job queue for webhook result processing.
+
+Jobs live in a SQLite file, so a restart does not lose them. Each job has an
+idempotency key (the Apify runId): a redelivered webhook for a job that is
+queued, running or done is a no-op. Workers lease a job for a visibility
+timeout and extend the lease while they work. If a worker dies, its lease runs
+out and another worker picks the job up. Failed jobs are retried with
+exponential backoff until JOB_MAX_ATTEMPTS. Several processes may share one
+queue file, since a job is claimed inside a write transaction.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+try:
+    from .metrics import REGISTRY
+except (ImportError, ValueError):
+    from metrics import REGISTRY
+
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Seconds a claimed job stays invisible to other workers; running jobs renew it every third of that
+JOB_VISIBILITY_TIMEOUT = float(os.environ.get("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# A failed attempt waits JOB_RETRY_BACKOFF * 2^(attempt - 1) seconds before it is retried
+JOB_RETRY_BACKOFF = float(os.environ.get("JOB_RETRY_BACKOFF", 30))
+# Finished jobs are kept this many seconds (for idempotency and inspection), then purged
+JOB_RETENTION = float(os.environ.get("JOB_RETENTION", 7 * 86400))
+# Idle workers also poll this often, for retries and jobs queued by other processes
+POLL_INTERVAL = 1.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+JOB_SECONDS = REGISTRY.histogram("pulse_job_seconds", "Duration of each job attempt", ("kind", "outcome"))
+JOB_FAILURES = REGISTRY.counter("pulse_job_failures_total", "Failed job attempts", ("kind",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    leased_until REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    last_error TEXT,
+    result TEXT
+)
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)"
+
+
+def default_queue_path() -> str:
+    """SQLite path from JOB_QUEUE_PATH, else the temp dir (writable on Vercel)"""
+    return os.environ.get("JOB_QUEUE_PATH") or os.path.join(tempfile.gettempdir(), "webhook_jobs.sqlite3")
+
+
+class JobQueue:
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_backoff: float = JOB_RETRY_BACKOFF,
+    ):
+        """
+        Open (or create) the queue
+
+        Args:
+            db_path: SQLite file, or ":memory:". Defaults to JOB_QUEUE_PATH.
+            visibility_timeout: Seconds a claimed job is leased to its worker
+            max_attempts: Attempts before a job is marked failed
+            retry_backoff: Base delay in seconds before a failed attempt is retried
+        """
+        self.db_path = db_path or default_queue_path()
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        # Autocommit; claim() opens its own write transaction
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        if self.db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.execute(INDEX)
+
+    def enqueue(self, kind: str, key: str, payload: Dict[str, Any]) -> Tuple[int, bool]:
+        """
+        Add a job unless one with the same key exists
+
+        A key whose job failed for good is queued again with fresh attempts.
+
+        Returns:
+            (job id, True if the job was queued by this call)
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, key, payload, status, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload), QUEUED, now, now),
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid, True
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, payload = ?, last_error = NULL "
+                "WHERE key = ? AND status = ?",
+                (QUEUED, now, json.dumps(payload), key, FAILED),
+            )
+            row = self._conn.execute("SELECT id FROM jobs WHERE key = ?", (key,)).fetchone()
+            return row["id"], bool(cursor.rowcount)
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next ready job: a queued one that is due, or a running one whose lease ran out
+
+        Jobs whose lease ran out on their last attempt are marked failed instead.
+
+        Returns:
+            The job (id, kind, key, payload, attempts), or None when nothing is ready
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, leased_until = NULL, "
+                    "last_error = 'lease expired on the last attempt' "
+                    "WHERE status = ? AND leased_until < ? AND attempts >= ?",
+                    (FAILED, now, RUNNING, now, self.max_attempts),
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND leased_until < ?) "
+                    "ORDER BY available_at, id LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, leased_until = ?, "
+                    "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                    (RUNNING, now + self.visibility_timeout, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {
+            "id": row["id"], "kind": row["kind"], "key": row["key"],
+            "payload": json.loads(row["payload"]), "attempts": row["attempts"] + 1,
+        }
+
+    def extend(self, job_id: int):
+        """Renew a running job's lease for another visibility timeout"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET leased_until = ? WHERE id = ? AND status = ?",
+                (time.time() + self.visibility_timeout, job_id, RUNNING),
+            )
+
+    def complete(self, job_id: int, result: Any = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, leased_until = NULL, result = ?, last_error = NULL "
+                "WHERE id = ?",
+                (SUCCEEDED, time.time(), json.dumps(result, default=str), job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """
+        Record a failed attempt: queue a retry with backoff, or mark the job failed after max_attempts
+
+        Returns:
+            True if the job will be retried
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] if row else self.max_attempts
+            if attempts < self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, leased_until = NULL, last_error = ? WHERE id = ?",
+                    (QUEUED, now + self.retry_backoff * 2 ** (attempts - 1), error, job_id),
+                )
+                return True
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, leased_until = NULL, last_error = ? WHERE id = ?",
+                (FAILED, now, error, job_id),
+            )
+            return False
+
+    def release(self, job_id: int):
+        """Hand a running job back without counting the attempt (worker shutting down)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), available_at = ?, leased_until = NULL "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, RUNNING),
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A job by its key, without its payload"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+        return self._public(row) if row else None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently created jobs, without their payloads"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._public(row) for row in rows]
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        """Delete finished jobs older than older_than seconds"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, time.time() - older_than),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Jobs per status, ready depth and the age of the oldest ready job"""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            ready, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(available_at) FROM jobs WHERE status = ? AND available_at <= ?",
+                (QUEUED, now),
+            ).fetchone()
+        stats = {status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        stats["ready"] = ready
+        stats["oldest_ready_seconds"] = round(now - oldest, 3) if oldest else 0.0
+        stats["path"] = self.db_path
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _public(row) -> Dict[str, Any]:
+        job = {k: row[k] for k in row.keys() if k != "payload"}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobWorkers:
+    """
+    A pool of asyncio workers draining a JobQueue on the app's event loop
+
+    Handlers are async functions of the job payload, looked up by job kind; an
+    exception fails the attempt (and schedules a retry).
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]],
+                 workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._busy = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    def start(self):
+        """Start the workers on the running event loop (no-op if they are running)"""
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(i)) for i in range(self.workers)]
+        print(f"[INFO] Started {self.workers} job workers on {self.queue.db_path}")
+
+    def notify(self):
+        """Wake idle workers after a job was queued in this process"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        """Cancel the workers; jobs they were running are released back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, whether the workers are alive, and how many are running a job"""
+        return {"workers": self.workers, "workers_alive": self.running, "busy": self._busy}
+
+    async def _work(self, index: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Job worker {index} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]):
+        handler = self.handlers.get(job["kind"])
+        renew = asyncio.create_task(self._renew(job["id"]))
+        started = time.perf_counter()
+        self._busy += 1
+        outcome = "succeeded"
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job['kind']}'")
+            result = await handler(job["payload"])
+            await asyncio.to_thread(self.queue.complete, job["id"], result)
+        except asyncio.CancelledError:
+            outcome = "released"
+            self.queue.release(job["id"])
+            raise
+        except Exception as e:
+            retry = await asyncio.to_thread(self.queue.fail, job["id"], f"{type(e).__name__}: {e}")
+            outcome = "retried" if retry else "failed"
+            JOB_FAILURES.inc(kind=job["kind"])
+            print(f"[ERROR] Job {job['key']} ({job['kind']}) attempt {job['attempts']} failed"
+                  f"{', retrying' if retry else ''}: {e}")
+        finally:
+            self._busy -= 1
+            renew.cancel()
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=job["kind"], outcome=outcome)
+
+    async def _renew(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            try:
+                await asyncio.to_thread(self.queue.extend, job_id)
+            except Exception as e:
+                print(f"[WARN] Could not extend the lease of job {job_id}: {e}")
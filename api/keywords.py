@@ -0,0 +1,142 @@
+"""
+Keyword-group matching engine.
+
+Each KeywordGroup is compiled once into an Aho-Corasick automaton for its
+keywords and another for its exclude_keywords, so a text is scanned in a
+single pass no matter how many keywords the group has.
+"""
+from collections import deque
+from functools import lru_cache
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+
+def _is_word_char(ch: str) -> bool:
+    """ASCII word character, matching the JavaScript \\b the dashboard used"""
+    return ch == '_' or ('a' <= ch <= 'z') or ('A' <= ch <= 'Z') or ('0' <= ch <= '9')
+
+
+def _is_boundary(text: str, pos: int) -> bool:
+    """True if there is a word boundary between text[pos - 1] and text[pos]"""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+class AhoCorasick:
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Build the automaton
+
+        Args:
+            patterns: Lowercased patterns; empty strings are ignored
+        """
+        self.patterns = sorted({p for p in patterns if p})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Lengths of the patterns ending at each state (including via fail links)
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for pattern in self.patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (len(pattern),)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def iter_matches(self, text: str):
+        """Yield (start, end) for every pattern occurrence in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length in out[state]:
+                yield i + 1 - length, i + 1
+
+    def search(self, text: str, whole_word: bool = False) -> bool:
+        """True if any pattern occurs in text (as a whole word when whole_word is set)"""
+        for start, end in self.iter_matches(text):
+            if not whole_word or (_is_boundary(text, start) and _is_boundary(text, end)):
+                return True
+        return False
+
+
+class KeywordMatcher:
+    def __init__(self, keywords: Iterable[str], exclude_keywords: Iterable[str] = (), exact_match: bool = False):
+        """
+        Compile a keyword group
+
+        Args:
+            keywords: Texts matching any of these are included
+            exclude_keywords: Texts containing any of these, even inside a word, are dropped
+            exact_match: Match keywords as whole words only
+        """
+        self.exact_match = exact_match
+        self.include = AhoCorasick(k.lower().strip() for k in keywords or [])
+        self.exclude = AhoCorasick(k.lower().strip() for k in exclude_keywords or [])
+
+    @classmethod
+    def from_group(cls, group: Dict[str, Any]) -> "KeywordMatcher":
+        return cls(group.get("keywords", []), group.get("exclude_keywords", []), group.get("exact_match", False))
+
+    def matches(self, text: str) -> bool:
+        """Apply the group to one lowercased text"""
+        # Exclusions are substring matches whatever exact_match says, as in the dashboard's filter
+        if self.exclude and self.exclude.search(text, False):
+            return False
+        return self.include.search(text, self.exact_match)
+
+    def match_frame(self, df: pd.DataFrame) -> pd.Series:
+        """Boolean mask of the videos in df that belong to the group"""
+        if df.empty:
+            return pd.Series([], dtype=bool, index=df.index)
+        return video_text(df).map(self.matches).astype(bool)
+
+
+def video_text(df: pd.DataFrame) -> pd.Series:
+    """Lowercased caption plus space-separated hashtags, the text a group is matched against"""
+    caption = df['caption'].fillna('').astype(str) if 'caption' in df.columns else pd.Series('', index=df.index)
+    if 'hashtags' in df.columns:
+        tags = df['hashtags'].fillna('').astype(str).str.split(',').map(lambda parts: ' '.join(p.strip() for p in parts if p.strip()))
+    else:
+        tags = pd.Series('', index=df.index)
+    return (caption + ' ' + tags).str.lower()
+
+
+@lru_cache(maxsize=64)
+def _compiled(group_key: str) -> KeywordMatcher:
+    return KeywordMatcher.from_group(json.loads(group_key))
+
+
+def get_matcher(group: Dict[str, Any]) -> KeywordMatcher:
+    """Compiled matcher for a group, reused until the group definition changes"""
+    key = json.dumps({
+        "keywords": group.get("keywords", []),
+        "exclude_keywords": group.get("exclude_keywords", []),
+        "exact_match": bool(group.get("exact_match", False)),
+    }, sort_keys=True)
+    return _compiled(key)
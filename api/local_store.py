@@ -0,0 +1,462 @@
+"""
+Embedded storage backend: DuckDB when it is installed, SQLite otherwise.
+
+Implements the Storage interface with the same upsert and keyset-paging
+semantics as Supabase, and pushes the dashboard aggregates down to SQL so they
+never leave the database as raw rows. Dates are stored as
+'YYYY-MM-DD HH:MM:SS' text, which sorts chronologically in both engines.
+"""
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    from .storage import Storage, PAGE_KEYS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, until_bound, StorageError
+    from .analysis import TIMELINE_MAX_POINTS
+except ImportError:
+    from storage import Storage, PAGE_KEYS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, until_bound, StorageError
+    from analysis import TIMELINE_MAX_POINTS
+
+
+TABLES = {
+    "videos": {
+        "video_id": "VARCHAR PRIMARY KEY",
+        "video_url": "VARCHAR",
+        "caption": "VARCHAR",
+        "author": "VARCHAR",
+        "likes": "BIGINT",
+        "comments": "BIGINT",
+        "shares": "BIGINT",
+        "saves": "BIGINT",
+        "views": "BIGINT",
+        "publish_date": "VARCHAR",
+        "hashtags": "VARCHAR",
+        "mentions": "VARCHAR",
+        "thumbnail_url": "VARCHAR",
+        "sentiment": "VARCHAR",
+        "sentiment_score": "DOUBLE",
+        "engagement_rate": "DOUBLE",
+        "scorer_version": "INTEGER",
+        "content_hash": "VARCHAR",
+    },
+    "comments": {
+        "comment_id": "VARCHAR PRIMARY KEY",
+        "video_id": "VARCHAR",
+        "author": "VARCHAR",
+        "text": "VARCHAR",
+        "likes": "BIGINT",
+        "date": "VARCHAR",
+        "sentiment": "VARCHAR",
+        "sentiment_score": "DOUBLE",
+        "scorer_version": "INTEGER",
+        "content_hash": "VARCHAR",
+    },
+    "scrape_watermarks": {
+        "scrape_type": "VARCHAR NOT NULL",
+        "target": "VARCHAR NOT NULL",
+        "newest_publish_date": "VARCHAR NOT NULL",
+        "updated_at": "VARCHAR",
+    },
+    "ingest_runs": {
+        "run_id": "VARCHAR PRIMARY KEY",
+        "dataset_id": "VARCHAR",
+        "status": "VARCHAR NOT NULL",
+        "dataset_offset": "BIGINT NOT NULL",
+        "pages": "BIGINT",
+        "videos": "BIGINT",
+        "comments": "BIGINT",
+        "saved_videos": "BIGINT",
+        "saved_comments": "BIGINT",
+        "updated_at": "VARCHAR",
+        "finished_at": "VARCHAR",
+    },
+}
+TABLE_CONSTRAINTS = {"scrape_watermarks": ", PRIMARY KEY (scrape_type, target)"}
+
+# Keyset indexes for SQLite; DuckDB scans columns with min/max zone maps instead,
+# and ART indexes would slow its upserts down
+SQLITE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS videos_publish_date_video_id_idx ON videos (publish_date DESC, video_id DESC)",
+    "CREATE INDEX IF NOT EXISTS videos_author_idx ON videos (author)",
+    "CREATE INDEX IF NOT EXISTS videos_scorer_version_idx ON videos (scorer_version)",
+    "CREATE INDEX IF NOT EXISTS comments_date_comment_id_idx ON comments (date DESC, comment_id DESC)",
+    "CREATE INDEX IF NOT EXISTS comments_video_id_idx ON comments (video_id)",
+    "CREATE INDEX IF NOT EXISTS comments_scorer_version_idx ON comments (scorer_version)",
+)
+
+DATE_COLUMNS = {"publish_date", "date", "newest_publish_date"}
+METRICS = ("views", "likes", "comments", "shares", "saves")
+# Ids per IN (...) lookup
+LOOKUP_SIZE = 500
+
+
+def default_local_path(engine: str) -> str:
+    """Database file from LOCAL_DB_PATH, else the temp dir"""
+    suffix = "duckdb" if engine == "duckdb" else "sqlite3"
+    return os.environ.get("LOCAL_DB_PATH") or os.path.join(tempfile.gettempdir(), f"tiktok_pulse.{suffix}")
+
+
+def to_db_time(value) -> Optional[str]:
+    """Normalize a date or timestamp to the stored 'YYYY-MM-DD HH:MM:SS' text"""
+    if value is None:
+        return None
+    if isinstance(value, str) and len(value) == 19 and value[10] == " ":
+        return value
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    if pd.isna(ts):
+        return None
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LocalStore(Storage):
+    name = "local"
+
+    def __init__(self, path: Optional[str] = None, engine: Optional[str] = None):
+        """
+        Open (or create) the embedded database
+
+        Args:
+            path: Database file, or ":memory:". Defaults to LOCAL_DB_PATH.
+            engine: 'duckdb' or 'sqlite'. Defaults to LOCAL_DB_ENGINE, else DuckDB if installed.
+        """
+        engine = engine or os.environ.get("LOCAL_DB_ENGINE") or ("duckdb" if duckdb else "sqlite")
+        if engine == "duckdb" and duckdb is None:
+            print("[WARN] duckdb is not installed (pip install duckdb), using SQLite for the local store")
+            engine = "sqlite"
+        self.engine = engine
+        self.path = path or default_local_path(engine)
+        self._lock = threading.RLock()
+        self.conn = None
+
+        try:
+            if engine == "duckdb":
+                self.conn = duckdb.connect(self.path)
+            else:
+                import sqlite3
+                self.conn = sqlite3.connect(self.path, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+        except Exception as e:
+            print(f"[ERROR] Local store unavailable at {self.path}: {e}")
+            self.conn = None
+
+    def _create_schema(self):
+        for table, columns in TABLES.items():
+            body = ", ".join(f"{name} {kind}" for name, kind in columns.items())
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({body}{TABLE_CONSTRAINTS.get(table, '')})")
+        if self.engine == "sqlite":
+            for statement in SQLITE_INDEXES:
+                self.conn.execute(statement)
+            self.conn.commit()
+
+    def is_connected(self) -> bool:
+        return self.conn is not None
+
+    def health(self) -> Dict[str, Any]:
+        return {"engine": self.engine, "path": self.path}
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _fetchall(self, sql: str, params=()) -> List[Tuple]:
+        with self._lock:
+            return self.conn.execute(sql, list(params)).fetchall()
+
+    def _query_df(self, sql: str, params=()) -> pd.DataFrame:
+        with self._lock:
+            if self.engine == "duckdb":
+                return self.conn.execute(sql, list(params)).df()
+            return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def upsert_chunked(self, table: str, rows: List[Dict[str, Any]], on_conflict: str, **kwargs) -> int:
+        """
+        Insert or update rows by their conflict key(s) in one transaction.
+        Only the columns present on a row are updated, so unscored rows keep stored scores.
+        Chunking options of SupabaseManager.upsert_chunked are accepted and ignored.
+        """
+        if not self.conn or not rows:
+            return 0
+
+        key_columns = [c.strip() for c in on_conflict.split(",")]
+        known = TABLES[table]
+        rows = list({tuple(row[c] for c in key_columns): row for row in rows}.values())
+
+        # Rows with and without score columns are written by separate statements
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(c for c in known if c in row), []).append(row)
+
+        try:
+            with self._lock:
+                for columns, group in groups.items():
+                    self._upsert_group(table, columns, key_columns, group)
+                if self.engine == "sqlite":
+                    self.conn.commit()
+        except Exception as e:
+            if self.engine == "sqlite":
+                self.conn.rollback()
+            print(f"[ERROR] Local upsert into {table} ({len(rows)} rows) failed: {e}")
+            return 0
+        return len(rows)
+
+    def _upsert_group(self, table, columns, key_columns, rows):
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in key_columns)
+        conflict = f"ON CONFLICT ({', '.join(key_columns)}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING")
+        column_list = ", ".join(columns)
+        values = [
+            [to_db_time(row.get(c)) if c in DATE_COLUMNS else row.get(c) for c in columns]
+            for row in rows
+        ]
+
+        if self.engine == "duckdb":
+            # Bulk insert from a registered frame; executemany is row-at-a-time in DuckDB
+            batch = pd.DataFrame(values, columns=list(columns))
+            self.conn.register("upsert_batch", batch)
+            try:
+                self.conn.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM upsert_batch {conflict}")
+            finally:
+                self.conn.unregister("upsert_batch")
+        else:
+            placeholders = ", ".join("?" for _ in columns)
+            self.conn.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) {conflict}", values)
+
+    def _filters(self, table, since=None, until=None, author=None, hashtag=None, video_ids=None):
+        """WHERE clauses and parameters for the get_page filters"""
+        date_col = PAGE_KEYS[table][0]
+        clauses, params = [], []
+        if since:
+            clauses.append(f"{date_col} >= ?")
+            params.append(to_db_time(since))
+        if until:
+            inclusive, bound = until_bound(until)
+            clauses.append(f"{date_col} {'<=' if inclusive else '<'} ?")
+            params.append(to_db_time(bound))
+        if author:
+            clauses.append("author = ?")
+            params.append(author.lstrip("@"))
+        if hashtag and table == "videos":
+            # A whole entry of the ', '-separated list, case-insensitive
+            tag = hashtag.lstrip("#").strip().lower()
+            tag = tag.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("(', ' || lower(hashtags) || ',') LIKE ? ESCAPE '\\'")
+            params.append(f"%, {tag},%")
+        if video_ids is not None:
+            clauses.append(f"video_id IN ({', '.join('?' for _ in video_ids)})")
+            params.extend(str(v) for v in video_ids)
+        return clauses, params
+
+    def get_page(
+        self,
+        table: str,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        author: Optional[str] = None,
+        hashtag: Optional[str] = None,
+        video_ids: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """
+        Fetch one page of a table, newest first (same contract as SupabaseManager.get_page)
+        """
+        if not self.conn:
+            return pd.DataFrame(), None
+        if video_ids is not None and not video_ids:
+            return pd.DataFrame(), None
+
+        date_col, id_col = PAGE_KEYS[table]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        select = list(TABLES[table])
+        if columns:
+            select = [c for c in dict.fromkeys([date_col, id_col, *columns]) if c in TABLES[table]]
+
+        clauses, params = self._filters(table, since, until, author, hashtag, video_ids)
+        if cursor:
+            last_date, last_id = decode_cursor(cursor)
+            clauses.append(f"({date_col} < ? OR ({date_col} = ? AND {id_col} < ?))")
+            params.extend([last_date, last_date, last_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            df = self._query_df(
+                f"SELECT {', '.join(select)} FROM {table} {where} "
+                f"ORDER BY {date_col} DESC, {id_col} DESC LIMIT ?",
+                params + [limit]
+            )
+        except Exception as e:
+            print(f"[ERROR] Local get_page({table}) error: {e}")
+            raise StorageError(f"{self.name} get_page({table}) failed: {e}") from e
+
+        next_cursor = None
+        if len(df) == limit:
+            last = df.iloc[-1]
+            next_cursor = encode_cursor(last[date_col], last[id_col])
+        return (df if not df.empty else pd.DataFrame()), next_cursor
+
+    def get_unscored(self, table: str, scorer_version: int, limit: int = 1000) -> pd.DataFrame:
+        if not self.conn:
+            return pd.DataFrame()
+        try:
+            df = self._query_df(
+                f"SELECT * FROM {table} WHERE scorer_version IS NULL OR scorer_version < ? LIMIT ?",
+                [scorer_version, int(limit)]
+            )
+            return df if not df.empty else pd.DataFrame()
+        except Exception as e:
+            print(f"[ERROR] Local get_unscored error: {e}")
+            return pd.DataFrame()
+
+    def get_watermarks(self, scrape_type: str, targets: List[str]) -> Dict[str, datetime]:
+        if not self.conn or not targets:
+            return {}
+        try:
+            rows = self._fetchall(
+                f"SELECT target, newest_publish_date FROM scrape_watermarks "
+                f"WHERE scrape_type = ? AND target IN ({', '.join('?' for _ in targets)})",
+                [scrape_type, *targets]
+            )
+            return {target: datetime.fromisoformat(newest) for target, newest in rows if newest}
+        except Exception as e:
+            print(f"[ERROR] Local get_watermarks error: {e}")
+            return {}
+
+    def get_ingest_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        if not self.conn:
+            return None
+        try:
+            df = self._query_df("SELECT * FROM ingest_runs WHERE run_id = ?", [str(run_id)])
+            return _plain(df.to_dict(orient="records"))[0] if not df.empty else None
+        except Exception as e:
+            print(f"[ERROR] Local get_ingest_run error: {e}")
+            return None
+
+    def _stored_hashes(self, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        id_col = PAGE_KEYS[table][1]
+        stored = {}
+        for i in range(0, len(ids), LOOKUP_SIZE):
+            chunk = ids[i:i + LOOKUP_SIZE]
+            stored.update(self._fetchall(
+                f"SELECT {id_col}, content_hash FROM {table} WHERE {id_col} IN ({', '.join('?' for _ in chunk)})",
+                chunk
+            ))
+        return stored
+
+    def aggregate_videos(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        author: Optional[str] = None,
+        hashtag: Optional[str] = None,
+        top_n: int = 10,
+        timelines=("hourly", "daily", "weekly"),
+        max_points: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        TikTokAnalyzer.build_aggregates computed in SQL, in three queries.
+        Rows are grouped to hours in the database; the hour buckets (a few thousand
+        rows at most) are then resampled to days and weeks with the same labels as pandas.
+        """
+        if not self.conn:
+            return None
+
+        clauses, params = self._filters("videos", since, until, author, hashtag)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sums = ", ".join(f"CAST(SUM(COALESCE({m}, 0)) AS BIGINT) AS {m}" for m in METRICS)
+
+        try:
+            # One scan yields the timelines, the KPI totals and the sentiment counts:
+            # totals are sums of the hour buckets (plus the bucket of undated rows)
+            hours = self._query_df(
+                f"SELECT substr(publish_date, 1, 13) AS hour, COUNT(video_id) AS video_count, {sums}, "
+                f"COUNT(*) AS row_count, SUM(engagement_rate) AS engagement_sum, COUNT(engagement_rate) AS engagement_count, "
+                f"COUNT(*) FILTER (WHERE sentiment = 'positive') AS positive, "
+                f"COUNT(*) FILTER (WHERE sentiment = 'neutral') AS neutral, "
+                f"COUNT(*) FILTER (WHERE sentiment = 'negative') AS negative "
+                f"FROM videos {where} GROUP BY hour",
+                params
+            )
+            count = int(hours["row_count"].sum()) if not hours.empty else 0
+            kpis = {"videos": count, **{m: int(hours[m].sum()) if count else 0 for m in METRICS}}
+            engagement_count = hours["engagement_count"].sum() if count else 0
+            kpis["avg_engagement_rate"] = round(float(hours["engagement_sum"].sum() / engagement_count), 2) if engagement_count else 0.0
+            sentiment = {label: int(hours[label].sum()) if count else 0 for label in ("positive", "neutral", "negative")}
+
+            series = {name: [] for name in timelines}
+            if count and series:
+                buckets = hours[["hour", "video_count", *METRICS]]
+                series = self._timelines(buckets, timelines, {**TIMELINE_MAX_POINTS, **(max_points or {})})
+
+            top_posts = []
+            if count:
+                posts = self._query_df(
+                    f"SELECT video_id, video_url, caption, author, publish_date, "
+                    f"{', '.join(f'COALESCE({m}, 0) AS {m}' for m in METRICS)}, engagement_rate, sentiment "
+                    f"FROM videos {where} ORDER BY COALESCE(views, 0) DESC, video_id LIMIT ?",
+                    params + [int(top_n)]
+                )
+                posts["caption"] = posts["caption"].fillna("").astype(str).str.slice(0, 140)
+                posts["engagement_rate"] = pd.to_numeric(posts["engagement_rate"], errors="coerce").round(2)
+                top_posts = posts.astype(object).where(posts.notna(), None).to_dict(orient="records")
+
+            top_authors = []
+            if count:
+                authors = self._query_df(
+                    f"SELECT author, COUNT(video_id) AS video_count, "
+                    f"CAST(SUM(COALESCE(views, 0)) AS BIGINT) AS views, CAST(SUM(COALESCE(likes, 0)) AS BIGINT) AS likes, "
+                    f"AVG(engagement_rate) AS avg_engagement_rate "
+                    f"FROM videos {where} GROUP BY author HAVING author IS NOT NULL ORDER BY views DESC, author LIMIT ?",
+                    params + [int(top_n)]
+                )
+                authors["avg_engagement_rate"] = pd.to_numeric(authors["avg_engagement_rate"], errors="coerce").round(2)
+                top_authors = authors.astype(object).where(authors.notna(), None).to_dict(orient="records")
+        except Exception as e:
+            print(f"[ERROR] Local aggregate_videos error: {e}")
+            return None
+
+        return {
+            "kpis": kpis,
+            "sentiment": sentiment,
+            "timelines": series,
+            "top_posts": _plain(top_posts),
+            "top_authors": _plain(top_authors),
+        }
+
+    @staticmethod
+    def _timelines(hours: pd.DataFrame, timelines, max_points) -> Dict[str, List[Dict[str, Any]]]:
+        series = {}
+        hours = hours.dropna(subset=["hour"])
+        if hours.empty:
+            return {name: [] for name in timelines}
+        hours.index = pd.to_datetime(hours.pop("hour"), format="%Y-%m-%d %H", errors="coerce")
+        hours = hours[hours.index.notna()].sort_index()
+        for name, freq, fmt in (("hourly", "h", "%Y-%m-%d %H:00"), ("daily", "D", "%Y-%m-%d"), ("weekly", "W", "%Y-%m-%d")):
+            if name not in timelines:
+                continue
+            agg = hours.resample(freq).sum().tail(max_points[name]).astype("int64")
+            agg.insert(0, "date", agg.index.strftime(fmt))
+            series[name] = agg.to_dict(orient="records")
+        return series
+
+
+def _plain(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """numpy scalars to Python types so records serialize as JSON"""
+    return [{k: v.item() if hasattr(v, "item") else v for k, v in r.items()} for r in records]
@@ -0,0 +1,211 @@
+"""
+Bulk mapper from raw Apify items (clockworks/tiktok-scraper) to typed columns.
+
+A page of items is mapped in one pass into column lists: integer metrics and
+epoch-second timestamps, with hashtags and mentions pulled out by precompiled
+patterns. Dates stay numeric through filtering and are formatted only when a
+page is turned into records or rows (vectorized, in server local time like
+datetime.fromtimestamp).
+"""
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .records import VideoRecord, CommentRecord
+except (ImportError, ValueError):
+    from records import VideoRecord, CommentRecord
+
+
+HASHTAG_RE = re.compile(r'#(\w+)')
+MENTION_RE = re.compile(r'@(\w+)')
+
+VIDEO_FIELDS = ('video_id', 'video_url', 'caption', 'author', 'likes', 'comments', 'shares',
+                'saves', 'views', 'publish_ts', 'hashtags', 'mentions', 'thumbnail_url')
+COMMENT_FIELDS = ('comment_id', 'video_id', 'text', 'author', 'date_ts', 'likes')
+
+# Columns holding epoch seconds, and the date column each becomes in rows
+EPOCH_COLUMNS = {'publish_ts': 'publish_date', 'date_ts': 'date'}
+
+
+def extract_hashtags(caption) -> str:
+    """Comma-separated hashtags of a caption"""
+    if not caption: return ""
+    return ', '.join(HASHTAG_RE.findall(caption))
+
+
+def extract_mentions(caption) -> str:
+    """Comma-separated @mentions of a caption"""
+    if not caption: return ""
+    return ', '.join(MENTION_RE.findall(caption))
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def item_epoch(item: Dict[str, Any]) -> Optional[int]:
+    """Publish time of a raw item (or nested comment) in epoch seconds, or None if it has none"""
+    if 'createTime' in item:
+        try: return int(item['createTime'])
+        except (TypeError, ValueError): return None
+    if 'createTimeISO' in item:
+        try: return int(datetime.fromisoformat(item['createTimeISO'].replace('Z', '+00:00')).timestamp())
+        except (AttributeError, TypeError, ValueError): return None
+    return None
+
+
+def map_items(
+    items: Iterable[Dict[str, Any]],
+    extract_comments: bool = False,
+    since_ts: Optional[int] = None,
+    time_ordered: bool = False,
+) -> Tuple[Dict[str, list], Dict[str, list], bool]:
+    """
+    Map a page of raw items into video and comment columns
+
+    Args:
+        items: Raw dataset items
+        extract_comments: Also map the comments nested in each item
+        since_ts: Drop videos published before this epoch second
+        time_ordered: Items are newest first across the whole dataset, as in a single-profile
+            run, so the first unpinned video before since_ts ends the page. A run over several
+            profiles is only newest first per profile and must not set it.
+
+    Returns:
+        (video columns, comment columns, done) where done is True once since_ts was reached.
+        Undated videos and comments get the mapping time, as the per-item mapper always did.
+    """
+    videos = {f: [] for f in VIDEO_FIELDS}
+    comments = {f: [] for f in COMMENT_FIELDS}
+    now = int(time.time())
+    done = False
+
+    v_id, v_url, v_caption, v_author = videos['video_id'], videos['video_url'], videos['caption'], videos['author']
+    v_likes, v_comments, v_shares, v_saves, v_views = (
+        videos['likes'], videos['comments'], videos['shares'], videos['saves'], videos['views'])
+    v_ts, v_tags, v_mentions, v_thumb = videos['publish_ts'], videos['hashtags'], videos['mentions'], videos['thumbnail_url']
+    find_tags, find_mentions = HASHTAG_RE.findall, MENTION_RE.findall
+
+    for item in items:
+        try:
+            ts = item_epoch(item)
+            if since_ts is not None and ts is not None and ts < since_ts:
+                # Pinned videos sit at the top of a profile regardless of age
+                if time_ordered and not item.get('isPinned'):
+                    done = True
+                    break
+                continue
+
+            meta = item.get('videoMeta') or {}
+            text = item.get('text') or ''
+            video_id = item.get('id', meta.get('id', ''))
+            video_id = '' if video_id is None else str(video_id)
+            tags = item.get('hashtags') or []
+            row = (
+                video_id,
+                item.get('webVideoUrl') or '',
+                text,
+                (item.get('authorMeta') or {}).get('name') or '',
+                _int(item.get('diggCount')),
+                _int(item.get('commentCount')),
+                _int(item.get('shareCount')),
+                _int(item.get('collectCount')),
+                _int(item.get('playCount')),
+                now if ts is None else ts,
+                ', '.join([t.get('name', '') for t in tags]) or ', '.join(find_tags(text)),
+                ', '.join(find_mentions(text)),
+                item.get('coverUrl', meta.get('coverUrl', '')) or '',
+            )
+        except Exception as e:
+            print(f"Error mapping item: {e}")
+            continue
+
+        v_id.append(row[0]); v_url.append(row[1]); v_caption.append(row[2]); v_author.append(row[3])
+        v_likes.append(row[4]); v_comments.append(row[5]); v_shares.append(row[6]); v_saves.append(row[7])
+        v_views.append(row[8]); v_ts.append(row[9]); v_tags.append(row[10]); v_mentions.append(row[11])
+        v_thumb.append(row[12])
+
+        if extract_comments:
+            for c in item.get('comments') or []:
+                try:
+                    # Missing or unparseable times fall back to the mapping time instead of dropping the comment
+                    c_ts = item_epoch(c)
+                    c_row = (
+                        str(c.get('id', '')), video_id, c.get('text') or '', c.get('authorUniqueId') or '',
+                        now if c_ts is None else c_ts, _int(c.get('diggCount')),
+                    )
+                except Exception:
+                    continue
+                for field, value in zip(COMMENT_FIELDS, c_row):
+                    comments[field].append(value)
+
+    return videos, comments, done
+
+
+def local_datetimes(epochs) -> np.ndarray:
+    """
+    Epoch seconds to naive local wall time (datetime64[s]), vectorized.
+    UTC offsets are looked up once per distinct day, or per hour on the rare days where
+    the offset changes (zones switch offsets on hour boundaries).
+    """
+    epochs = np.asarray(epochs, dtype='int64')
+    if not len(epochs):
+        return epochs.astype('datetime64[s]')
+    days, inverse = np.unique(epochs // 86400, return_inverse=True)
+    offsets = np.empty(len(days), dtype='int64')
+    shifting = []
+    for i, day in enumerate(days.tolist()):
+        start = time.localtime(day * 86400).tm_gmtoff
+        offsets[i] = start
+        if time.localtime(day * 86400 + 86399).tm_gmtoff != start:
+            shifting.append(i)
+    result = epochs + offsets[inverse]
+    for i in shifting:
+        mask = inverse == i
+        result[mask] = [ts + time.localtime(ts - ts % 3600).tm_gmtoff for ts in epochs[mask].tolist()]
+    return result.astype('datetime64[s]')
+
+
+def format_epochs(epochs) -> List[str]:
+    """Epoch seconds to 'YYYY-MM-DD HH:MM:SS' local time strings"""
+    if not len(epochs):
+        return []
+    return [s.replace('T', ' ') for s in local_datetimes(epochs).astype(str).tolist()]
+
+
+def column_rows(columns: Dict[str, list]) -> List[Dict[str, Any]]:
+    """Turn mapped columns into row dicts, formatting epoch columns as date strings"""
+    names = [EPOCH_COLUMNS.get(name, name) for name in columns]
+    values = [format_epochs(v) if name in EPOCH_COLUMNS else v for name, v in columns.items()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def column_records(columns: Dict[str, list], cls) -> list:
+    """
+    Turn mapped columns into VideoRecord or CommentRecord instances. Columns are already
+    validated by map_items and ordered like the record fields, so records are built
+    positionally without another coercion pass.
+    """
+    values = [format_epochs(v) if name in EPOCH_COLUMNS else v for name, v in columns.items()]
+    return [cls(*row) for row in zip(*values)]
+
+
+def column_frame(columns: Dict[str, list]) -> pd.DataFrame:
+    """Turn mapped columns into a DataFrame with int64 metrics and datetime64 dates"""
+    data = {}
+    for name, values in columns.items():
+        if name in EPOCH_COLUMNS:
+            data[EPOCH_COLUMNS[name]] = local_datetimes(values)
+        elif name in ('likes', 'comments', 'shares', 'saves', 'views'):
+            data[name] = np.asarray(values, dtype='int64')
+        else:
+            data[name] = values
+    return pd.DataFrame(data)
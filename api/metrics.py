@@ -0,0 +1,260 @@
+"""
+Process-local metrics rendered in the Prometheus text exposition format.
+
+Stage timers wrap the steps of a scrape (Apify run wait, dataset pages,
+mapping, scoring, upserts) and record a duration histogram plus row, byte and
+error counters per stage; the API adds request latency per route. Gauges are
+read from the caches and the connection pool when /api/metrics is scraped.
+Each process (worker, serverless instance) keeps and serves its own numbers.
+"""
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+
+# Histogram bucket upper bounds in seconds; Apify runs take minutes, so the top buckets are wide
+DEFAULT_BUCKETS = tuple(
+    float(b) for b in os.environ.get(
+        "METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120,300,600"
+    ).split(",") if b.strip()
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.help)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic total per label set"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """
+    Current value per label set, either set directly or read from a callback at render time.
+
+    The callback returns a number, or {label values tuple: number} for labelled gauges.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 collect: Optional[Callable[[], Union[float, Dict[LabelValues, float]]]] = None):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.collect is not None:
+            try:
+                collected = self.collect()
+            except Exception as e:
+                print(f"[WARN] Metric {self.name} could not be collected: {e}")
+                return []
+            if collected is None:
+                return []
+            items = sorted(collected.items()) if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in items if v is not None]
+
+
+class Histogram(_Metric):
+    """Bucketed observations (cumulative on render) with their sum and count per label set"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(set(buckets)))
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            else:
+                series[0][-1] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Named metrics, rendered together; registering a name twice returns the first metric"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (), collect=None) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, collect))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("pulse_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+STAGE_ROWS = REGISTRY.counter("pulse_stage_rows_total", "Rows (items, videos, comments) handled by each stage", ("stage",))
+STAGE_BYTES = REGISTRY.counter("pulse_stage_bytes_total", "Bytes sent or produced by each stage", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("pulse_stage_errors_total", "Failed runs of each stage", ("stage",))
+
+HTTP_SECONDS = REGISTRY.histogram(
+    "pulse_http_request_seconds", "API request latency until the response headers are sent",
+    ("method", "route", "status"),
+)
+HTTP_IN_PROGRESS = REGISTRY.gauge("pulse_http_requests_in_progress", "API requests being handled")
+
+
+def observe_stage(name: str, seconds: float, rows: int = 0, bytes: int = 0, error: bool = False):
+    """Record one finished run of a stage"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if rows:
+        STAGE_ROWS.inc(rows, stage=name)
+    if bytes:
+        STAGE_BYTES.inc(bytes, stage=name)
+    if error:
+        STAGE_ERRORS.inc(stage=name)
+
+
+class stage:
+    """
+    Time a block as one run of a stage
+
+    Set .rows / .bytes inside the block; an exception (or fail()) counts an error.
+    Works around awaits too, since only the wall time between enter and exit is taken.
+
+        with stage("map_page") as s:
+            videos = ...
+            s.rows = len(items)
+    """
+
+    def __init__(self, name: str, rows: int = 0):
+        self.name = name
+        self.rows = rows
+        self.bytes = 0
+        self.failed = False
+        self.seconds = 0.0
+
+    def fail(self):
+        self.failed = True
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        observe_stage(self.name, self.seconds, self.rows, self.bytes, self.failed or exc_type is not None)
+        return False
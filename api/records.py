@@ -0,0 +1,214 @@
+"""
+Typed records for scraped videos and comments.
+
+The mapper builds records straight from its validated columns, so nothing
+downstream re-coerces them: Storage writes record.to_row() as the upsert
+payload and scoring round-trips batches through records_frame/frame_records.
+Records are slotted dataclasses (no per-instance __dict__) and also answer
+the small part of the dict interface (get, [], in) that code handling rows of
+either kind relies on.
+"""
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+
+# Columns computed at ingest by TikTokAnalyzer.score_videos/score_comments
+SCORE_COLUMNS = ("sentiment", "sentiment_score", "engagement_rate", "scorer_version")
+
+METRIC_COLUMNS = ("likes", "comments", "shares", "saves", "views")
+
+
+def _missing(value) -> bool:
+    # NaN and NaT are the only values unequal to themselves
+    return value is None or value is pd.NA or value != value
+
+
+def _opt(value, cast):
+    return None if _missing(value) else cast(value)
+
+
+def _count(value) -> int:
+    try:
+        return 0 if _missing(value) else int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _text(value) -> str:
+    return "" if _missing(value) else str(value)
+
+
+class _RowAccess:
+    """Dict-style access to record fields"""
+    __slots__ = ()
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.FIELDS else default
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def _score_fields(self, row: Dict[str, Any]):
+        # Unscored rows leave the stored scores alone
+        if self.scorer_version is not None:
+            for column in self.SCORES:
+                row[column] = getattr(self, column)
+        if self.content_hash:
+            row["content_hash"] = self.content_hash
+        return row
+
+
+@dataclass(slots=True)
+class VideoRecord(_RowAccess):
+    # Field order matches mapper.VIDEO_FIELDS so records build positionally from columns
+    video_id: str
+    video_url: str = ""
+    caption: str = ""
+    author: str = ""
+    likes: int = 0
+    comments: int = 0
+    shares: int = 0
+    saves: int = 0
+    views: int = 0
+    publish_date: Optional[str] = None
+    hashtags: str = ""
+    mentions: str = ""
+    thumbnail_url: str = ""
+    sentiment: Optional[str] = None
+    sentiment_score: Optional[float] = None
+    engagement_rate: Optional[float] = None
+    scorer_version: Optional[int] = None
+    content_hash: Optional[str] = None
+
+    @classmethod
+    def from_mapping(cls, row: Dict[str, Any]) -> "VideoRecord":
+        """Validate a dict (or DataFrame record) with the coercion the mapper applies"""
+        return cls(
+            _text(row.get("video_id")), _text(row.get("video_url")), _text(row.get("caption")),
+            _text(row.get("author")),
+            *(_count(row.get(c)) for c in METRIC_COLUMNS),
+            _opt(row.get("publish_date"), str),
+            _text(row.get("hashtags")), _text(row.get("mentions")), _text(row.get("thumbnail_url")),
+            _opt(row.get("sentiment"), str), _opt(row.get("sentiment_score"), float),
+            _opt(row.get("engagement_rate"), float), _opt(row.get("scorer_version"), int),
+            _opt(row.get("content_hash"), str) or None,
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Upsert payload for the videos table"""
+        return self._score_fields({
+            "video_id": self.video_id,
+            "video_url": self.video_url,
+            "caption": self.caption,
+            "author": self.author,
+            "likes": self.likes,
+            "comments": self.comments,
+            "shares": self.shares,
+            "saves": self.saves,
+            "views": self.views,
+            "publish_date": self.publish_date,
+            "hashtags": self.hashtags,
+            "mentions": self.mentions,
+            "thumbnail_url": self.thumbnail_url,
+        })
+
+
+@dataclass(slots=True)
+class CommentRecord(_RowAccess):
+    # Field order matches mapper.COMMENT_FIELDS
+    comment_id: str
+    video_id: str = ""
+    text: str = ""
+    author: str = ""
+    date: Optional[str] = None
+    likes: int = 0
+    sentiment: Optional[str] = None
+    sentiment_score: Optional[float] = None
+    scorer_version: Optional[int] = None
+    content_hash: Optional[str] = None
+
+    @classmethod
+    def from_mapping(cls, row: Dict[str, Any]) -> "CommentRecord":
+        """Validate a dict (or DataFrame record) with the coercion the mapper applies"""
+        return cls(
+            _text(row.get("comment_id")), _text(row.get("video_id")), _text(row.get("text")),
+            _text(row.get("author")), _opt(row.get("date"), str), _count(row.get("likes")),
+            _opt(row.get("sentiment"), str), _opt(row.get("sentiment_score"), float),
+            _opt(row.get("scorer_version"), int), _opt(row.get("content_hash"), str) or None,
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Upsert payload for the comments table"""
+        row = {
+            "comment_id": self.comment_id,
+            "video_id": self.video_id,
+            "author": self.author,
+            "text": self.text,
+            "likes": self.likes,
+            "date": self.date,
+        }
+        return self._score_fields(row)
+
+
+for _cls in (VideoRecord, CommentRecord):
+    _cls.COLUMNS = tuple(f.name for f in fields(_cls))
+    _cls.FIELDS = frozenset(_cls.COLUMNS)
+    _cls.SCORES = tuple(c for c in SCORE_COLUMNS if c in _cls.FIELDS)
+
+
+def as_records(rows: Iterable, cls) -> List:
+    """Records as-is; dicts validated through cls.from_mapping"""
+    return [row if isinstance(row, cls) else cls.from_mapping(row) for row in rows]
+
+
+def records_frame(records: Sequence) -> pd.DataFrame:
+    """
+    DataFrame of records, built column by column. Score and hash columns are left out
+    while no record has them, so frames look like the dict path's.
+    """
+    if not records:
+        return pd.DataFrame()
+    if not isinstance(records[0], _RowAccess):
+        return pd.DataFrame(records)
+    data = {}
+    for column in type(records[0]).COLUMNS:
+        values = [getattr(r, column) for r in records]
+        if (column in SCORE_COLUMNS or column == "content_hash") and all(v is None for v in values):
+            continue
+        data[column] = values
+    return pd.DataFrame(data)
+
+
+def frame_records(df: pd.DataFrame, cls) -> List:
+    """Records from a DataFrame (e.g. after scoring); columns the record lacks are ignored"""
+    if df.empty:
+        return []
+    columns = []
+    for column in cls.COLUMNS:
+        if column not in df.columns:
+            columns.append([cls.__dataclass_fields__[column].default] * len(df))
+            continue
+        series = df[column]
+        if column in METRIC_COLUMNS:
+            columns.append(pd.to_numeric(series, errors="coerce").fillna(0).astype("int64").tolist())
+        elif column in ("sentiment_score", "engagement_rate"):
+            columns.append([_opt(v, float) for v in series.tolist()])
+        elif column == "scorer_version":
+            columns.append([_opt(v, int) for v in series.tolist()])
+        elif cls.__dataclass_fields__[column].default == "":
+            columns.append([_text(v) for v in series.tolist()])
+        else:
+            columns.append([_opt(v, str) for v in series.tolist()])
+    return [cls(*row) for row in zip(*columns)]
@@ -0,0 +1,132 @@
+"""
+In-process cache of serialized API responses.
+
+Entries are keyed by route, query parameters and a data-version counter that
+writers bump, so a write makes every older entry unreachable without scanning
+the cache. Each entry keeps its JSON body and an ETag so unchanged responses
+can be answered with 304 Not Modified.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+DEFAULT_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Other processes (workers, serverless instances) do not see our version bumps,
+# so entries also expire after a while. 0 disables expiry.
+DEFAULT_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 60))
+
+
+_version = 0
+_version_lock = threading.Lock()
+
+
+def data_version() -> int:
+    """Current data version; part of every cache key"""
+    return _version
+
+
+def bump_data_version() -> int:
+    """Mark stored data as changed so cached responses are no longer served"""
+    global _version
+    with _version_lock:
+        _version += 1
+        return _version
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header names etag (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum cached responses
+            max_bytes: Maximum total size of cached bodies
+            ttl: Seconds an entry stays valid (0 or None for no expiry)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self._entries: "OrderedDict[Tuple, Tuple[bytes, str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def make_key(path: str, params: Iterable[Tuple[str, str]], version: Optional[int] = None) -> Tuple:
+        """Key for a route, its query parameters (order-insensitive) and the data version"""
+        return (path, tuple(sorted(params)), data_version() if version is None else version)
+
+    def get(self, key: Tuple) -> Optional[Tuple[bytes, str]]:
+        """Return (body, etag) for a key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                self._drop(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0], entry[1]
+
+    def put(self, key: Tuple, body: bytes) -> str:
+        """Cache a serialized body and return its ETag"""
+        etag = make_etag(body)
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, etag, time.monotonic())
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return etag
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss, 304, eviction and expiry counters plus current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_entries"] = self.max_entries
+            stats["max_bytes"] = self.max_bytes
+            stats["ttl"] = self.ttl
+            stats["data_version"] = data_version()
+            return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key: Tuple):
+        body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
@@ -0,0 +1,185 @@
+"""
+Registry of scrape jobs and their progress, streamed to clients as Server-Sent Events.
+
+A job is keyed by its Apify run id. run_scrape_async creates it, the run
+watcher reports the Apify status and items scraped so far, and the webhook job
+reports items fetched, mapped and upserted. Every update publishes a snapshot
+of the job to its subscribers. Updates may come from ingest writer threads, so
+they are handed to each subscriber's event loop. Jobs are kept in process
+memory: a client streams from the instance that started the scrape.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+# Jobs remembered per process; the oldest finished ones are dropped first
+MAX_JOBS = int(os.environ.get("SCRAPE_JOBS_MAX", 200))
+# Seconds between keep-alive comments on an idle event stream (proxies drop silent connections)
+KEEPALIVE_SECS = float(os.environ.get("SCRAPE_EVENTS_KEEPALIVE", 15))
+
+# starting -> running (Apify) -> ingesting (fetch, map, upsert) -> succeeded | failed
+STARTING, RUNNING, INGESTING, SUCCEEDED, FAILED = "starting", "running", "ingesting", "succeeded", "failed"
+TERMINAL = {SUCCEEDED, FAILED}
+
+PROGRESS_FIELDS = (
+    "apify_status", "items_scraped", "items_fetched", "pages", "videos", "comments",
+    "saved_videos", "saved_comments", "unchanged_videos", "error",
+)
+
+
+class ScrapeJob:
+    def __init__(self, job_id: str, scrape_type: Optional[str] = None, search_input: Optional[str] = None,
+                 video_count: Optional[int] = None):
+        self.id = job_id
+        self.scrape_type = scrape_type
+        self.search_input = search_input
+        self.video_count = video_count
+        self.status = STARTING
+        self.progress: Dict[str, Any] = {field: None for field in PROGRESS_FIELDS}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        self.seq = 0
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "seq": self.seq,
+            "status": self.status,
+            "scrape_type": self.scrape_type,
+            "search_input": self.search_input,
+            "video_count": self.video_count,
+            **self.progress,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ScrapeJobRegistry:
+    def __init__(self, max_jobs: int = MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ScrapeJob]" = OrderedDict()
+        # job id -> [(loop, queue)] of connected event streams
+        self._subscribers: Dict[str, List] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, **details) -> Dict[str, Any]:
+        """Register a job (or return the existing one with that id)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._jobs[job_id] = ScrapeJob(job_id, **details)
+                self._trim()
+            return job.snapshot()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.snapshot() for job in list(self._jobs.values())[-limit:][::-1]]
+
+    def update(self, job_id: str, status: Optional[str] = None, create: bool = False, **progress) -> Optional[Dict[str, Any]]:
+        """
+        Update a job's status and progress fields and publish the new snapshot
+
+        Safe to call from any thread. Updates to a finished job, or to an unknown one
+        without create, are ignored.
+
+        Returns:
+            The published snapshot, or None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and create:
+                job = self._jobs[job_id] = ScrapeJob(job_id)
+                self._trim()
+            if job is None or job.done:
+                return None
+            if status:
+                job.status = status
+                if status in TERMINAL:
+                    job.finished_at = time.time()
+            for field, value in progress.items():
+                if field in job.progress and value is not None:
+                    job.progress[field] = value
+            job.seq += 1
+            job.updated_at = time.time()
+            snapshot = job.snapshot()
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+            except RuntimeError:
+                pass  # the stream's loop has closed
+        return snapshot
+
+    def fail(self, job_id: str, error: str):
+        self.update(job_id, FAILED, error=error)
+
+    async def events(self, job_id: str, after: int = 0) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for a job: its current snapshot, then one event per update,
+        ending after the job succeeds or fails
+
+        Args:
+            job_id: Apify run id
+            after: Last event id the client saw (Last-Event-ID); an unchanged job is not re-sent
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            current = job.snapshot()
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+        try:
+            if current["seq"] > after or current["status"] in TERMINAL:
+                yield format_event(current)
+            last = current
+            while last["status"] not in TERMINAL:
+                try:
+                    last = await asyncio.wait_for(queue.get(), KEEPALIVE_SECS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(last)
+        finally:
+            with self._lock:
+                streams = self._subscribers.get(job_id, [])
+                if (loop, queue) in streams:
+                    streams.remove((loop, queue))
+                if not streams:
+                    self._subscribers.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"jobs": len(self._jobs), "by_status": counts,
+                    "streams": sum(len(s) for s in self._subscribers.values())}
+
+    def _trim(self):
+        while len(self._jobs) > self.max_jobs:
+            finished = next((k for k, j in self._jobs.items() if j.done), None)
+            self._jobs.pop(finished if finished is not None else next(iter(self._jobs)))
+
+
+def format_event(snapshot: Dict[str, Any]) -> str:
+    """One SSE message: the snapshot's seq as id, its status as event name, the snapshot as data"""
+    data = json.dumps(snapshot, separators=(",", ":"), default=str)
+    return f"id: {snapshot['seq']}\nevent: {snapshot['status']}\ndata: {data}\n\n"
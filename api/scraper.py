@@ -1,11 +1,66 @@
 """
 TikTok scraper module using Apify Actor (clockworks/tiktok-scraper)
 """
-from apify_client import ApifyClient
+from apify_client import ApifyClient, ApifyClientAsync
 import asyncio
-from datetime import datetime
+import json
 import os
-import re
+import time
+
+try:
+    from .mapper import map_items, column_rows, column_records, extract_hashtags, extract_mentions
+    from .records import VideoRecord, CommentRecord
+    from .metrics import stage
+except ImportError:
+    from mapper import map_items, column_rows, column_records, extract_hashtags, extract_mentions
+    from records import VideoRecord, CommentRecord
+    from metrics import stage
+
+
+# Items requested per Apify dataset page when streaming results
+DATASET_PAGE_SIZE = 1000
+
+# Seconds each awaited wait_for_finish call may block server-side before we poll again
+RUN_POLL_SECS = 30
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+# Seconds between progress reports while following a run started without waiting for it
+RUN_STATUS_SECS = 5
+
+# Scrape types whose results come back newest first, so iteration can stop at the cutoff
+TIME_ORDERED_TYPES = {"Username"}
+
+# Actor runs in flight at once across every fan-out scrape in the process
+FANOUT_CONCURRENCY = int(os.environ.get("SCRAPE_FANOUT_CONCURRENCY", 4))
+
+
+def split_targets(search_input):
+    """Comma-separated hashtags, usernames or queries, stripped and de-duplicated in order"""
+    targets = []
+    for part in (search_input or '').split(','):
+        part = part.strip()
+        if part and part not in targets:
+            targets.append(part)
+    return targets
+
+
+def newest_publish_date(videos):
+    """Latest 'publish_date' among mapped videos ('%Y-%m-%d %H:%M:%S' sorts as text), or None"""
+    return max((v['publish_date'] for v in videos if v.get('publish_date')), default=None)
+
+
+# One semaphore per event loop: asyncio primitives cannot be shared across loops
+# (the sync wrappers each run their own)
+_fanout_slots = {}
+
+
+def _global_slots():
+    loop = asyncio.get_running_loop()
+    slots = _fanout_slots.get(loop)
+    if slots is None:
+        for stale in [l for l in _fanout_slots if l.is_closed()]:
+            del _fanout_slots[stale]
+        slots = _fanout_slots[loop] = asyncio.Semaphore(FANOUT_CONCURRENCY)
+    return slots
 
 
 class TikTokScraper:
@@ -20,8 +75,10 @@ class TikTokScraper:
         if not self.token:
             print("[WARN] No Apify API token provided. Scraper will fail unless token is passed.")
             self.client = None
+            self.async_client = None
         else:
             self.client = ApifyClient(self.token)
+            self.async_client = ApifyClientAsync(self.token)
         
         # Using clockworks/tiktok-scraper as it is reliable
         self.actor_id = "clockworks/tiktok-scraper"
@@ -30,109 +87,48 @@ class TikTokScraper:
         """Check connection - lightweight for Apify"""
         if not self.client and self.token:
             self.client = ApifyClient(self.token)
+            self.async_client = ApifyClientAsync(self.token)
         return True if self.client else False
     
     def extract_hashtags(self, caption):
         """Helper to extract hashtags from caption"""
-        if not caption: return ""
-        return ', '.join(re.findall(r'#(\w+)', caption))
+        return extract_hashtags(caption)
 
     def extract_mentions(self, caption):
         """Helper to extract mentions from caption"""
-        if not caption: return ""
-        return ', '.join(re.findall(r'@(\w+)', caption))
+        return extract_mentions(caption)
 
     def _map_result(self, item, extract_comments=False):
-        """Map Apify result to our app's data structure"""
-        try:
-            # Video Date
-            video_date = datetime.now()
-            if 'createTime' in item:
-                try: video_date = datetime.fromtimestamp(item['createTime'])
-                except: pass
-            elif 'createTimeISO' in item:
-                try: video_date = datetime.fromisoformat(item['createTimeISO'].replace('Z', '+00:00'))
-                except: pass
-
-            video_data = {
-                'video_id': item.get('id', item.get('videoMeta', {}).get('id', '')),
-                'video_url': item.get('webVideoUrl', ''),
-                'caption': item.get('text', ''),
-                'author': item.get('authorMeta', {}).get('name', ''),
-                'likes': item.get('diggCount', 0),
-                'comments': item.get('commentCount', 0),
-                'shares': item.get('shareCount', 0),
-                'saves': item.get('collectCount', 0),
-                'views': item.get('playCount', 0),
-                'publish_date': video_date.strftime('%Y-%m-%d %H:%M:%S'),
-                'hashtags': ', '.join([t.get('name', '') for t in item.get('hashtags', [])]) or self.extract_hashtags(item.get('text', '')),
-                'mentions': self.extract_mentions(item.get('text', '')),
-                'thumbnail_url': item.get('coverUrl', item.get('videoMeta', {}).get('coverUrl', ''))
-            }
-
-            if extract_comments:
-                comments_list = []
-                # clockworks/tiktok-scraper usually returns comments in 'comments' list if requested
-                raw_comments = item.get('comments', [])
-                for c in raw_comments:
-                    try:
-                        c_date = datetime.now()
-                        if 'createTime' in c:
-                             try: c_date = datetime.fromtimestamp(c['createTime'])
-                             except: pass
-                        
-                        comments_list.append({
-                            'comment_id': c.get('id', ''),
-                            'video_id': video_data['video_id'],
-                            'text': c.get('text', ''),
-                            'author': c.get('authorUniqueId', ''),
-                            'date': c_date.strftime('%Y-%m-%d %H:%M:%S'),
-                            'likes': c.get('diggCount', 0)
-                        })
-                    except: continue
-                video_data['scraped_comments'] = comments_list
-
-            return video_data
-        except Exception as e:
-            print(f"Error mapping item: {e}")
+        """Map one Apify result to our app's data structure (pages go through mapper.map_items)"""
+        videos, comments, _ = map_items([item], extract_comments)
+        if not videos['video_id']:
             return None
+        video_data = column_rows(videos)[0]
+        if extract_comments:
+            video_data['scraped_comments'] = column_rows(comments)
+        return video_data
 
-    async def _run_actor(self, run_input, limit=None, since_date=None, comments_per_video=0):
+    async def _run_actor(self, run_input, limit=None, since_date=None, comments_per_video=0, time_ordered=False):
         """Generic actor runner with limits"""
-        if not self.client:
+        if not self.async_client:
             print("[ERROR] Apify Client not initialized. Missing API Token.")
             return []
         
-        print(f"[INFO] Starting Apify Actor: {self.actor_id} with input: {run_input}")
-        
         results = []
         try:
-            run = self.client.actor(self.actor_id).call(run_input=run_input)
-            
-            dataset_id = run.get('defaultDatasetId')
+            dataset_id = await self.run_to_dataset(run_input)
             if not dataset_id:
                 return []
             
             print(f"[INFO] Run finished. Fetching results from dataset {dataset_id}...")
             
-            dataset_items = self.client.dataset(dataset_id).iterate_items()
-            
-            count = 0
-            for item in dataset_items:
-                # Map result (extract comments if requested)
-                mapped = self._map_result(item, extract_comments=(comments_per_video > 0))
-                if not mapped: continue
-                
-                # Check limits
-                if since_date:
-                    item_date = datetime.strptime(mapped['publish_date'], '%Y-%m-%d %H:%M:%S')
-                    if item_date < since_date:
-                        continue 
-                
-                results.append(mapped)
-                count += 1
-                
-                if limit and count >= limit:
+            async for _, items in self.aiter_dataset_pages(dataset_id):
+                videos, _, done = self._map_page(items, comments_per_video, since_date, flatten_comments=False, time_ordered=time_ordered)
+                for mapped in videos:
+                    results.append(mapped)
+                    if limit and len(results) >= limit:
+                        return results
+                if done:
                     break
             
             return results
@@ -141,11 +137,8 @@ class TikTokScraper:
             print(f"[ERROR] Error running Apify actor: {e}")
             return []
 
-    async def start_scrape_async(self, scrape_type, search_input, count=None, since_date=None, comments_per_video=0, webhook_url=None):
-        """Start a scrape job and return the run info immediately"""
-        if not self.client:
-            return None
-        
+    def build_run_input(self, scrape_type, search_input, count=None, comments_per_video=0):
+        """Actor input for a Hashtag, Username or Keyword scrape of comma-separated targets"""
         limit = count if count else 100
         run_input = {
             "resultsPerPage": limit,
@@ -159,18 +152,57 @@ class TikTokScraper:
             run_input["profiles"] = [u.strip() for u in search_input.split(',')]
         else:
             run_input["searchQueries"] = [q.strip() for q in search_input.split(',')]
+        return run_input
+
+    async def run_to_dataset(self, run_input):
+        """
+        Start the actor and await its completion without blocking the event loop
+        
+        Returns:
+            The run's default dataset ID, or None if the run did not succeed
+        """
+        if not self.async_client:
+            print("[ERROR] Apify Client not initialized. Missing API Token.")
+            return None
+        
+        print(f"[INFO] Starting Apify Actor: {self.actor_id} with input: {run_input}")
+        try:
+            with stage("apify_run") as timer:
+                run = await self.async_client.actor(self.actor_id).start(run_input=run_input)
+                run_client = self.async_client.run(run['id'])
+                while run and run.get('status') not in TERMINAL_STATUSES:
+                    run = await run_client.wait_for_finish(wait_secs=RUN_POLL_SECS)
+                if not run or run.get('status') != 'SUCCEEDED':
+                    timer.fail()
+            
+            if not run or run.get('status') != 'SUCCEEDED':
+                print(f"[ERROR] Apify run ended with status {run.get('status') if run else 'unknown'}")
+                return None
+            return run.get('defaultDatasetId')
+        except Exception as e:
+            print(f"[ERROR] Error running Apify actor: {e}")
+            return None
+
+    async def start_scrape_async(self, scrape_type, search_input, count=None, since_date=None, comments_per_video=0, webhook_url=None,
+                                 use_watermark=True):
+        """Start a scrape job and return the run info immediately; since_date and use_watermark travel with the webhook"""
+        if not self.client:
+            return None
+        
+        run_input = self.build_run_input(scrape_type, search_input, count, comments_per_video)
 
         try:
             # Start the run
-            payload_template = "{\n    \"runId\": {{resource.id}},\n    \"datasetId\": {{resource.defaultDatasetId}},\n    \"scrapeType\": \"" + scrape_type + "\",\n    \"commentsLimit\": " + str(comments_per_video) + ",\n    \"apifyToken\": \"" + self.token + "\"\n}"
-
-            run = self.client.actor(self.actor_id).start(run_input=run_input, webhooks=[
-                {
-                    "event_types": ["ACTOR.RUN.SUCCEEDED"],
-                    "request_url": webhook_url,
-                    "payload_template": payload_template
-                }
-            ] if webhook_url else [])
+            payload_template = "{\n    \"runId\": {{resource.id}},\n    \"datasetId\": {{resource.defaultDatasetId}},\n    \"scrapeType\": \"" + scrape_type + "\",\n    \"searchInput\": " + json.dumps(search_input) + ",\n    \"commentsLimit\": " + str(comments_per_video) + ",\n    \"sinceDate\": " + json.dumps(since_date) + ",\n    \"useWatermark\": " + json.dumps(bool(use_watermark)) + ",\n    \"apifyToken\": \"" + self.token + "\"\n}"
+
+            with stage("apify_start"):
+                run = await self.async_client.actor(self.actor_id).start(run_input=run_input, webhooks=[
+                    {
+                        "event_types": ["ACTOR.RUN.SUCCEEDED"],
+                        "request_url": webhook_url,
+                        "payload_template": payload_template
+                    }
+                ] if webhook_url else [])
             
             return run
         except Exception as e:
@@ -178,21 +210,242 @@ class TikTokScraper:
             print(f"Error starting async scrape: {error_msg}")
             return {"error": error_msg}
 
+    async def aiter_run_status(self, run_id, wait_secs=RUN_STATUS_SECS):
+        """
+        Follow a run until it ends, yielding its status and the items its dataset holds so far
+        
+        Each step waits up to wait_secs server-side for the run to finish, so a finished
+        run is reported at once and a running one about every wait_secs.
+        
+        Yields:
+            (status, default dataset ID, item count or None); the last status is terminal
+        """
+        run_client = self.async_client.run(run_id)
+        while True:
+            run = await run_client.wait_for_finish(wait_secs=wait_secs)
+            if not run:
+                yield "UNKNOWN", None, None
+                return
+            status, dataset_id = run.get('status'), run.get('defaultDatasetId')
+            item_count = None
+            if dataset_id:
+                try:
+                    dataset = await self.async_client.dataset(dataset_id).get()
+                    item_count = (dataset or {}).get('itemCount')
+                except Exception as e:
+                    print(f"[WARN] Could not read item count of dataset {dataset_id}: {e}")
+            yield status, dataset_id, item_count
+            if status in TERMINAL_STATUSES:
+                return
+
     def fetch_results(self, dataset_id, comments_per_video=0):
         """Fetch results from a completed dataset"""
         if not self.client: return []
         
         results = []
         try:
-            dataset_items = self.client.dataset(dataset_id).iterate_items()
-            for item in dataset_items:
-                mapped = self._map_result(item, extract_comments=(comments_per_video > 0))
-                if mapped: results.append(mapped)
+            for _, items in self.iter_dataset_pages(dataset_id):
+                with stage("map_result", rows=len(items)):
+                    for item in items:
+                        mapped = self._map_result(item, extract_comments=(comments_per_video > 0))
+                        if mapped: results.append(mapped)
             return results
         except Exception as e:
             print(f"Error fetching results: {e}")
             return []
 
+    def iter_dataset_pages(self, dataset_id, page_size=DATASET_PAGE_SIZE, offset=0):
+        """
+        Yield raw dataset items one page at a time
+        
+        Yields:
+            (offset after the page, list of raw items)
+        """
+        dataset = self.client.dataset(dataset_id)
+        while True:
+            with stage("dataset_page") as timer:
+                page = dataset.list_items(offset=offset, limit=page_size, clean=True)
+                items = page.items or []
+                timer.rows = len(items)
+            if not items:
+                return
+            offset += len(items)
+            yield offset, items
+            if len(items) < page_size:
+                return
+
+    async def aiter_dataset_pages(self, dataset_id, page_size=DATASET_PAGE_SIZE, offset=0):
+        """Async iterator over raw dataset pages, yielding (offset after the page, items)"""
+        dataset = self.async_client.dataset(dataset_id)
+        while True:
+            with stage("dataset_page") as timer:
+                page = await dataset.list_items(offset=offset, limit=page_size, clean=True)
+                items = page.items or []
+                timer.rows = len(items)
+            if not items:
+                return
+            offset += len(items)
+            yield offset, items
+            if len(items) < page_size:
+                return
+
+    def _map_page(self, items, comments_per_video=0, since_date=None, flatten_comments=True, time_ordered=False):
+        """
+        Map one page of raw items, dropping videos published before since_date
+        
+        The whole page is mapped column-wise and the cutoff is checked on raw epoch
+        timestamps, so old items are never mapped. With time_ordered (newest first), the
+        first unpinned item older than since_date ends the page.
+        
+        Returns:
+            (videos, comments, done), done being True once the cutoff has been reached.
+            With flatten_comments, VideoRecord and CommentRecord lists; otherwise video
+            dicts with their comments nested under 'scraped_comments'
+        """
+        since_ts = int(since_date.timestamp()) if since_date else None
+        with stage("map_page", rows=len(items)):
+            video_cols, comment_cols, done = map_items(items, comments_per_video > 0, since_ts, time_ordered)
+            if flatten_comments:
+                return column_records(video_cols, VideoRecord), column_records(comment_cols, CommentRecord), done
+        
+        videos, comments = column_rows(video_cols), column_rows(comment_cols)
+        if comments_per_video > 0:
+            nested = {}
+            for c in comments:
+                nested.setdefault(c['video_id'], []).append(c)
+            for v in videos:
+                v['scraped_comments'] = nested.get(v['video_id'], [])
+            comments = []
+        return videos, comments, done
+
+    async def aiter_mapped(self, dataset_id, comments_per_video=0, page_size=DATASET_PAGE_SIZE, offset=0, limit=None, since_date=None, time_ordered=False):
+        """
+        Map a dataset page by page into VideoRecord and CommentRecord lists
+        
+        Args:
+            dataset_id: Apify dataset ID
+            comments_per_video: Extract comments when > 0
+            page_size: Items requested per dataset page
+            offset: Dataset offset to start from
+            limit: Stop after this many videos
+            since_date: Skip videos published before this datetime
+            time_ordered: Results are newest first across the whole dataset (a single-profile run);
+                stop reading at the first video before since_date
+            
+        Yields:
+            (offset after the page, videos, comments)
+        """
+        count = 0
+        async for next_offset, items in self.aiter_dataset_pages(dataset_id, page_size, offset):
+            videos, comments, done = self._map_page(items, comments_per_video, since_date, time_ordered=time_ordered)
+            if limit and count + len(videos) >= limit:
+                videos = videos[:limit - count]
+                kept = {v.video_id for v in videos}
+                comments = [c for c in comments if c.video_id in kept]
+                yield next_offset, videos, comments
+                return
+            count += len(videos)
+            yield next_offset, videos, comments
+            if done:
+                print(f"[INFO] Reached cutoff {since_date} in dataset {dataset_id}; skipping older items")
+                return
+
+    async def scrape_fanout(self, scrape_type, search_input, count=None, since_date=None, comments_per_video=0, max_concurrency=None, cutoffs=None):
+        """
+        Start one actor run per comma-separated target and stream their results as they arrive
+        
+        Runs are capped by max_concurrency and by the process-wide SCRAPE_FANOUT_CONCURRENCY.
+        Videos and comments already yielded for an earlier target are dropped, so a video
+        matching several hashtags is only returned once.
+        
+        Args:
+            scrape_type: Hashtag, Username or Keyword
+            search_input: Comma-separated targets
+            count: Videos per target
+            since_date: Skip videos published before this datetime
+            comments_per_video: Extract comments when > 0
+            max_concurrency: Runs in flight for this call (defaults to the global cap)
+            cutoffs: Per-target since dates (e.g. stored watermarks), used where since_date is None
+            
+        Yields:
+            (target, videos, comments, None) per mapped dataset page, then
+            (target, [], [], report) once the target's run is done. The report holds
+            status, dataset_id, videos, comments, duplicates, newest_publish_date,
+            queued_seconds, run_seconds (actor run) and seconds (total).
+        """
+        targets = split_targets(search_input)
+        if not targets:
+            return
+        
+        limit = max_concurrency or FANOUT_CONCURRENCY
+        # Bounded so fast runs wait for the consumer instead of piling pages up in memory
+        queue = asyncio.Queue(maxsize=2 * limit)
+        local_slots = asyncio.Semaphore(limit)
+        global_slots = _global_slots()
+        
+        async def run_target(target):
+            report = {"target": target, "status": "failed", "dataset_id": None, "queued_seconds": 0.0, "run_seconds": 0.0}
+            started = time.perf_counter()
+            try:
+                async with local_slots, global_slots:
+                    report["queued_seconds"] = round(time.perf_counter() - started, 3)
+                    run_input = self.build_run_input(scrape_type, target, count, comments_per_video)
+                    dataset_id = await self.run_to_dataset(run_input)
+                    report["run_seconds"] = round(time.perf_counter() - started - report["queued_seconds"], 3)
+                    if dataset_id:
+                        report["dataset_id"] = dataset_id
+                        async for _, videos, comments in self.aiter_mapped(
+                            dataset_id, comments_per_video=comments_per_video,
+                            limit=count or 100, since_date=since_date or (cutoffs or {}).get(target),
+                            time_ordered=scrape_type in TIME_ORDERED_TYPES
+                        ):
+                            await queue.put((target, videos, comments, None))
+                        report["status"] = "succeeded"
+            except Exception as e:
+                print(f"[ERROR] Fan-out run for '{target}' failed: {e}")
+                report["error"] = str(e)
+            report["seconds"] = round(time.perf_counter() - started, 3)
+            await queue.put((target, [], [], report))
+        
+        tasks = [asyncio.create_task(run_target(t)) for t in targets]
+        seen_videos, seen_comments = set(), set()
+        counts = {t: {"videos": 0, "comments": 0, "duplicates": 0, "newest_publish_date": None} for t in targets}
+        remaining = len(tasks)
+        try:
+            while remaining:
+                target, videos, comments, report = await queue.get()
+                if report is not None:
+                    remaining -= 1
+                    report.update(counts[target])
+                    print(f"[INFO] Fan-out '{target}' {report['status']}: {report['videos']} videos, "
+                          f"{report['comments']} comments, {report['duplicates']} duplicates in {report['seconds']}s")
+                    yield target, [], [], report
+                    continue
+                
+                fresh_videos = []
+                for v in videos:
+                    if v.video_id not in seen_videos:
+                        seen_videos.add(v.video_id)
+                        fresh_videos.append(v)
+                fresh_comments = []
+                for c in comments:
+                    if c.comment_id not in seen_comments:
+                        seen_comments.add(c.comment_id)
+                        fresh_comments.append(c)
+                
+                counts[target]["videos"] += len(fresh_videos)
+                counts[target]["comments"] += len(fresh_comments)
+                counts[target]["duplicates"] += len(videos) - len(fresh_videos)
+                # Duplicates count too: the target did return them
+                newest = newest_publish_date(videos)
+                if newest and (counts[target]["newest_publish_date"] or '') < newest:
+                    counts[target]["newest_publish_date"] = newest
+                if fresh_videos or fresh_comments:
+                    yield target, fresh_videos, fresh_comments, None
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def scrape_hashtag(self, hashtags, count=None, since_date=None, comments_per_video=0):
         if isinstance(hashtags, str):
             hashtags = [h.strip() for h in hashtags.split(',')]
@@ -217,7 +470,8 @@ class TikTokScraper:
             "shouldDownloadVideos": False,
             "commentsPerPost": comments_per_video
         }
-        return await self._run_actor(run_input, limit, since_date, comments_per_video)
+        # Profiles are returned one after another, so only one profile is newest first throughout
+        return await self._run_actor(run_input, limit, since_date, comments_per_video, time_ordered=len(usernames) == 1)
 
     async def scrape_search(self, queries, count=None, since_date=None, comments_per_video=0):
         if isinstance(queries, str):
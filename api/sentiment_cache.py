@@ -0,0 +1,158 @@
+"""
+Content-addressed cache for sentiment scores.
+
+Identical texts (reposted captions, emoji-only comments, "first!" spam) are scored
+once per (method, scorer version, normalized text). Results live in a bounded
+in-process LRU tier backed by a SQLite file that survives restarts.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+DEFAULT_MAX_ENTRIES = 100_000
+# Pending disk writes are batched into one transaction
+FLUSH_EVERY = 500
+
+
+def default_cache_path() -> str:
+    """SQLite path from SENTIMENT_CACHE_PATH, else the temp dir (writable on Vercel)"""
+    return os.environ.get("SENTIMENT_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "sentiment_cache.sqlite3")
+
+
+def normalize_text(text) -> str:
+    """
+    Normalize text for cache keys without changing how it scores.
+    Only Unicode composition and whitespace runs are folded; case and punctuation
+    are kept because VADER uses both.
+    """
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+class SentimentCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, db_path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum entries kept in the memory tier
+            db_path: SQLite file for the disk tier. Pass "" to keep the cache in memory only.
+        """
+        self.max_entries = max_entries
+        self.db_path = default_cache_path() if db_path is None else db_path
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._conn = None
+
+        if self.db_path:
+            try:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS sentiment_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+                )
+                self._conn.commit()
+            except Exception as e:
+                print(f"[WARN] Sentiment disk cache unavailable at {self.db_path}: {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(method: str, scorer_version: int, text) -> str:
+        """Hash of (method, scorer version, normalized text)"""
+        raw = f"{method}\x1f{scorer_version}\x1f{normalize_text(text)}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return self._memory[key]
+
+            value = self._pending.get(key)
+            if value is None and self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value FROM sentiment_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    value = row[0] if row else None
+                except Exception as e:
+                    print(f"[WARN] Sentiment disk cache read error: {e}")
+
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["disk_hits"] += 1
+            result = json.loads(value)
+            self._remember(key, result)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result in the memory tier and queue it for the disk tier"""
+        with self._lock:
+            self._remember(key, result)
+            if self._conn is not None:
+                self._pending[key] = json.dumps(result)
+                if len(self._pending) >= FLUSH_EVERY:
+                    self._flush_locked()
+
+    def flush(self):
+        """Write queued entries to the disk tier"""
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters plus tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["max_entries"] = self.max_entries
+            stats["disk_enabled"] = self._conn is not None
+            return stats
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM sentiment_cache")
+                self._conn.commit()
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _remember(self, key: str, result: Dict[str, Any]):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _flush_locked(self):
+        if not self._pending or self._conn is None:
+            return
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sentiment_cache (key, value) VALUES (?, ?)",
+                list(self._pending.items()),
+            )
+            self._conn.commit()
+        except Exception as e:
+            print(f"[WARN] Sentiment disk cache write error: {e}")
+        self._pending.clear()
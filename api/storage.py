@@ -0,0 +1,352 @@
+"""
+Storage interface the API depends on.
+
+SupabaseManager (database.py) is the hosted implementation; LocalStore
+(local_store.py) is an embedded DuckDB/SQLite one for on-prem nodes, tests and
+benchmarks. get_storage() picks one from STORAGE_BACKEND.
+"""
+import abc
+import base64
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+
+try:
+    from .records import SCORE_COLUMNS, VideoRecord, CommentRecord, as_records
+    from .metrics import stage
+except (ImportError, ValueError):
+    from records import SCORE_COLUMNS, VideoRecord, CommentRecord, as_records
+    from metrics import stage
+
+
+# Keyset ordering per table: (date column, unique id column), newest first
+PAGE_KEYS = {
+    "videos": ("publish_date", "video_id"),
+    "comments": ("date", "comment_id"),
+}
+
+# Scraped fields fingerprinted to detect changed rows. thumbnail_url is left out because
+# TikTok's CDN signs cover URLs per request, so it differs on every scrape.
+CONTENT_FIELDS = {
+    "videos": ("video_url", "caption", "author", "likes", "comments", "shares", "saves",
+               "views", "publish_date", "hashtags", "mentions"),
+    "comments": ("video_id", "author", "text", "likes", "date"),
+}
+
+DEFAULT_PAGE_SIZE = 1000
+# Supabase caps responses at 1000 rows by default (PostgREST max-rows)
+MAX_PAGE_SIZE = 1000
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+
+# Ingest checkpoints (ingest_runs): a run is RUN_RUNNING until its whole dataset is saved
+RUN_RUNNING, RUN_DONE = "running", "done"
+RUN_COUNTS = ("pages", "videos", "comments", "saved_videos", "saved_comments")
+
+
+def encode_cursor(date_value, row_id) -> str:
+    """Opaque cursor for the (date, id) key of the last row on a page"""
+    raw = json.dumps([date_value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor. Raises ValueError on malformed cursors."""
+    try:
+        date_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(date_value), str(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def until_bound(until: str) -> Tuple[bool, str]:
+    """
+    Upper bound for an inclusive `until` filter, as (inclusive, value).
+    A date-only value covers its whole day: it becomes an exclusive bound on the next day.
+    """
+    value = str(until).strip()
+    if len(value) == 10:
+        try:
+            return False, (date.fromisoformat(value) + timedelta(days=1)).isoformat()
+        except ValueError:
+            pass
+    return True, value
+
+
+def content_hash(table: str, row: Dict[str, Any]) -> str:
+    """Fingerprint of the scraped fields of a row"""
+    values = [None if row.get(f) is None else str(row.get(f)) for f in CONTENT_FIELDS[table]]
+    return hashlib.blake2b(json.dumps(values).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class StorageError(Exception):
+    """A backend read failed. Unlike an empty page, it must not be taken as the end of the data."""
+
+
+class Storage(abc.ABC):
+    """
+    Persistence for videos, comments, scrape watermarks and ingest checkpoints.
+
+    Backends implement is_connected, upsert_chunked, get_page, get_unscored,
+    get_watermarks, get_ingest_run and _stored_hashes; record validation, change detection and
+    paging helpers are shared. aggregate_videos may be overridden to push
+    dashboard aggregates down to the database.
+    """
+    name = "storage"
+
+    @abc.abstractmethod
+    def is_connected(self) -> bool:
+        """True when the backend can be read and written"""
+
+    def health(self) -> Dict[str, Any]:
+        """Backend details for /api/health"""
+        return {}
+
+    @abc.abstractmethod
+    def upsert_chunked(self, table: str, rows: List[Dict[str, Any]], on_conflict: str, **kwargs) -> int:
+        """Insert or update rows by their conflict key(s); returns the number of rows saved"""
+
+    @abc.abstractmethod
+    def get_page(
+        self,
+        table: str,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        author: Optional[str] = None,
+        hashtag: Optional[str] = None,
+        video_ids: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[pd.DataFrame, Optional[str]]:
+        """One keyset page of a table, newest first; returns (DataFrame, next_cursor). Raises StorageError."""
+
+    @abc.abstractmethod
+    def get_unscored(self, table: str, scorer_version: int, limit: int = 1000) -> pd.DataFrame:
+        """Rows never scored or scored by an older scorer version"""
+
+    @abc.abstractmethod
+    def get_watermarks(self, scrape_type: str, targets: List[str]) -> Dict[str, datetime]:
+        """{target: newest publish_date stored} for the targets that have a watermark"""
+
+    @abc.abstractmethod
+    def get_ingest_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """The ingest_runs checkpoint of an Apify run, or None if it was never ingested"""
+
+    @abc.abstractmethod
+    def _stored_hashes(self, table: str, ids: List[str]) -> Dict[str, Optional[str]]:
+        """{id: content_hash} of the stored rows among ids"""
+
+    def save_videos(self, videos: List[Any]):
+        """
+        Save videos with deduplication (upsert)
+
+        Args:
+            videos: VideoRecords, written as-is, or dicts, validated into records first
+        """
+        if not self.is_connected() or not videos:
+            return 0
+
+        # upsert will update if video_id exists, or insert if it doesn't
+        with stage("upsert_videos") as timer:
+            rows = [v.to_row() for v in as_records(videos, VideoRecord)]
+            saved = timer.rows = self.upsert_chunked("videos", rows, on_conflict="video_id")
+            if saved < len(rows):
+                timer.fail()
+        return saved
+
+    def save_comments(self, comments: List[Any]):
+        """
+        Save comments with deduplication
+
+        Args:
+            comments: CommentRecords, written as-is, or dicts, validated into records first
+        """
+        if not self.is_connected() or not comments:
+            return 0
+
+        with stage("upsert_comments") as timer:
+            rows = [c.to_row() for c in as_records(comments, CommentRecord)]
+            saved = timer.rows = self.upsert_chunked("comments", rows, on_conflict="comment_id")
+            if saved < len(rows):
+                timer.fail()
+        return saved
+
+    def drop_unchanged(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Stamp each row with its content_hash and drop rows stored with the same hash
+
+        Args:
+            table: 'videos' or 'comments'
+            rows: Mapped rows, before scoring
+
+        Returns:
+            The new or changed rows; all rows if stored hashes cannot be read
+        """
+        if not rows:
+            return rows
+        id_col = PAGE_KEYS[table][1]
+        for row in rows:
+            row["content_hash"] = content_hash(table, row)
+        if not self.is_connected():
+            return rows
+
+        try:
+            with stage("hash_lookup", rows=len(rows)):
+                stored = self._stored_hashes(table, list(dict.fromkeys(str(row[id_col]) for row in rows)))
+        except Exception as e:
+            print(f"[WARN] {self.name} content hash lookup on {table} failed, upserting all rows: {e}")
+            return rows
+        return [row for row in rows if stored.get(str(row[id_col])) != row["content_hash"]]
+
+    def save_watermarks(self, scrape_type: str, watermarks: Dict[str, str]) -> int:
+        """
+        Advance the watermark of each target; a watermark never moves backwards
+
+        Args:
+            scrape_type: Hashtag, Username or Keyword
+            watermarks: {target: newest publish_date seen, '%Y-%m-%d %H:%M:%S'}
+        """
+        watermarks = {t: d for t, d in watermarks.items() if d}
+        if not self.is_connected() or not watermarks:
+            return 0
+        current = self.get_watermarks(scrape_type, list(watermarks))
+        rows = []
+        for target, newest in watermarks.items():
+            if target in current and current[target] >= datetime.fromisoformat(newest):
+                continue
+            rows.append({
+                "scrape_type": scrape_type,
+                "target": target,
+                "newest_publish_date": newest,
+                "updated_at": datetime.utcnow().isoformat(),
+            })
+        return self.upsert_chunked("scrape_watermarks", rows, on_conflict="scrape_type,target") if rows else 0
+
+    def save_ingest_run(self, run_id: str, dataset_id: str, status: str, offset: int, counts: Dict[str, int]) -> int:
+        """
+        Checkpoint the ingestion of an Apify run
+
+        Args:
+            run_id: Apify run ID
+            dataset_id: The run's dataset
+            status: RUN_RUNNING while batches are being flushed, RUN_DONE once the dataset is ingested
+            offset: Dataset offset covered by everything saved so far
+            counts: Running totals of RUN_COUNTS over every attempt
+        """
+        if not self.is_connected():
+            return 0
+        now = datetime.utcnow().isoformat()
+        row = {
+            "run_id": str(run_id),
+            "dataset_id": dataset_id,
+            "status": status,
+            "dataset_offset": int(offset or 0),
+            **{k: int(counts.get(k) or 0) for k in RUN_COUNTS},
+            "updated_at": now,
+            "finished_at": now if status == RUN_DONE else None,
+        }
+        return self.upsert_chunked("ingest_runs", [row], on_conflict="run_id")
+
+    def iter_pages(self, table: str, page_size: int = MAX_PAGE_SIZE, **filters) -> Iterator[pd.DataFrame]:
+        """
+        Walk a whole table page by page, for jobs that really need every row.
+        A failed page raises StorageError rather than ending the walk early.
+
+        Args:
+            table: 'videos' or 'comments'
+            page_size: Rows per page
+            **filters: Same filters as get_page
+        """
+        cursor = None
+        while True:
+            df, cursor = self.get_page(table, cursor=cursor, limit=page_size, **filters)
+            if not df.empty:
+                yield df
+            if not cursor:
+                break
+
+    def get_all_videos(self) -> pd.DataFrame:
+        """Fetch all videos"""
+        pages = list(self.iter_pages("videos"))
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+    def get_all_comments(self) -> pd.DataFrame:
+        """Fetch all comments"""
+        pages = list(self.iter_pages("comments"))
+        return pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+
+    def aggregate_videos(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        author: Optional[str] = None,
+        hashtag: Optional[str] = None,
+        top_n: int = 10,
+        timelines=("hourly", "daily", "weekly"),
+        max_points: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Dashboard aggregates computed by the database, in the shape of TikTokAnalyzer.build_aggregates
+
+        Returns:
+            The aggregates, or None if the backend cannot push them down and the caller
+            should page the rows through build_aggregates instead
+        """
+        return None
+
+
+_local_store = None
+_local_store_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """
+    Storage backend selected by STORAGE_BACKEND: 'supabase' (default) or 'local'.
+    The local store is an embedded database, so one instance is shared per process;
+    Supabase managers are cheap and share the process-wide client and connection pool.
+    """
+    global _local_store
+    if STORAGE_BACKEND == "local":
+        with _local_store_lock:
+            if _local_store is None:
+                try:
+                    from .local_store import LocalStore
+                except (ImportError, ValueError):
+                    from local_store import LocalStore
+                _local_store = LocalStore()
+            return _local_store
+
+    try:
+        from .database import SupabaseManager
+    except (ImportError, ValueError):
+        from database import SupabaseManager
+    return SupabaseManager()
+
+
+def open_storage() -> Storage:
+    """Connect the configured backend up front (API startup)"""
+    return get_storage()
+
+
+def close_storage():
+    """Release the backend's connections (API shutdown)"""
+    global _local_store
+    if STORAGE_BACKEND == "local":
+        with _local_store_lock:
+            if _local_store is not None:
+                _local_store.close()
+                _local_store = None
+        return
+
+    try:
+        from .database import close_pool
+    except (ImportError, ValueError):
+        from database import close_pool
+    close_pool()
@@ -0,0 +1,228 @@
+"""
+Incremental word-frequency index over captions and comments.
+
+Texts are tokenized once, when they are ingested, into one counter per
+publish day. "Top words between two dates" merges the day counters in range
+instead of re-tokenizing every caption. Rows are counted once per id, so
+re-ingesting a row (updated metrics, a retried batch) does not count it again.
+The index lives in process memory and is rebuilt from storage on first use.
+"""
+import heapq
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+HASHTAG_PATTERN = re.compile(r'#\w+')
+MENTION_PATTERN = re.compile(r'@\w+')
+URL_PATTERN = re.compile(r'http\S+')
+PUNCT_PATTERN = re.compile(r'[^\w\s]')
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that',
+    'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'my',
+    'your', 'his', 'her', 'its', 'our', 'their'
+})
+
+# Index kinds: (table, id column, text column, date column)
+SOURCES = {
+    'captions': ('videos', 'video_id', 'caption', 'publish_date'),
+    'comments': ('comments', 'comment_id', 'text', 'date'),
+}
+
+# Bucket for rows without a date; only counted when no date range is given
+UNDATED = ''
+
+
+def count_words(texts: Iterable[str]) -> Counter:
+    """
+    Word counts of texts, without hashtags, mentions, URLs, punctuation, stop words
+    and words of two letters or fewer
+    """
+    text = ' '.join(texts)
+    text = HASHTAG_PATTERN.sub('', text)
+    text = MENTION_PATTERN.sub('', text)
+    text = URL_PATTERN.sub('', text)
+    text = PUNCT_PATTERN.sub('', text)
+    return Counter(w for w in text.lower().split() if len(w) > 2 and w not in STOP_WORDS)
+
+
+def top_words(counts: Counter, top_n: int = 20) -> List[Tuple[str, int]]:
+    """Most common words, ties broken alphabetically so results are stable"""
+    return heapq.nsmallest(top_n, counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _day(value) -> str:
+    """'YYYY-MM-DD' of a date string or datetime; UNDATED if missing"""
+    if value is None or value != value:
+        return UNDATED
+    return str(value)[:10]
+
+
+class WordIndex:
+    """
+    Per-kind vocabulary (word -> id) with one Counter of word ids per day.
+
+    Range queries merge days with a single np.bincount over each day's compacted
+    (ids, counts) arrays, which are cached until the day changes again.
+    """
+
+    def __init__(self):
+        """Empty index; fill it with add() or build()"""
+        self._vocab: Dict[str, Dict[str, int]] = {kind: {} for kind in SOURCES}
+        self._words: Dict[str, List[str]] = {kind: [] for kind in SOURCES}
+        self._buckets: Dict[str, Dict[str, Counter]] = {kind: {} for kind in SOURCES}
+        self._arrays: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {kind: {} for kind in SOURCES}
+        self._totals: Dict[str, Counter] = {kind: Counter() for kind in SOURCES}
+        self._seen: Dict[str, set] = {kind: set() for kind in SOURCES}
+        self._lock = threading.RLock()
+        self.built = False
+
+    def add(self, kind: str, rows: Iterable[Any]) -> int:
+        """
+        Count the words of rows not indexed yet
+
+        Args:
+            kind: 'captions' or 'comments'
+            rows: Records or dicts carrying the id, text and date columns of the kind
+
+        Returns:
+            Number of rows added
+        """
+        _, id_col, text_col, date_col = SOURCES[kind]
+        by_day: Dict[str, List[str]] = {}
+        with self._lock:
+            seen = self._seen[kind]
+            for row in rows:
+                row_id = row.get(id_col)
+                text = row.get(text_col)
+                if row_id is None:
+                    continue
+                row_id = str(row_id)
+                if row_id in seen:
+                    continue
+                seen.add(row_id)
+                if text and text == text:
+                    by_day.setdefault(_day(row.get(date_col)), []).append(str(text))
+
+            vocab, words = self._vocab[kind], self._words[kind]
+            buckets, arrays, totals = self._buckets[kind], self._arrays[kind], self._totals[kind]
+            for day, texts in by_day.items():
+                counts = Counter()
+                for word, n in count_words(texts).items():
+                    word_id = vocab.get(word)
+                    if word_id is None:
+                        word_id = vocab[word] = len(words)
+                        words.append(word)
+                    counts[word_id] = n
+                buckets.setdefault(day, Counter()).update(counts)
+                totals.update(counts)
+                arrays.pop(day, None)
+        return sum(len(texts) for texts in by_day.values())
+
+    def add_batch(self, videos: List[Any], comments: List[Any]):
+        """Index a saved ingest batch (the ingest on_saved hook)"""
+        if videos:
+            self.add('captions', videos)
+        if comments:
+            self.add('comments', comments)
+
+    def build(self, db) -> Dict[str, int]:
+        """
+        Index every stored caption and comment, page by page
+
+        Returns:
+            {kind: rows added}
+        """
+        added = {}
+        with self._lock:
+            for kind, (table, id_col, text_col, date_col) in SOURCES.items():
+                added[kind] = 0
+                for df in db.iter_pages(table, columns=[id_col, text_col, date_col]):
+                    added[kind] += self.add(kind, df.to_dict(orient='records'))
+            self.built = True
+        print(f"[INFO] Word index built: {added['captions']} captions, {added['comments']} comments")
+        return added
+
+    def ensure_built(self, db):
+        """Build from storage once, if the index has not been built yet"""
+        if not self.built:
+            with self._lock:
+                if not self.built and db is not None and db.is_connected():
+                    self.build(db)
+
+    def counts(self, kind: str, since: Optional[str] = None, until: Optional[str] = None) -> Counter:
+        """
+        Merged word counts of the days in [since, until] (inclusive, 'YYYY-MM-DD...')
+
+        Without a range this is the running total, undated rows included.
+        """
+        with self._lock:
+            words = self._words[kind]
+            if not since and not until:
+                return Counter({words[i]: n for i, n in self._totals[kind].items()})
+            merged = self._merge_days(kind, since, until)
+            nonzero = np.flatnonzero(merged)
+            return Counter(dict(zip([words[i] for i in nonzero.tolist()], merged[nonzero].tolist())))
+
+    def top(self, kind: str, since: Optional[str] = None, until: Optional[str] = None, top_n: int = 20) -> List[Tuple[str, int]]:
+        """Top words of a kind between two dates"""
+        with self._lock:
+            words = self._words[kind]
+            if not since and not until:
+                best = heapq.nlargest(top_n, self._totals[kind].items(), key=lambda item: item[1])
+                # Widen to every word tied with the last one so ties break alphabetically
+                floor = best[-1][1] if best and len(best) == top_n else 1
+                candidates = [(words[i], n) for i, n in self._totals[kind].items() if n >= floor]
+            else:
+                merged = self._merge_days(kind, since, until)
+                if len(merged) > top_n:
+                    floor = max(int(np.partition(merged, len(merged) - top_n)[len(merged) - top_n]), 1)
+                else:
+                    floor = 1
+                ids = np.flatnonzero(merged >= floor)
+                candidates = list(zip([words[i] for i in ids.tolist()], merged[ids].tolist()))
+        return sorted(candidates, key=lambda item: (-item[1], item[0]))[:top_n]
+
+    def _merge_days(self, kind, since, until) -> np.ndarray:
+        """Counts per word id over the dated days in range"""
+        low, high = _day(since) if since else None, _day(until) if until else None
+        buckets, arrays = self._buckets[kind], self._arrays[kind]
+        ids, counts = [], []
+        for day in buckets:
+            if day == UNDATED or (low and day < low) or (high and day > high):
+                continue
+            if day not in arrays:
+                bucket = buckets[day]
+                arrays[day] = (np.fromiter(bucket.keys(), np.int64, len(bucket)),
+                               np.fromiter(bucket.values(), np.int64, len(bucket)))
+            ids.append(arrays[day][0])
+            counts.append(arrays[day][1])
+        size = len(self._words[kind])
+        if not ids:
+            return np.zeros(size, dtype=np.int64)
+        return np.bincount(np.concatenate(ids), weights=np.concatenate(counts), minlength=size).astype(np.int64)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                kind: {
+                    "rows": len(self._seen[kind]),
+                    "days": len(self._buckets[kind]),
+                    "vocabulary": len(self._words[kind]),
+                }
+                for kind in SOURCES
+            } | {"built": self.built}
+
+    def clear(self):
+        with self._lock:
+            for kind in SOURCES:
+                for part in (self._vocab, self._words, self._buckets, self._arrays, self._totals, self._seen):
+                    part[kind].clear()
+            self.built = False
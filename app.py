@@ -6,16 +6,26 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from wordcloud import WordCloud
-import matplotlib.pyplot as plt
 import pandas as pd
 from datetime import datetime, timedelta
+import hashlib
+import io
+import json
 import os
 
 from scraper import scrape_hashtag_sync, scrape_user_sync
 from analysis import TikTokAnalyzer
+from word_index import count_words, top_words
 from sheets import SheetsManager
 
 
+# Rendered word clouds kept across reruns and sessions (least recently used are evicted)
+WORDCLOUD_CACHE_ENTRIES = int(os.environ.get("WORDCLOUD_CACHE_ENTRIES", 32))
+WORDCLOUD_MAX_WORDS = 50
+# Cached query results (enriched frames, filtered views, summaries) per function
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", 64))
+
+
 # Page configuration
 st.set_page_config(
     page_title="TikTok Analytics Dashboard",
@@ -44,8 +54,8 @@ if 'df' not in st.session_state:
     st.session_state.df = pd.DataFrame()
 if 'df_comments' not in st.session_state:
     st.session_state.df_comments = pd.DataFrame()
-if 'df_comments_filtered' not in st.session_state:
-    st.session_state.df_comments_filtered = pd.DataFrame()
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = None
 
 
 @st.cache_resource
@@ -62,31 +72,155 @@ def get_analyzer():
     return TikTokAnalyzer()
 
 
-def create_wordcloud(text_data):
-    """Generate word cloud from text data"""
-    if not text_data:
+def word_frequencies(texts):
+    """Counts of the most frequent words in a text column, the word cloud input"""
+    return dict(top_words(count_words(texts.dropna().astype(str)), WORDCLOUD_MAX_WORDS))
+
+
+def dataset_version(df, df_comments):
+    """
+    Content hash of the loaded frames. Cached queries below take it in place of
+    the frames themselves (passed as unhashed _df arguments), so sessions holding
+    the same data share results and a new load or scrape invalidates them.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for frame in (df, df_comments):
+        if not frame.empty:
+            try:
+                digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+            except TypeError:
+                digest.update(frame.to_csv(index=False).encode('utf-8'))
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+def set_data(df, df_comments):
+    """Replace the session's raw frames and stamp their version"""
+    st.session_state.df = df
+    st.session_state.df_comments = df_comments
+    st.session_state.data_version = dataset_version(df, df_comments)
+    st.session_state.data_loaded = True
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def enriched_videos(version, _df):
+    """Videos with analytics, parsed publish dates and total engagement"""
+    df = _df.copy()
+    analyzer = get_analyzer()
+    if 'engagement_rate' not in df.columns:
+        df = analyzer.calculate_engagement_rate(df)
+    if 'sentiment' not in df.columns or 'sentiment_score' not in df.columns:
+        df = analyzer.add_sentiment_analysis(df, method='vader')
+    if 'publish_date' in df.columns:
+        df['publish_date'] = pd.to_datetime(df['publish_date'], errors='coerce')
+        df = df.dropna(subset=['publish_date'])
+    df['total_engagement'] = df['likes'] + df['comments'] + df['shares']
+    return df
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def enriched_comments(version, _df_comments):
+    """Comments with sentiment and parsed dates"""
+    df_c = _df_comments.copy()
+    if not df_c.empty and 'sentiment' not in df_c.columns:
+        df_c = get_analyzer().add_sentiment_analysis(df_c, method='vader', text_column='text')
+    if not df_c.empty and 'date' in df_c.columns:
+        df_c['date'] = pd.to_datetime(df_c['date'], errors='coerce')
+    return df_c
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def filtered_videos(version, start, end, _df):
+    """Enriched videos published between start and end (dates, inclusive); all if unset"""
+    df = enriched_videos(version, _df)
+    if start and end and 'publish_date' in df.columns:
+        days = df['publish_date'].dt.date
+        df = df[(days >= start) & (days <= end)]
+    return df
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def filtered_comments(version, start, end, _df_comments):
+    """Enriched comments posted between start and end (dates, inclusive); all if unset"""
+    df_c = enriched_comments(version, _df_comments)
+    if start and end and 'date' in df_c.columns:
+        days = df_c['date'].dt.date
+        df_c = df_c[(days >= start) & (days <= end)]
+    return df_c
+
+
+def _sentiment_counts(df):
+    counts = df['sentiment'].value_counts().reset_index()
+    counts.columns = ['sentiment', 'count']
+    return counts
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def video_summary(version, start, end, _df):
+    """KPIs, sentiment counts, daily totals, top videos and author leaderboard of the filtered videos"""
+    df = filtered_videos(version, start, end, _df)
+    return {
+        'videos': len(df),
+        'views': df['views'].sum(),
+        'likes': df['likes'].sum(),
+        'shares': df['shares'].sum(),
+        'saves': df['saves'].sum() if 'saves' in df.columns else 0,
+        'comments': df['comments'].sum(),
+        'avg_engagement': df['engagement_rate'].mean(),
+        'top_videos': df.sort_values('views', ascending=False).head(4),
+        'sentiment_counts': _sentiment_counts(df),
+        'time_agg': get_analyzer().aggregate_by_time(df, freq='D'),
+        'author_stats': df.groupby('author').agg({
+            'video_id': 'count',
+            'views': 'sum',
+            'engagement_rate': 'mean'
+        }).round(2).sort_values('views', ascending=False).head(8),
+        'word_frequencies': word_frequencies(df['caption']),
+    }
+
+
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def comment_summary(version, start, end, _df_comments):
+    """Sentiment counts, top liked comments and keywords of the filtered comments"""
+    df_c = filtered_comments(version, start, end, _df_comments)
+    if df_c.empty:
         return None
-    
+    return {
+        'sentiment_counts': _sentiment_counts(df_c),
+        'top_comments': df_c.sort_values('likes', ascending=False).head(10),
+        'word_frequencies': word_frequencies(df_c['text']),
+    }
+
+
+@st.cache_data(max_entries=WORDCLOUD_CACHE_ENTRIES, show_spinner=False)
+def render_wordcloud(frequencies_hash, _frequencies):
+    """PNG bytes of a word cloud, cached by the hash of its frequencies"""
     wordcloud = WordCloud(
         width=800,
         height=400,
         background_color='white',
         colormap='viridis',
-        max_words=50
-    ).generate(text_data)
-    
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.imshow(wordcloud, interpolation='bilinear')
-    ax.axis('off')
-    plt.tight_layout(pad=0)
+        max_words=WORDCLOUD_MAX_WORDS,
+        random_state=42
+    ).generate_from_frequencies(_frequencies)
     
-    return fig
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def create_wordcloud(frequencies):
+    """Word cloud PNG for word counts (see word_frequencies), or None if there are none"""
+    if not frequencies:
+        return None
+    frequencies_hash = hashlib.blake2b(json.dumps(sorted(frequencies.items())).encode('utf-8'), digest_size=16).hexdigest()
+    return render_wordcloud(frequencies_hash, frequencies)
 
 
 
- def main():
-     # Header
-     st.markdown('<h1 class="main-header">📊 TikTok Social Listening Dashboard</h1>', unsafe_allow_html=True)
+def main():
+    # Header
+    st.markdown('<h1 class="main-header">📊 TikTok Social Listening Dashboard</h1>', unsafe_allow_html=True)
     st.markdown("Track hashtags, analyze sentiment, and discover insights from TikTok content")
     
     # Sidebar
@@ -179,10 +313,6 @@ def create_wordcloud(text_data):
                             st.sidebar.success(msg)
                         else:
                             st.sidebar.warning("⚠️ Google Sheets not connected. Data not saved.")
-                            if st.session_state.df.empty:
-                                st.session_state.df = pd.DataFrame(results)
-                            else:
-                                st.session_state.df = pd.concat([st.session_state.df, pd.DataFrame(results)], ignore_index=True)
                         
                         # Update session state immediately so UI refreshes without manual load
                         new_df = pd.DataFrame(results)
@@ -190,21 +320,20 @@ def create_wordcloud(text_data):
                         new_df = analyzer.calculate_engagement_rate(new_df)
                         new_df = analyzer.add_sentiment_analysis(new_df, method='vader')
                         
-                        if st.session_state.df.empty:
-                            st.session_state.df = new_df
-                        else:
-                            st.session_state.df = pd.concat([st.session_state.df, new_df], ignore_index=True).drop_duplicates('video_id')
+                        df_all = new_df
+                        if not st.session_state.df.empty:
+                            df_all = pd.concat([st.session_state.df, new_df], ignore_index=True).drop_duplicates('video_id')
                         
+                        df_comments_all = st.session_state.df_comments
                         if all_comments:
                             new_c_df = pd.DataFrame(all_comments)
                             new_c_df = analyzer.add_sentiment_analysis(new_c_df, method='vader', text_column='text')
-                            if st.session_state.df_comments.empty:
-                                st.session_state.df_comments = new_c_df
+                            if df_comments_all.empty:
+                                df_comments_all = new_c_df
                             else:
-                                st.session_state.df_comments = pd.concat([st.session_state.df_comments, new_c_df], ignore_index=True).drop_duplicates('comment_id')
-                            st.session_state.df_comments_filtered = st.session_state.df_comments
+                                df_comments_all = pd.concat([df_comments_all, new_c_df], ignore_index=True).drop_duplicates('comment_id')
                         
-                        st.session_state.data_loaded = True
+                        set_data(df_all, df_comments_all)
                         
                     else:
                         st.sidebar.error("No data found or Apify run failed. Check your token and credits.")
@@ -228,105 +357,75 @@ def create_wordcloud(text_data):
                 df = analyzer.calculate_engagement_rate(df)
                 df = analyzer.add_sentiment_analysis(df, method='vader')
                 
-                st.session_state.df = df
-                
                 # Load comments
                 df_comments = sheets.get_all_comments()
                 if not df_comments.empty:
                     df_comments = analyzer.add_sentiment_analysis(df_comments, method='vader', text_column='text')
-                st.session_state.df_comments = df_comments
-                st.session_state.df_comments_filtered = df_comments # Initialize
                 
-                st.session_state.data_loaded = True
+                set_data(df, df_comments)
                 st.sidebar.success(f"✅ Loaded {len(df)} videos and {len(df_comments)} comments")
             else:
                 st.sidebar.warning("No data found in Google Sheets")
     
     # Date range filter
+    # Everything below is served by the cached queries, keyed by the data version and
+    # the selected dates, so a rerun only recomputes what its inputs changed
+    version = st.session_state.data_version
+    start_date = end_date = None
     if st.session_state.data_loaded and not st.session_state.df.empty:
         st.sidebar.header("📅 Date Range")
         
-        df = st.session_state.df
-        
-        if 'publish_date' in df.columns:
-            # Ensure publish_date is datetime
-            df['publish_date'] = pd.to_datetime(df['publish_date'], errors='coerce')
-            
-            # Drop rows with invalid dates if any
-            df = df.dropna(subset=['publish_date'])
+        df_all = enriched_videos(version, st.session_state.df)
+        if 'publish_date' in df_all.columns and not df_all.empty:
+            min_date = df_all['publish_date'].min().date()
+            max_date = df_all['publish_date'].max().date()
             
-            if not df.empty:
-                min_date = df['publish_date'].min().date()
-                max_date = df['publish_date'].max().date()
-                
-                date_range = st.sidebar.date_input(
-                    "Select date range",
-                    value=(min_date, max_date),
-                    min_value=min_date,
-                    max_value=max_date
-                )
+            date_range = st.sidebar.date_input(
+                "Select date range",
+                value=(min_date, max_date),
+                min_value=min_date,
+                max_value=max_date
+            )
             
             if len(date_range) == 2:
-                mask = (df['publish_date'].dt.date >= date_range[0]) & (df['publish_date'].dt.date <= date_range[1])
-                df = df[mask]
-                
-                # Also filter comments if they exist
-                if not st.session_state.df_comments.empty:
-                    df_c = st.session_state.df_comments
-                    if 'date' in df_c.columns:
-                        mask_c = (df_c['date'].dt.date >= date_range[0]) & (df_c['date'].dt.date <= date_range[1])
-                        st.session_state.df_comments_filtered = df_c[mask_c]
-                    else:
-                        st.session_state.df_comments_filtered = df_c
-                else:
-                    st.session_state.df_comments_filtered = pd.DataFrame()
+                start_date, end_date = date_range
     
     # Main content
     if st.session_state.data_loaded and not st.session_state.df.empty:
-        df = st.session_state.df
-        analyzer = get_analyzer()
-        
-        # Ensure analytics are calculated (for both fresh scrapes and loaded data)
-        if 'engagement_rate' not in df.columns:
-            df = analyzer.calculate_engagement_rate(df)
-        if 'sentiment' not in df.columns or 'sentiment_score' not in df.columns:
-            df = analyzer.add_sentiment_analysis(df, method='vader')
-        
-        # Update session state with enriched data
-        st.session_state.df = df
+        df = filtered_videos(version, start_date, end_date, st.session_state.df)
+        summary = video_summary(version, start_date, end_date, st.session_state.df)
+        comments = comment_summary(version, start_date, end_date, st.session_state.df_comments)
         
         # Key metrics
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
-            st.metric("Total Videos", f"{len(df):,}")
+            st.metric("Total Videos", f"{summary['videos']:,}")
         with col2:
-            st.metric("Total Views", f"{df['views'].sum():,.0f}")
+            st.metric("Total Views", f"{summary['views']:,.0f}")
         with col3:
-            st.metric("Total Likes", f"{df['likes'].sum():,.0f}")
+            st.metric("Total Likes", f"{summary['likes']:,.0f}")
         with col4:
-            st.metric("Total Shares", f"{df['shares'].sum():,.0f}")
+            st.metric("Total Shares", f"{summary['shares']:,.0f}")
         with col5:
-            # Check if saves exist in the dataset
-            saves_sum = df['saves'].sum() if 'saves' in df.columns else 0
-            st.metric("Total Saves", f"{saves_sum:,.0f}")
+            st.metric("Total Saves", f"{summary['saves']:,.0f}")
         
         # New row for averages
         acol1, acol2, acol3 = st.columns(3)
         with acol1:
-            st.metric("Avg Engagement", f"{df['engagement_rate'].mean():.2f}%")
+            st.metric("Avg Engagement", f"{summary['avg_engagement']:.2f}%")
         with acol2:
-            st.metric("Total Comments", f"{df['comments'].sum():,.0f}")
+            st.metric("Total Comments", f"{summary['comments']:,.0f}")
         with acol3:
             # Comment data count
-            c_count = len(st.session_state.df_comments_filtered) if not st.session_state.df_comments_filtered.empty else 0
-            st.metric("Scraped Comments", f"{c_count:,}")
+            df_c = filtered_comments(version, start_date, end_date, st.session_state.df_comments)
+            st.metric("Scraped Comments", f"{len(df_c):,}")
         
         st.divider()
         
         # Top Content Gallery
         st.subheader("🔥 Top Trending Videos")
-        top_videos = df.sort_values('views', ascending=False).head(4)
+        top_videos = summary['top_videos']
         
         vid_cols = st.columns(4)
         for idx, (_, row) in enumerate(top_videos.iterrows()):
@@ -354,9 +453,7 @@ def create_wordcloud(text_data):
             st.subheader("🗺️ Engagement Landscape")
             # Bubble Chart: X=Time, Y=Views, Size=Likes+Comments, Color=Sentiment
             
-            # Normalize size for bubbles
-            df['total_engagement'] = df['likes'] + df['comments'] + df['shares']
-            
+            # Bubble size is total_engagement (likes + comments + shares), added by enriched_videos
             fig = px.scatter(
                 df,
                 x='publish_date',
@@ -380,8 +477,7 @@ def create_wordcloud(text_data):
             
         with col2:
             st.subheader("🎯 Sentiment Distribution")
-            sentiment_counts = df['sentiment'].value_counts().reset_index()
-            sentiment_counts.columns = ['sentiment', 'count']
+            sentiment_counts = summary['sentiment_counts']
             
             fig_pie = px.pie(
                 sentiment_counts, 
@@ -402,7 +498,7 @@ def create_wordcloud(text_data):
         col1, col2 = st.columns([2, 1])
         with col1:
             # Stacked Bar of interactions
-            time_agg = analyzer.aggregate_by_time(df, freq='D')
+            time_agg = summary['time_agg']
             if not time_agg.empty:
                 fig_bar = go.Figure(data=[
                     go.Bar(name='Likes', x=time_agg['publish_date'], y=time_agg['likes'], marker_color='#667eea'),
@@ -428,19 +524,13 @@ def create_wordcloud(text_data):
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("☁️ Trending Keywords")
-            all_captions = ' '.join(df['caption'].dropna().astype(str))
-            if all_captions:
-                wordcloud_fig = create_wordcloud(all_captions)
-                if wordcloud_fig:
-                    st.pyplot(wordcloud_fig, use_container_width=True)
+            wordcloud_png = create_wordcloud(summary['word_frequencies'])
+            if wordcloud_png:
+                st.image(wordcloud_png, use_container_width=True)
                     
         with col2:
              st.subheader("🏆 Influencer Leaderboard")
-             author_stats = df.groupby('author').agg({
-                'video_id': 'count',
-                'views': 'sum',
-                'engagement_rate': 'mean'
-            }).round(2).sort_values('views', ascending=False).head(8)
+             author_stats = summary['author_stats']
              
              # Display as a styled dataframe with bars
              st.dataframe(
@@ -464,12 +554,9 @@ def create_wordcloud(text_data):
         st.subheader("📋 Detailed Content Log")
         st.markdown("Click any URL to open the video/comment.")
         
-        # Prepare display copy
-        display_df = df.copy()
-        
         # Configure columns for clickable links
         st.dataframe(
-            display_df[[
+            df[[
                 'publish_date', 'author', 'caption', 'video_url', 
                 'views', 'likes', 'comments', 'engagement_rate', 'sentiment'
             ]],
@@ -492,15 +579,12 @@ def create_wordcloud(text_data):
         st.divider()
         st.header("💬 Detailed Comment Analysis")
         
-        df_c = st.session_state.df_comments_filtered
-        
-        if not df_c.empty:
+        if comments is not None:
             ccol1, ccol2 = st.columns([1, 2])
             
             with ccol1:
                 st.subheader("Comment Sentiment")
-                c_sentiment_counts = df_c['sentiment'].value_counts().reset_index()
-                c_sentiment_counts.columns = ['sentiment', 'count']
+                c_sentiment_counts = comments['sentiment_counts']
                 
                 fig_c_pie = px.pie(
                     c_sentiment_counts,
@@ -531,14 +615,12 @@ def create_wordcloud(text_data):
             
             with ccol2:
                 st.subheader("Trending Comment Keywords")
-                comment_text = ' '.join(df_c['text'].dropna().astype(str))
-                if comment_text:
-                    c_wordcloud = create_wordcloud(comment_text)
-                    if c_wordcloud:
-                        st.pyplot(c_wordcloud, use_container_width=True)
+                c_wordcloud_png = create_wordcloud(comments['word_frequencies'])
+                if c_wordcloud_png:
+                    st.image(c_wordcloud_png, use_container_width=True)
                 
                 st.subheader("Top Liked Comments")
-                top_comments = df_c.sort_values('likes', ascending=False).head(10)
+                top_comments = comments['top_comments']
                 st.dataframe(
                     top_comments[['author', 'text', 'likes', 'date', 'sentiment']],
                     column_config={
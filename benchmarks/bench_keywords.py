@@ -0,0 +1,83 @@
+"""
+Benchmark: compiled keyword-group matcher vs the dashboard's linear scan.
+
+The linear scan is a direct port of the old useTikTokData filter: for every
+video, `includes()` per exclude keyword, then either `includes()` or a freshly
+built word-boundary RegExp per keyword.
+
+Usage:
+    python benchmarks/bench_keywords.py [--videos 100000] [--keywords 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.keywords import KeywordMatcher, video_text
+
+
+WORDS = [
+    'dance', 'viral', 'fyp', 'music', 'love', 'funny', 'food', 'recipe', 'travel', 'style',
+    'makeup', 'fitness', 'gym', 'cat', 'dog', 'trend', 'challenge', 'duet', 'pov', 'storytime',
+    'nairobi', 'kenya', 'football', 'news', 'comedy', 'art', 'diy', 'tech', 'phone', 'review',
+]
+
+
+def linear_scan(texts, keywords, exclude_keywords, exact_match):
+    keywords = [k.lower().strip() for k in keywords]
+    exclude_keywords = [k.lower().strip() for k in exclude_keywords]
+    out = []
+    for text in texts:
+        # Exclusions are substring matches in both modes, as in KeywordMatcher
+        if any(k in text for k in exclude_keywords):
+            out.append(False)
+        elif exact_match:
+            out.append(any(re.search(r'\b' + re.escape(k) + r'\b', text, re.ASCII) for k in keywords))
+        else:
+            out.append(any(k in text for k in keywords))
+    return out
+
+
+def make_frame(n, rng):
+    captions = [' '.join(rng.choices(WORDS, k=rng.randint(3, 15))) + f' {rng.randint(0, 10**6)}' for _ in range(n)]
+    hashtags = [', '.join(rng.choices(WORDS, k=rng.randint(0, 5))) for _ in range(n)]
+    return pd.DataFrame({'caption': captions, 'hashtags': hashtags})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--videos', type=int, default=100_000)
+    parser.add_argument('--keywords', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    df = make_frame(args.videos, rng)
+    keywords = [f'{rng.choice(WORDS)}{rng.randint(0, 999)}' for _ in range(args.keywords - 2)] + ['storytime', 'nairobi']
+    exclude = ['challenge']
+    texts = video_text(df).tolist()
+
+    for exact in (False, True):
+        start = time.perf_counter()
+        expected = linear_scan(texts, keywords, exclude, exact)
+        linear = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords, exclude, exact)
+        actual = [matcher.matches(t) for t in texts]
+        compiled = time.perf_counter() - start
+
+        assert actual == expected, 'compiled matcher disagrees with the linear scan'
+        print(f"exact_match={exact!s:5}  videos={args.videos:,}  keywords={args.keywords}  "
+              f"linear={linear:.3f}s  compiled={compiled:.3f}s  speedup={linear / compiled:.1f}x  "
+              f"matches={sum(actual):,}")
+
+
+if __name__ == '__main__':
+    main()
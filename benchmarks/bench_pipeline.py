@@ -0,0 +1,281 @@
+"""
+Benchmark suite: scrape -> map -> store -> analyze on a synthetic corpus.
+
+Items come from benchmarks/corpus.py (seeded, realistic Apify JSON), so no
+Apify token or database is needed. Stages:
+
+    map_result            TikTokScraper._map_result per item (comments nested)
+    map_page              TikTokScraper._map_page per dataset page (records)
+    records_frame         mapped videos to a DataFrame
+    sentiment_vader       TikTokAnalyzer.add_sentiment_analysis(method='vader')
+    sentiment_textblob    TikTokAnalyzer.add_sentiment_analysis(method='textblob')
+    word_frequency        TikTokAnalyzer.extract_word_frequency
+    aggregate_by_time     TikTokAnalyzer.aggregate_by_time, daily and hourly
+    save_videos           SupabaseManager.save_videos against an in-memory fake client
+    save_comments         SupabaseManager.save_comments against the same fake client
+    api_data              GET /api/data through the FastAPI TestClient (local in-memory store),
+                          walking every page cold, then one cached page and one 304
+
+Results are written as JSON; pass --compare with an earlier file to print
+per-stage ratios and fail (exit 1) on stages slower than --threshold.
+--repeat keeps the best of several runs, which steadies the small scales.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scale 1k|100k|1m [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# /api/data reads an in-memory local store; set before the api modules read their config
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['LOCAL_DB_PATH'] = ':memory:'
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from benchmarks.corpus import Corpus, SCALES
+from api.analysis import TikTokAnalyzer
+from api.database import SupabaseManager
+from api.records import records_frame
+from api.scraper import TikTokScraper
+
+
+class FakeQuery:
+    def __init__(self, store, table):
+        self.store, self.table = store, table
+        self.rows, self.key = [], None
+
+    def upsert(self, rows, on_conflict=None, returning=None):
+        self.rows, self.key = rows, [c.strip() for c in on_conflict.split(',')]
+        return self
+
+    def execute(self):
+        table = self.store.setdefault(self.table, {})
+        for row in self.rows:
+            table[tuple(row[c] for c in self.key)] = row
+        return self
+
+
+class FakeClient:
+    """Just enough of the Supabase client for upserts, keeping rows in a dict"""
+    def __init__(self):
+        self.store = {}
+
+    def table(self, name):
+        return FakeQuery(self.store, name)
+
+
+class FakePool:
+    def __init__(self):
+        self.url, self.key = 'memory://', 'benchmark'
+        self._client = FakeClient()
+
+    def client(self):
+        return self._client
+
+
+class Suite:
+    def __init__(self, scale, seed, comments_per_video, sentiment_rows, sentiment_workers=1):
+        self.n = SCALES[scale]
+        self.corpus = Corpus(seed=seed, comments_per_video=comments_per_video)
+        self.sentiment_rows = sentiment_rows
+        self.sentiment_workers = sentiment_workers
+        self.scraper = TikTokScraper(api_token='synthetic')
+        self.analyzer = TikTokAnalyzer(use_cache=False)
+        self.results = {}
+
+    def record(self, stage, rows, seconds, **extra):
+        self.results[stage] = {
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+            **extra,
+        }
+        print(f"  {stage:20} rows={rows:>10,}  {seconds * 1000:10.1f}ms  {self.results[stage]['rows_per_sec'] or 0:>12,.0f} rows/s")
+
+    def run(self):
+        map_result = map_page = 0.0
+        videos, comments = [], []
+        for page in self.corpus.pages(self.n):
+            start = time.perf_counter()
+            for item in page:
+                self.scraper._map_result(item, extract_comments=True)
+            map_result += time.perf_counter() - start
+
+            start = time.perf_counter()
+            page_videos, page_comments, _ = self.scraper._map_page(page, comments_per_video=1)
+            map_page += time.perf_counter() - start
+            videos.extend(page_videos)
+            comments.extend(page_comments)
+        self.record('map_result', self.n, map_result)
+        self.record('map_page', self.n, map_page, comments=len(comments))
+
+        start = time.perf_counter()
+        df = records_frame(videos)
+        self.record('records_frame', len(df), time.perf_counter() - start)
+
+        sample = df if not self.sentiment_rows else df.head(self.sentiment_rows)
+        for method in ('vader', 'textblob'):
+            start = time.perf_counter()
+            self.analyzer.add_sentiment_analysis(sample, method=method, text_column='caption',
+                                                workers=self.sentiment_workers)
+            self.record(f'sentiment_{method}', len(sample), time.perf_counter() - start,
+                        distinct_texts=int(sample['caption'].nunique()))
+
+        start = time.perf_counter()
+        self.analyzer.extract_word_frequency(df, top_n=20)
+        self.record('word_frequency', len(df), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.analyzer.aggregate_by_time(df, freq='D')
+        self.analyzer.aggregate_by_time(df, freq='h')
+        self.record('aggregate_by_time', len(df), time.perf_counter() - start)
+
+        scored = self.analyzer.calculate_engagement_rate(df)
+        scored['sentiment'], scored['sentiment_score'], scored['scorer_version'] = 'neutral', 0.0, 1
+        manager = SupabaseManager(pool=FakePool())
+        start = time.perf_counter()
+        manager.save_videos(videos)
+        self.record('save_videos', len(videos), time.perf_counter() - start)
+        start = time.perf_counter()
+        manager.save_comments(comments)
+        self.record('save_comments', len(comments), time.perf_counter() - start)
+
+        self.api_data(scored)
+        return self.results
+
+    def api_data(self, df):
+        from fastapi.testclient import TestClient
+        from api import index
+
+        db = index.get_storage()
+        db.save_videos(df.to_dict(orient='records'))
+        client = TestClient(index.app)
+
+        index.response_cache.clear()
+        pages, rows, cursor = 0, 0, None
+        start = time.perf_counter()
+        while True:
+            params = {'limit': 1000}
+            if cursor:
+                params['cursor'] = cursor
+            payload = client.get('/api/data', params=params).json()
+            pages += 1
+            rows += len(payload.get('videos', []))
+            cursor = payload.get('next_cursor')
+            if not cursor:
+                break
+        self.record('api_data', rows, time.perf_counter() - start, pages=pages)
+
+        first = client.get('/api/data', params={'limit': 1000})
+        start = time.perf_counter()
+        client.get('/api/data', params={'limit': 1000})
+        cached = time.perf_counter() - start
+        start = time.perf_counter()
+        status = client.get('/api/data', params={'limit': 1000}, headers={'If-None-Match': first.headers['etag']}).status_code
+        not_modified = time.perf_counter() - start
+        self.results['api_data'].update({
+            'cached_page_seconds': round(cached, 4),
+            'not_modified_seconds': round(not_modified, 4),
+            'not_modified_status': status,
+        })
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, threshold, min_seconds):
+    """
+    Print per-stage time ratios against a baseline; returns the regressed stages.
+    Stages faster than min_seconds in both runs are too noisy to flag.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline['meta']['scale'] != results['meta']['scale']:
+        print(f"[WARN] Baseline scale {baseline['meta']['scale']} differs from {results['meta']['scale']}")
+    regressions = []
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit')}):")
+    for stage, result in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if not before or not before['seconds']:
+            print(f"  {stage:20} (new)")
+            continue
+        ratio = result['seconds'] / before['seconds']
+        noisy = max(result['seconds'], before['seconds']) < min_seconds
+        flag = 'REGRESSION' if ratio > threshold and not noisy else ('(noise)' if ratio > threshold else '')
+        if flag == 'REGRESSION':
+            regressions.append(stage)
+        print(f"  {stage:20} {before['seconds']:9.3f}s -> {result['seconds']:9.3f}s  x{ratio:5.2f}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=list(SCALES), default='1k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--comments-per-video', type=int, default=3)
+    parser.add_argument('--sentiment-rows', type=int, default=100_000,
+                        help='Captions scored per sentiment method (0 = all)')
+    parser.add_argument('--sentiment-workers', type=int, default=1,
+                        help='Sentiment process pool size (1 = serial, as in the API)')
+    parser.add_argument('--output', help='JSON results path (default benchmarks/results/pipeline-<scale>-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Slowdown ratio reported as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='Stages faster than this are not flagged')
+    parser.add_argument('--repeat', type=int, default=1, help='Run the suite N times and keep the best time per stage')
+    args = parser.parse_args()
+
+    print(f"Pipeline benchmark: scale={args.scale} ({SCALES[args.scale]:,} videos), seed={args.seed}")
+    started = time.perf_counter()
+    stages = {}
+    for _ in range(max(1, args.repeat)):
+        for stage, result in Suite(args.scale, args.seed, args.comments_per_video, args.sentiment_rows,
+                                   args.sentiment_workers).run().items():
+            if stage not in stages or result['seconds'] < stages[stage]['seconds']:
+                stages[stage] = result
+    results = {
+        'meta': {
+            'scale': args.scale,
+            'videos': SCALES[args.scale],
+            'seed': args.seed,
+            'comments_per_video': args.comments_per_video,
+            'sentiment_rows': args.sentiment_rows,
+            'sentiment_workers': args.sentiment_workers,
+            'repeat': args.repeat,
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'total_seconds': round(time.perf_counter() - started, 2),
+        },
+        'stages': stages,
+    }
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"pipeline-{args.scale}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold, args.min_seconds):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
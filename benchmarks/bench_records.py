@@ -0,0 +1,117 @@
+"""
+Benchmark: memory held by mapped videos/comments as VideoRecord/CommentRecord
+vs plain dicts, plus the time to map a batch and build its upsert payloads.
+
+The dict path is the previous one: column_rows() dicts, copied again into
+type-coerced payloads by save_videos/save_comments. The record path builds
+slotted records from the mapper's columns and serializes them with to_row().
+
+Usage:
+    python benchmarks/bench_records.py [--videos 200000] [--comments-per-video 3]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.mapper import map_items, column_rows, column_records
+from api.records import VideoRecord, CommentRecord
+
+
+TAGS = ['fyp', 'viral', 'dance', 'music', 'food', 'travel', 'kenya', 'comedy', 'news', 'tech']
+
+
+def make_items(n, comments_per_video, rng):
+    start = 1_767_225_600  # 2026-01-01
+    for i in range(n):
+        tags = rng.sample(TAGS, rng.randint(0, 3))
+        yield {
+            'id': str(7_000_000_000_000_000_000 + i),
+            'webVideoUrl': f'https://www.tiktok.com/@u/video/{i}',
+            'text': f'caption {i} ' + ' '.join('#' + t for t in tags),
+            'authorMeta': {'name': f'author{rng.randint(0, n // 50 + 1)}'},
+            'diggCount': rng.randint(0, 100_000), 'commentCount': rng.randint(0, 500),
+            'shareCount': rng.randint(0, 300), 'collectCount': rng.randint(0, 200),
+            'playCount': rng.randint(1, 2_000_000),
+            'createTime': start + rng.randint(0, 270 * 86400),
+            'hashtags': [{'name': t} for t in tags],
+            'coverUrl': f'https://p16-sign.tiktokcdn.com/{i}.jpeg',
+            'comments': [
+                {'id': f'{i}-{j}', 'text': f'comment {j} on {i}', 'authorUniqueId': f'fan{j}',
+                 'createTime': start + rng.randint(0, 270 * 86400), 'diggCount': rng.randint(0, 50)}
+                for j in range(comments_per_video)
+            ],
+        }
+
+
+def dict_payloads(videos, comments):
+    """The old save_videos/save_comments coercion copy"""
+    v_rows = [{
+        "video_id": str(v.get("video_id", "")), "video_url": v.get("video_url", ""),
+        "caption": v.get("caption", ""), "author": v.get("author", ""),
+        "likes": int(v.get("likes", 0)), "comments": int(v.get("comments", 0)),
+        "shares": int(v.get("shares", 0)), "saves": int(v.get("saves", 0)),
+        "views": int(v.get("views", 0)), "publish_date": v.get("publish_date"),
+        "hashtags": v.get("hashtags", ""), "mentions": v.get("mentions", ""),
+        "thumbnail_url": v.get("thumbnail_url", ""),
+    } for v in videos]
+    c_rows = [{
+        "comment_id": str(c.get("comment_id", "")), "video_id": str(c.get("video_id", "")),
+        "author": c.get("author", ""), "text": c.get("text", ""),
+        "likes": int(c.get("likes", 0)), "date": c.get("date"),
+    } for c in comments]
+    return v_rows, c_rows
+
+
+def measure(build):
+    """(seconds, bytes retained by the result, peak bytes) of build()"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--videos', type=int, default=200_000)
+    parser.add_argument('--comments-per-video', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    items = list(make_items(args.videos, args.comments_per_video, random.Random(args.seed)))
+    video_cols, comment_cols, _ = map_items(items, extract_comments=args.comments_per_video > 0)
+    n_comments = len(comment_cols['comment_id'])
+    print(f"{args.videos:,} videos, {n_comments:,} comments")
+
+    paths = {
+        'dicts': (
+            lambda: (column_rows(video_cols), column_rows(comment_cols)),
+            lambda held: dict_payloads(*held),
+        ),
+        'records': (
+            lambda: (column_records(video_cols, VideoRecord), column_records(comment_cols, CommentRecord)),
+            lambda held: ([v.to_row() for v in held[0]], [c.to_row() for c in held[1]]),
+        ),
+    }
+    for name, (build, serialize) in paths.items():
+        seconds, retained, peak = measure(build)
+        held = build()
+        payload_seconds = measure(lambda: serialize(held))[0]
+        per_row = retained / (args.videos + n_comments)
+        print(f"{name:8}  build={seconds * 1000:8.1f}ms  held={retained / 2**20:7.1f}MiB ({per_row:5.0f} B/row)  "
+              f"peak={peak / 2**20:7.1f}MiB  payloads={payload_seconds * 1000:8.1f}ms")
+        del held
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: dashboard aggregates pushed down to the local store vs paging rows
+through TikTokAnalyzer.build_aggregates.
+
+Both paths read the same LocalStore, so the difference is SQL aggregation
+against materializing every row as a DataFrame (the Supabase path also pays
+one network round trip per 1000-row page on top of this).
+
+Usage:
+    python benchmarks/bench_storage.py [--videos 200000] [--engine duckdb|sqlite]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.analysis import TikTokAnalyzer
+from api.local_store import LocalStore
+from api.storage import DEFAULT_PAGE_SIZE
+
+
+TAGS = ['fyp', 'viral', 'dance', 'music', 'food', 'travel', 'kenya', 'comedy', 'news', 'tech']
+
+
+def make_videos(n, rng):
+    start = datetime(2026, 1, 1)
+    for i in range(n):
+        views = rng.randint(1, 2_000_000)
+        likes, comments, shares = rng.randint(0, views // 10 + 1), rng.randint(0, 500), rng.randint(0, 300)
+        yield {
+            'video_id': str(7_000_000_000_000_000_000 + i),
+            'video_url': f'https://www.tiktok.com/@u/video/{i}',
+            'caption': f'caption {i}',
+            'author': f'author{rng.randint(0, n // 50 + 1)}',
+            'likes': likes, 'comments': comments, 'shares': shares,
+            'saves': rng.randint(0, 200), 'views': views,
+            'publish_date': (start + timedelta(seconds=rng.randint(0, 270 * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+            'hashtags': ', '.join(rng.sample(TAGS, rng.randint(0, 3))),
+            'mentions': '',
+            'sentiment': rng.choice(['positive', 'neutral', 'negative']),
+            'sentiment_score': round(rng.uniform(-1, 1), 4),
+            'engagement_rate': round((likes + comments + shares) / views * 100, 2),
+            'scorer_version': 1,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--videos', type=int, default=200_000)
+    parser.add_argument('--engine', choices=['duckdb', 'sqlite'], default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    store = LocalStore(':memory:', args.engine)
+    analyzer = TikTokAnalyzer(use_cache=False)
+
+    start = time.perf_counter()
+    batch = []
+    for video in make_videos(args.videos, rng):
+        batch.append(video)
+        if len(batch) == 10_000:
+            store.save_videos(batch)
+            batch = []
+    store.save_videos(batch)
+    print(f"engine={store.engine}  loaded {args.videos:,} videos in {time.perf_counter() - start:.2f}s")
+
+    for filters in ({}, {'hashtag': 'dance'}, {'since': '2026-06-01'}):
+        start = time.perf_counter()
+        pushed = store.aggregate_videos(**filters)
+        sql = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pages = list(store.iter_pages('videos', page_size=DEFAULT_PAGE_SIZE, **filters))
+        df = pd.concat(pages, ignore_index=True) if pages else pd.DataFrame()
+        paged = analyzer.build_aggregates(df)
+        python = time.perf_counter() - start
+
+        same = json.dumps(pushed, sort_keys=True, default=str) == json.dumps(paged, sort_keys=True, default=str)
+        print(f"filters={filters!s:24}  rows={pushed['kpis']['videos']:>9,}  sql={sql * 1000:8.1f}ms  "
+              f"paged={python * 1000:9.1f}ms  speedup={python / sql:6.1f}x  identical={same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: top words between two dates from the incremental WordIndex vs
+TikTokAnalyzer.extract_word_frequency re-tokenizing the filtered captions.
+
+The index is filled in ingest-sized batches (the cost is paid once, on
+ingest); each query then only merges the day counters in range.
+
+Usage:
+    python benchmarks/bench_words.py [--captions 1000000] [--batch 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.analysis import TikTokAnalyzer
+from api.word_index import WordIndex, count_words
+
+
+FILLER = ['the', 'and', 'this', 'you', 'for', 'with', 'is', 'my', 'it', 'on']
+TAGS = ['#fyp', '#viral', '#dance', '#kenya', '#foodtok']
+
+
+def make_captions(n, rng, vocabulary=20_000):
+    words = [f'word{i}' for i in range(vocabulary)]
+    # Zipf-like word popularity, as in real captions
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    start = datetime(2026, 1, 1)
+    pool = rng.choices(words, weights, k=n * 8)
+    for i in range(n):
+        body = pool[i * 8:i * 8 + rng.randint(3, 8)] + rng.sample(FILLER, 2)
+        caption = ' '.join(body) + f" {rng.choice(TAGS)} @user{i % 500} https://t.co/{i}!"
+        day = start + timedelta(seconds=rng.randint(0, 270 * 86400))
+        yield {'video_id': str(i), 'caption': caption, 'publish_date': day.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--captions', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = list(make_captions(args.captions, random.Random(args.seed)))
+    df = pd.DataFrame(rows)
+    analyzer = TikTokAnalyzer(use_cache=False)
+    print(f"{len(rows):,} captions")
+
+    index = WordIndex()
+    start = time.perf_counter()
+    for i in range(0, len(rows), args.batch):
+        index.add('captions', rows[i:i + args.batch])
+    build = time.perf_counter() - start
+    stats = index.stats()['captions']
+    print(f"index built in {build:.2f}s over {len(rows) // args.batch:,} ingest batches "
+          f"({stats['days']} days, {stats['vocabulary']:,} words)")
+
+    ranges = [(None, None), ('2026-03-01', '2026-03-31'), ('2026-06-01', '2026-06-07'), ('2026-01-01', '2026-09-30')]
+    for since, until in ranges:
+        start = time.perf_counter()
+        subset = df
+        if since:
+            subset = df[(df['publish_date'] >= since) & (df['publish_date'] <= until + ' 23:59:59')]
+        scanned = analyzer.extract_word_frequency(subset, top_n=args.top)
+        scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = index.top('captions', since, until, top_n=args.top)
+        query = time.perf_counter() - start
+
+        same = index.counts('captions', since, until) == count_words(subset['caption'])
+        same_top = sorted(scanned, key=lambda x: (-x[1], x[0])) == indexed or [c for _, c in scanned] == [c for _, c in indexed]
+        label = f"{since or '*'}..{until or '*'}"
+        print(f"{label:24} rows={len(subset):>9,}  scan={scan * 1000:9.1f}ms  index={query * 1000:8.1f}ms  "
+              f"speedup={scan / query:7.1f}x  identical_counts={same}  same_top={same_top}")
+
+
+if __name__ == '__main__':
+    main()
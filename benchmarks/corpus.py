@@ -0,0 +1,118 @@
+"""
+Seeded generator of synthetic Apify items (clockworks/tiktok-scraper output).
+
+Items mimic what the actor returns: string ids, epoch createTime plus
+createTimeISO, authorMeta, videoMeta, hashtag objects, counts that follow
+the view count, and nested comments. Captions mix words, emoji, hashtags,
+mentions and the odd URL; authors and hashtags follow Zipf-like
+distributions, so a few accounts and tags dominate as they do in real
+scrapes. The same seed always yields the same corpus.
+"""
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+WORDS = [
+    'dance', 'viral', 'love', 'funny', 'food', 'recipe', 'travel', 'style', 'makeup', 'fitness',
+    'gym', 'cat', 'dog', 'trend', 'challenge', 'duet', 'pov', 'storytime', 'nairobi', 'kenya',
+    'football', 'news', 'comedy', 'art', 'diy', 'tech', 'phone', 'review', 'music', 'beat',
+    'morning', 'night', 'weekend', 'vibes', 'best', 'worst', 'amazing', 'terrible', 'happy', 'sad',
+    'the', 'and', 'this', 'you', 'for', 'with', 'is', 'my', 'it', 'on', 'so', 'not', 'never', 'always',
+]
+EMOJI = ['😂', '🔥', '❤️', '😍', '🙏', '💯', '😭', '👀', '✨', '🇰🇪', '🎶', '🤣']
+HASHTAGS = [
+    'fyp', 'foryou', 'viral', 'trending', 'kenyantiktok', 'dance', 'comedy', 'foodtok', 'music',
+    'nairobi', 'football', 'fashion', 'duet', 'pov', 'storytime', 'tech', 'travel', 'love', 'art', 'diy',
+]
+COMMENT_PHRASES = [
+    'this is so good', 'I love this', 'worst take ever', 'not funny at all', 'who is here in 2026',
+    'need part 2', 'omg', 'facts', 'where is this place', 'the beat is amazing', 'so sad',
+]
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+SPAN = 270 * 86400
+
+
+def _zipf_cum_weights(n: int, s: float = 1.1) -> List[float]:
+    total, cum = 0.0, []
+    for rank in range(n):
+        total += 1 / (rank + 1) ** s
+        cum.append(total)
+    return cum
+
+
+class Corpus:
+    def __init__(self, seed: int = 42, authors: int = 5_000, comments_per_video: int = 3):
+        """
+        Args:
+            seed: Random seed; the same seed yields the same items
+            authors: Distinct author accounts (Zipf-distributed)
+            comments_per_video: Mean nested comments per item
+        """
+        self.seed = seed
+        self.authors = [f'creator_{i}' for i in range(authors)]
+        self.author_weights = _zipf_cum_weights(authors)
+        self.hashtag_weights = _zipf_cum_weights(len(HASHTAGS), 0.9)
+        self.comments_per_video = comments_per_video
+
+    def _caption(self, rng: random.Random) -> Tuple[str, List[str]]:
+        words = rng.choices(WORDS, k=rng.randint(3, 14))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EMOJI))
+        if rng.random() < 0.2:
+            words.append('@' + rng.choice(self.authors))
+        if rng.random() < 0.03:
+            words.append(f'https://linktr.ee/{rng.choice(self.authors)}')
+        tags = list(dict.fromkeys(rng.choices(HASHTAGS, cum_weights=self.hashtag_weights, k=rng.randint(0, 5))))
+        return ' '.join(words + ['#' + t for t in tags]), tags
+
+    def _comments(self, rng: random.Random, video_id: str, created: int) -> List[Dict[str, Any]]:
+        comments = []
+        for j in range(rng.randint(0, self.comments_per_video * 2)):
+            text = rng.choice(COMMENT_PHRASES)
+            if rng.random() < 0.4:
+                text += ' ' + ''.join(rng.choices(EMOJI, k=rng.randint(1, 3)))
+            comments.append({
+                'id': f'{video_id}{j:04d}',
+                'text': text,
+                'createTime': created + rng.randint(60, 7 * 86400),
+                'diggCount': int(rng.paretovariate(1.5)) - 1,
+                'authorUniqueId': rng.choice(self.authors),
+            })
+        return comments
+
+    def items(self, n: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Items start..start+n-1; any slice of the corpus is reproducible on its own"""
+        for i in range(start, start + n):
+            rng = random.Random(self.seed * 1_000_003 + i)
+            video_id = str(7_300_000_000_000_000_000 + i)
+            author = rng.choices(self.authors, cum_weights=self.author_weights)[0]
+            created = int(START + rng.random() * SPAN)
+            caption, tags = self._caption(rng)
+            views = int(rng.paretovariate(1.2) * 500)
+            cover = f'https://p16-sign-va.tiktokcdn.com/obj/{video_id}.jpeg?x-expires={created + 86400}'
+            yield {
+                'id': video_id,
+                'text': caption,
+                'createTime': created,
+                'createTimeISO': datetime.fromtimestamp(created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'isPinned': rng.random() < 0.01,
+                'authorMeta': {'name': author, 'nickName': author.title(), 'verified': rng.random() < 0.05},
+                'webVideoUrl': f'https://www.tiktok.com/@{author}/video/{video_id}',
+                'videoMeta': {'duration': rng.randint(5, 180), 'coverUrl': cover},
+                'coverUrl': cover,
+                'diggCount': int(views * rng.uniform(0.01, 0.15)),
+                'shareCount': int(views * rng.uniform(0, 0.01)),
+                'commentCount': int(views * rng.uniform(0, 0.02)),
+                'collectCount': int(views * rng.uniform(0, 0.01)),
+                'playCount': views,
+                'hashtags': [{'name': t} for t in tags],
+                'comments': self._comments(rng, video_id, created),
+            }
+
+    def pages(self, n: int, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """The first n items in dataset-sized pages"""
+        for start in range(0, n, page_size):
+            yield list(self.items(min(page_size, n - start), start))
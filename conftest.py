@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def index(tmp_path_factory):
+    """
+    api.index on an in-memory local store, with the job queue and sentiment cache
+    files it opens at import kept in a temp dir instead of the system one
+    """
+    tmp = tmp_path_factory.mktemp("api")
+    env = pytest.MonkeyPatch()
+    env.setenv("STORAGE_BACKEND", "local")
+    env.setenv("LOCAL_DB_PATH", ":memory:")
+    env.setenv("JOB_QUEUE_PATH", str(tmp / "jobs.sqlite3"))
+    env.setenv("SENTIMENT_CACHE_PATH", str(tmp / "sentiment_cache.sqlite3"))
+    from api import index
+    yield index
+    env.undo()
@@ -2,6 +2,66 @@ import { useState, useCallback, useRef, useMemo } from 'react';
 import { TikTokVideo, Creator, SentimentData, TimeSeriesData, HashtagData } from '@/lib/mockData';
 import { toast } from 'sonner';
 
+// Snapshot of a scrape job, as streamed by /api/scrape/jobs/{run_id}/events
+interface ScrapeJob {
+    id: string;
+    status: 'starting' | 'running' | 'ingesting' | 'succeeded' | 'failed';
+    apify_status: string | null;
+    items_scraped: number | null;
+    items_fetched: number | null;
+    videos: number | null;
+    comments: number | null;
+    saved_videos: number | null;
+    saved_comments: number | null;
+    error: string | null;
+}
+
+const SCRAPE_EVENTS = ['starting', 'running', 'ingesting', 'succeeded', 'failed'];
+
+// Apify run: 5-60%, fetching and saving the dataset: 60-99%
+const jobProgress = (job: ScrapeJob, limit: number) => {
+    if (job.status === 'running') {
+        return 5 + 55 * Math.min(1, (job.items_scraped || 0) / Math.max(limit, 1));
+    }
+    if (job.status === 'ingesting') {
+        return 60 + 39 * Math.min(1, (job.items_fetched || 0) / Math.max(job.items_scraped || limit, 1));
+    }
+    return job.status === 'starting' ? 5 : 100;
+};
+
+const jobMessage = (job: ScrapeJob) => {
+    if (job.status === 'running') {
+        return `Apify run ${(job.apify_status || 'starting').toLowerCase()}: ${job.items_scraped || 0} items scraped`;
+    }
+    if (job.status === 'ingesting') {
+        return `Saving results: ${job.saved_videos || 0} videos, ${job.saved_comments || 0} comments stored`;
+    }
+    return 'Starting scrape...';
+};
+
+// Resolves with the final snapshot, or null if the stream is unavailable (e.g. served by another instance)
+const followScrapeJob = (eventsUrl: string, onUpdate: (job: ScrapeJob) => void) =>
+    new Promise<ScrapeJob | null>((resolve) => {
+        const source = new EventSource(eventsUrl);
+        const onSnapshot = (event: MessageEvent) => {
+            const job: ScrapeJob = JSON.parse(event.data);
+            onUpdate(job);
+            if (job.status === 'succeeded' || job.status === 'failed') {
+                source.close();
+                resolve(job);
+            }
+        };
+        SCRAPE_EVENTS.forEach(name => source.addEventListener(name, onSnapshot as EventListener));
+        // EventSource reconnects (with Last-Event-ID) on dropped connections; CLOSED means it gave up
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) resolve(null);
+        };
+    });
+
+// Group-filtered /api/data pages are followed until this many videos, or this many requests
+const GROUP_MIN_VIDEOS = 1000;
+const GROUP_MAX_REQUESTS = 10;
+
 export const useTikTokData = () => {
     const [videos, setVideos] = useState<TikTokVideo[]>([]);
     const [creators, setCreators] = useState<Creator[]>([]);
@@ -10,6 +70,7 @@ export const useTikTokData = () => {
     const [hashtags, setHashtags] = useState<HashtagData[]>([]);
     const [loading, setLoading] = useState(false);
     const [scrapingProgress, setScrapingProgress] = useState(0);
+    const [scrapeStatus, setScrapeStatus] = useState('');
 
     const [apiConnected, setApiConnected] = useState(false);
     const [supabaseConnected, setSupabaseConnected] = useState(false);
@@ -100,7 +161,17 @@ export const useTikTokData = () => {
     const fetchData = useCallback(async () => {
         setLoading(true);
         try {
-            const response = await fetch('/api/data');
+            // Send the group's definition rather than its name: groups added through /api/groups
+            // live in one server process, and another instance may answer this request
+            const params = new URLSearchParams();
+            const activeGroup = groups.find(g => g.name === activeGroupName);
+            if (activeGroup) {
+                activeGroup.keywords.forEach(k => params.append('keywords', k));
+                (activeGroup.exclude_keywords || []).forEach(k => params.append('exclude_keywords', k));
+                if (activeGroup.exact_match) params.set('exact_match', 'true');
+            }
+            const query = params.toString();
+            const response = await fetch(query ? `/api/data?${query}` : '/api/data');
             if (!response.ok) throw new Error("API Offline");
 
             setApiConnected(true);
@@ -112,8 +183,21 @@ export const useTikTokData = () => {
                 return;
             }
 
+            // A group page stops after a bounded scan, so it can come back short with a cursor
+            let cursor = data.next_cursor;
+            for (let page = 1; activeGroup && cursor && data.videos.length < GROUP_MIN_VIDEOS && page < GROUP_MAX_REQUESTS; page++) {
+                const pageParams = new URLSearchParams(params);
+                pageParams.set('cursor', cursor);
+                const more = await fetch(`/api/data?${pageParams.toString()}`);
+                if (!more.ok) break;
+                const next = await more.json();
+                if (next.error) break;
+                data.videos.push(...next.videos);
+                cursor = next.next_cursor;
+            }
+
             // Map API data to UI model
-            let rawVideos: TikTokVideo[] = data.videos.map((v: any) => ({
+            const rawVideos: TikTokVideo[] = data.videos.map((v: any) => ({
                 id: v.video_id,
                 caption: v.caption || '',
                 author: '@' + (v.author || 'unknown'),
@@ -130,68 +214,32 @@ export const useTikTokData = () => {
                 thumbnailUrl: v.thumbnail_url || `https://images.unsplash.com/photo-1518609878373-06d740f60d8b?w=300&h=400&fit=crop`
             }));
 
-            // APPLY ADVANCED GROUP FILTERING
-            let filteredVideos = rawVideos;
-            if (activeGroupName !== 'All Data') {
-                const activeGroup = groups.find(g => g.name === activeGroupName);
-                if (activeGroup) {
-                    const groupKeywords = (activeGroup.keywords || []).map(k => k.toLowerCase().trim());
-                    const excludeKeywords = (activeGroup.exclude_keywords || []).map(k => k.toLowerCase().trim());
-                    const exactMatch = activeGroup.exact_match || false;
-
-                    filteredVideos = rawVideos.filter(v => {
-                        const text = (v.caption + ' ' + (v.hashtags || []).join(' ')).toLowerCase();
-
-                        // Check Exclusion (Noise reduction)
-                        const isExcluded = excludeKeywords.some(k => text.includes(k));
-                        if (isExcluded) return false;
-
-                        // Check Inclusion
-                        if (exactMatch) {
-                            // Match whole words only
-                            return groupKeywords.some(k => {
-                                const escaped = k.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
-                                const regex = new RegExp(`\\b${escaped}\\b`, 'i');
-                                return regex.test(text);
-                            });
-                        } else {
-                            // Broad match
-                            return groupKeywords.some(k => text.includes(k));
-                        }
-                    });
-                }
-            }
+            // Keyword-group filtering happens server-side (group= query parameter)
+            const filteredVideos = rawVideos;
 
             setVideos(filteredVideos);
 
-            // Sentiment aggregation (using filtered data)
-            const counts = filteredVideos.reduce((acc: any, curr: any) => {
-                const s = curr.sentiment || 'neutral';
-                acc[s] = (acc[s] || 0) + 1;
-                return acc;
-            }, { positive: 0, neutral: 0, negative: 0 });
-
-            const total = filteredVideos.length || 1;
-            setSentiment({
-                positive: Math.round((counts.positive / total) * 100),
-                neutral: Math.round((counts.neutral / total) * 100),
-                negative: Math.round((counts.negative / total) * 100)
-            });
-
-            // Timeline aggregation (using filtered data)
-            const timeData: any = {};
-            filteredVideos.forEach((v: any) => {
-                if (!v.createdAt) return;
-                const date = v.createdAt.split(' ')[0];
-                if (!timeData[date]) {
-                    timeData[date] = { date, views: 0, likes: 0, comments: 0, shares: 0 };
-                }
-                timeData[date].views += v.views;
-                timeData[date].likes += v.likes;
-                timeData[date].comments += v.comments;
-                timeData[date].shares += v.shares;
-            });
-            setTimeline(Object.values(timeData).sort((a: any, b: any) => new Date(a.date).getTime() - new Date(b.date).getTime()) as TimeSeriesData[]);
+            // Sentiment and timeline are aggregated server-side over the whole filtered corpus
+            const aggParams = new URLSearchParams(params);
+            aggParams.set('timelines', 'daily');
+            const aggResponse = await fetch(`/api/aggregates?${aggParams.toString()}`);
+            if (aggResponse.ok) {
+                const agg = await aggResponse.json();
+                const counts = agg.sentiment || { positive: 0, neutral: 0, negative: 0 };
+                const total = (counts.positive + counts.neutral + counts.negative) || 1;
+                setSentiment({
+                    positive: Math.round((counts.positive / total) * 100),
+                    neutral: Math.round((counts.neutral / total) * 100),
+                    negative: Math.round((counts.negative / total) * 100)
+                });
+                setTimeline((agg.timelines?.daily || []).map((t: any) => ({
+                    date: t.date,
+                    views: t.views,
+                    likes: t.likes,
+                    comments: t.comments,
+                    shares: t.shares
+                })) as TimeSeriesData[]);
+            }
 
         } catch (error) {
             console.error(error);
@@ -215,13 +263,10 @@ export const useTikTokData = () => {
         commentsLimit: number = 0
     ) => {
         setLoading(true);
-        setScrapingProgress(10);
+        setScrapingProgress(5);
+        setScrapeStatus('Starting scrape...');
 
         try {
-            const progressInterval = setInterval(() => {
-                setScrapingProgress(prev => (prev < 95 ? prev + (95 - prev) * 0.1 : prev));
-            }, 1500);
-
             const response = await fetch('/api/scrape/async', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
@@ -236,20 +281,36 @@ export const useTikTokData = () => {
                 })
             });
 
-            clearInterval(progressInterval);
-            setScrapingProgress(100);
-
             const data = await response.json();
-            if (data.success) {
+            setLoading(false);
+            if (!data.success) {
+                toast.error(data.error || "Scraping failed");
+                return;
+            }
+            if (!data.events_url) {
                 toast.success(data.message || "Scrape initiated! Results will appear in a few minutes.");
-                // We don't fetchData immediately as it's still running on Apify
+                return;
+            }
+
+            toast.success("Scrape started");
+            // Follow the job's progress, then reload the dashboard once instead of polling /api/data
+            const job = await followScrapeJob(data.events_url, (update) => {
+                setScrapingProgress(jobProgress(update, limit));
+                setScrapeStatus(jobMessage(update));
+            });
+            if (!job) {
+                toast.info("Scrape is running. Results will appear on the dashboard when it finishes.");
+            } else if (job.status === 'succeeded') {
+                toast.success(`Scrape finished: ${job.videos || 0} videos and ${job.comments || 0} comments processed`);
+                await fetchData();
             } else {
-                toast.error(data.error || "Scraping failed");
+                toast.error(job.error || "Scraping failed");
             }
         } catch (error) {
             toast.error("Network error during scraping");
         } finally {
             setLoading(false);
+            setScrapeStatus('');
             setTimeout(() => setScrapingProgress(0), 1000);
         }
     };
@@ -288,7 +349,7 @@ export const useTikTokData = () => {
 
     return {
         videos, creators, sentiment, timeline, hashtags,
-        loading, scrapingProgress, apiConnected, supabaseConnected,
+        loading, scrapingProgress, scrapeStatus, apiConnected, supabaseConnected,
         apifyToken, groups, activeGroupName, setActiveGroupName,
         fetchSettings, updateSettings, addGroup, deleteGroup,
         fetchData, runScrape, exportData
@@ -20,7 +20,7 @@ import { X } from 'lucide-react';
 
 const Index = () => {
   const {
-    videos, sentiment, timeline, loading, scrapingProgress,
+    videos, sentiment, timeline, loading, scrapingProgress, scrapeStatus,
     apiConnected, supabaseConnected, apifyToken: savedToken, groups, activeGroupName,
     setActiveGroupName, fetchSettings, updateSettings, addGroup, deleteGroup,
     fetchData, runScrape, exportData
@@ -535,7 +535,7 @@ const Index = () => {
               <div className="flex items-center justify-between mb-2">
                 <div className="flex items-center gap-2">
                   <Loader2 className="w-4 h-4 animate-spin text-primary" />
-                  <span className="text-sm font-medium">Synchronizing with TikTok & Supabase...</span>
+                  <span className="text-sm font-medium">{scrapeStatus || 'Synchronizing with TikTok & Supabase...'}</span>
                 </div>
                 <span className="text-sm text-muted-foreground">{Math.round(scrapingProgress)}%</span>
               </div>
@@ -0,0 +1,17 @@
+-- Sentiment and engagement are computed once at ingest and stored with the
+-- scorer version that produced them. Rows with a NULL or older version are
+-- picked up by POST /api/backfill.
+
+alter table videos
+    add column if not exists sentiment text,
+    add column if not exists sentiment_score double precision,
+    add column if not exists engagement_rate double precision,
+    add column if not exists scorer_version integer;
+
+alter table comments
+    add column if not exists sentiment text,
+    add column if not exists sentiment_score double precision,
+    add column if not exists scorer_version integer;
+
+create index if not exists videos_scorer_version_idx on videos (scorer_version);
+create index if not exists comments_scorer_version_idx on comments (scorer_version);
@@ -0,0 +1,7 @@
+-- Keyset pagination for /api/data orders by (date, id) descending and filters
+-- by author; these indexes keep each page an index range scan.
+
+create index if not exists videos_publish_date_video_id_idx on videos (publish_date desc, video_id desc);
+create index if not exists videos_author_idx on videos (author);
+create index if not exists comments_date_comment_id_idx on comments (date desc, comment_id desc);
+create index if not exists comments_video_id_idx on comments (video_id);
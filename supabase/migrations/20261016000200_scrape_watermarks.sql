@@ -0,0 +1,14 @@
+-- Incremental scrapes: the newest publish_date collected per (scrape_type, target)
+-- is the default cutoff of the next scrape of that target, and a fingerprint of
+-- the scraped fields lets ingestion skip rows that have not changed.
+
+create table if not exists scrape_watermarks (
+    scrape_type text not null,
+    target text not null,
+    newest_publish_date timestamp not null,
+    updated_at timestamptz not null default now(),
+    primary key (scrape_type, target)
+);
+
+alter table videos add column if not exists content_hash text;
+alter table comments add column if not exists content_hash text;
@@ -0,0 +1,18 @@
+-- Resumable webhook ingestion: one checkpoint per Apify run. dataset_offset is
+-- the dataset position covered by every batch saved so far, so a failed or
+-- restarted job resumes there, and a run marked 'done' is skipped when Apify
+-- delivers its webhook again.
+
+create table if not exists ingest_runs (
+    run_id text primary key,
+    dataset_id text,
+    status text not null,
+    dataset_offset bigint not null default 0,
+    pages bigint,
+    videos bigint,
+    comments bigint,
+    saved_videos bigint,
+    saved_comments bigint,
+    updated_at timestamptz not null default now(),
+    finished_at timestamptz
+);
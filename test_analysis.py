@@ -0,0 +1,38 @@
+from api import analysis
+
+
+def test_sentiment_scoring_is_serial_unless_workers_are_configured(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("process pool started")
+
+    monkeypatch.setattr(analysis, "ProcessPoolExecutor", no_pool)
+    monkeypatch.setattr(analysis, "PARALLEL_MIN_TEXTS", 10)
+    monkeypatch.delenv("SENTIMENT_WORKERS", raising=False)
+    analyzer = analysis.TikTokAnalyzer(use_cache=False)
+    scored = analyzer._score_texts([f"I love this {i}" for i in range(20)], "vader")
+    assert len(scored) == 20 and scored[0][1] == "positive"
+
+
+def test_sentiment_pool_spawns_its_workers(monkeypatch):
+    pools = []
+
+    class Pool:
+        def __init__(self, max_workers, initializer, mp_context):
+            pools.append((max_workers, mp_context.get_start_method()))
+            initializer()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def map(self, fn, *iterables):
+            return map(fn, *iterables)
+
+    monkeypatch.setattr(analysis, "ProcessPoolExecutor", Pool)
+    monkeypatch.setattr(analysis, "PARALLEL_MIN_TEXTS", 10)
+    monkeypatch.setenv("SENTIMENT_WORKERS", "3")
+    scored = analysis.TikTokAnalyzer(use_cache=False)._score_texts([f"so sad {i}" for i in range(20)], "vader")
+    assert pools == [(3, "spawn")]
+    assert len(scored) == 20
@@ -0,0 +1,87 @@
+import asyncio
+
+from api import scraper
+from api.scraper import TikTokScraper
+
+
+def video(video_id, *comment_ids):
+    return {"id": video_id, "text": f"video {video_id}", "authorMeta": {"name": "alice"}, "createTime": 1780000000,
+            "comments": [{"id": c, "text": f"comment {c}"} for c in comment_ids]}
+
+
+class FanoutScraper(TikTokScraper):
+    """One synthetic dataset per target; counts the actor runs in flight"""
+    def __init__(self, datasets, delay=0.0):
+        super().__init__(api_token="synthetic")
+        self.datasets, self.delay = datasets, delay
+        self.running = self.peak = 0
+
+    async def run_to_dataset(self, run_input):
+        target = (run_input.get("hashtags") or run_input.get("profiles") or run_input.get("searchQueries"))[0]
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return target if target in self.datasets else None
+
+    async def aiter_dataset_pages(self, dataset_id, page_size=250, offset=0):
+        items = self.datasets[dataset_id]
+        yield len(items), items[offset:]
+
+
+async def drain(fanout):
+    return [event async for event in fanout]
+
+
+def test_videos_and_comments_shared_by_targets_are_yielded_once():
+    fake = FanoutScraper({
+        "cats": [video("1", "c1"), video("2")],
+        "dogs": [video("2"), video("3", "c3"), video("1", "c1")],
+    })
+    events = asyncio.run(drain(fake.scrape_fanout("Hashtag", "cats, dogs, cats", count=10, comments_per_video=5, max_concurrency=1)))
+
+    videos = [v.video_id for _, page, _, report in events if report is None for v in page]
+    comments = [c.comment_id for _, _, page, report in events if report is None for c in page]
+    assert sorted(videos) == ["1", "2", "3"]
+    assert sorted(comments) == ["c1", "c3"]
+
+    reports = {target: report for target, _, _, report in events if report is not None}
+    assert list(reports) == ["cats", "dogs"]
+    assert (reports["cats"]["videos"], reports["cats"]["duplicates"]) == (2, 0)
+    assert (reports["dogs"]["videos"], reports["dogs"]["duplicates"]) == (1, 2)
+    assert all(r["status"] == "succeeded" for r in reports.values())
+
+
+def test_missing_dataset_is_reported_without_stopping_other_targets():
+    fake = FanoutScraper({"cats": [video("1")]})
+    events = asyncio.run(drain(fake.scrape_fanout("Keyword", "cats, dogs", count=10)))
+
+    reports = {target: report for target, _, _, report in events if report is not None}
+    assert reports["cats"]["status"] == "succeeded"
+    assert reports["dogs"]["status"] == "failed"
+    assert reports["dogs"]["dataset_id"] is None
+
+
+def test_runs_in_flight_are_capped_per_call():
+    targets = [f"t{i}" for i in range(6)]
+    fake = FanoutScraper({t: [video(t)] for t in targets}, delay=0.02)
+    events = asyncio.run(drain(fake.scrape_fanout("Hashtag", ",".join(targets), max_concurrency=2)))
+
+    assert fake.peak == 2
+    assert sum(1 for *_, report in events if report is not None) == len(targets)
+
+
+def test_concurrent_fanouts_share_the_process_wide_cap(monkeypatch):
+    monkeypatch.setattr(scraper, "FANOUT_CONCURRENCY", 3)
+    targets = [f"t{i}" for i in range(4)]
+    fake = FanoutScraper({t: [video(t)] for t in targets}, delay=0.02)
+
+    async def both():
+        return await asyncio.gather(
+            drain(fake.scrape_fanout("Hashtag", ",".join(targets), max_concurrency=4)),
+            drain(fake.scrape_fanout("Username", ",".join(targets), max_concurrency=4)),
+        )
+
+    first, second = asyncio.run(both())
+    assert fake.peak == 3
+    assert len(first) == len(second) == 2 * len(targets)
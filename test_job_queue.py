@@ -0,0 +1,98 @@
+import pytest
+
+from api import job_queue
+from api.job_queue import JobQueue, QUEUED, RUNNING, FAILED
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(clock):
+    queue = JobQueue(":memory:", visibility_timeout=60, max_attempts=3, retry_backoff=10)
+    yield queue
+    queue.close()
+
+
+def test_duplicate_enqueue_is_a_noop(queue):
+    job_id, queued = queue.enqueue("webhook", "run-1", {"run_id": "run-1"})
+    again_id, again = queue.enqueue("webhook", "run-1", {"run_id": "run-1", "changed": True})
+
+    assert queued and not again
+    assert again_id == job_id
+    assert queue.stats()[QUEUED] == 1
+    assert queue.claim()["payload"] == {"run_id": "run-1"}
+
+
+def test_expired_lease_redelivers_the_job(queue, clock):
+    queue.enqueue("webhook", "run-1", {"run_id": "run-1"})
+    job = queue.claim()
+    assert job["attempts"] == 1
+    assert queue.get("run-1")["status"] == RUNNING
+    # Leased: no other worker gets it
+    assert queue.claim() is None
+
+    clock.now += 61
+    redelivered = queue.claim()
+    assert redelivered["id"] == job["id"]
+    assert redelivered["attempts"] == 2
+
+
+def test_fail_backs_off_then_marks_failed(queue, clock):
+    queue.enqueue("webhook", "run-1", {"run_id": "run-1"})
+
+    job = queue.claim()
+    assert queue.fail(job["id"], "boom") is True
+    assert queue.get("run-1")["status"] == QUEUED
+    # First retry waits retry_backoff, the second twice that
+    clock.now += 9
+    assert queue.claim() is None
+    clock.now += 1
+    job = queue.claim()
+    assert job["attempts"] == 2
+
+    assert queue.fail(job["id"], "boom") is True
+    clock.now += 19
+    assert queue.claim() is None
+    clock.now += 1
+    job = queue.claim()
+    assert job["attempts"] == 3
+
+    assert queue.fail(job["id"], "boom again") is False
+    failed = queue.get("run-1")
+    assert failed["status"] == FAILED
+    assert failed["last_error"] == "boom again"
+    clock.now += 3600
+    assert queue.claim() is None
+
+
+def test_reenqueue_resets_a_failed_key(queue, clock):
+    queue.enqueue("webhook", "run-1", {"run_id": "run-1"})
+    for _ in range(3):
+        job = queue.claim()
+        queue.fail(job["id"], "boom")
+        clock.now += 3600
+    assert queue.get("run-1")["status"] == FAILED
+
+    job_id, queued = queue.enqueue("webhook", "run-1", {"run_id": "run-1", "dataset_id": "d-2"})
+    assert queued and job_id == job["id"]
+    reset = queue.get("run-1")
+    assert reset["status"] == QUEUED
+    assert reset["attempts"] == 0
+    assert reset["last_error"] is None
+
+    job = queue.claim()
+    assert job["attempts"] == 1
+    assert job["payload"] == {"run_id": "run-1", "dataset_id": "d-2"}
@@ -0,0 +1,84 @@
+import random
+import re
+
+import pytest
+
+from api.keywords import AhoCorasick, KeywordMatcher
+from api.local_store import LocalStore
+
+
+def test_exclusions_match_substrings_even_with_exact_match():
+    matcher = KeywordMatcher(["dance"], ["challenge"], exact_match=True)
+    assert matcher.matches("dance night")
+    assert not matcher.matches("dance #dancechallenge")
+    assert not matcher.matches("dance challenges")
+    # Keywords themselves stay whole-word
+    assert not matcher.matches("dancer night")
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    text = "ushers"
+    assert sorted(automaton.iter_matches(text)) == [(1, 4), (2, 4), (2, 6)]
+    assert automaton.search("ahishers")
+    assert not automaton.search("a cat sat")
+    assert AhoCorasick([""]).search("anything") is False
+
+
+def test_matcher_agrees_with_a_naive_scan():
+    rng = random.Random(3)
+    words = ["dance", "dancer", "fyp", "cat", "catwalk", "nairobi", "art", "party"]
+    keywords, exclude = ["dance", "cat", "art"], ["walk"]
+    for exact in (False, True):
+        matcher = KeywordMatcher(keywords, exclude, exact)
+        for _ in range(500):
+            text = " ".join(rng.choices(words, k=rng.randint(1, 6)))
+            if any(k in text for k in exclude):
+                expected = False
+            elif exact:
+                expected = any(re.search(r"\b" + re.escape(k) + r"\b", text) for k in keywords)
+            else:
+                expected = any(k in text for k in keywords)
+            assert matcher.matches(text) == expected, (text, exact)
+
+
+@pytest.fixture
+def client(index, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    store = LocalStore(":memory:")
+    monkeypatch.setattr(index, "get_storage", lambda: store)
+    store.save_videos([
+        {"video_id": str(i), "publish_date": f"2026-03-01 10:{59 - i:02d}:00",
+         "caption": "rare dance" if i == 45 else "cat video"}
+        for i in range(50)
+    ])
+    index.data_changed()
+    yield TestClient(index.app)
+    store.close()
+
+
+def test_group_definition_is_sent_with_the_request(client):
+    # No group of that name exists on this instance; the definition is enough
+    response = client.get("/api/data", params={"keywords": ["dance", "nairobi"], "exclude_keywords": ["party"]})
+    assert [v["video_id"] for v in response.json()["videos"]] == ["45"]
+    aggregates = client.get("/api/aggregates", params={"keywords": ["dance"]}).json()
+    assert aggregates["kpis"]["videos"] == 1
+    assert client.get("/api/data", params={"group": "never-created"}).status_code == 404
+
+
+def test_group_pages_scan_a_bounded_number_of_database_pages(index, client, monkeypatch):
+    monkeypatch.setattr(index, "GROUP_SCAN_PAGES", 2)
+    monkeypatch.setattr(index, "MAX_PAGE_SIZE", 10)
+    params = {"keywords": ["dance"], "limit": 5}
+    found, requests = [], 0
+    while True:
+        payload = client.get("/api/data", params=params).json()
+        requests += 1
+        found += [v["video_id"] for v in payload["videos"]]
+        if not payload["next_cursor"]:
+            break
+        params["cursor"] = payload["next_cursor"]
+    # 50 rows, 10 per database page, 2 pages per request
+    assert found == ["45"]
+    assert requests == 3
@@ -0,0 +1,23 @@
+import time
+
+from api.mapper import map_items
+
+
+def test_undated_comments_are_kept_with_the_mapping_time():
+    item = {
+        "id": "1", "text": "hello", "createTime": 1767225600,
+        "comments": [
+            {"id": "c1", "text": "dated", "createTime": 1767229200},
+            {"id": "c2", "text": "missing"},
+            {"id": "c3", "text": "unparseable", "createTime": "yesterday"},
+            {"id": "c4", "text": "iso", "createTimeISO": "2026-01-01T02:00:00.000Z"},
+        ],
+    }
+    before = int(time.time())
+    _, comments, _ = map_items([item], extract_comments=True)
+    dates = dict(zip(comments["comment_id"], comments["date_ts"]))
+
+    assert list(dates) == ["c1", "c2", "c3", "c4"]
+    assert dates["c1"] == 1767229200
+    assert dates["c4"] == 1767232800
+    assert dates["c2"] >= before and dates["c3"] >= before
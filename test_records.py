@@ -0,0 +1,33 @@
+from api.records import CommentRecord, VideoRecord, frame_records, records_frame
+
+
+VIDEO_ROW = {
+    "video_id": "7300000000000000001", "video_url": "https://www.tiktok.com/@a/video/1",
+    "caption": "dance #fyp", "author": "a", "likes": 10, "comments": 2, "shares": 1, "saves": 0,
+    "views": 500, "publish_date": "2026-03-05 18:30:00", "hashtags": "fyp", "mentions": "",
+    "thumbnail_url": "https://cdn/1.jpg",
+}
+COMMENT_ROW = {
+    "comment_id": "c1", "video_id": "7300000000000000001", "author": "b", "text": "so good",
+    "likes": 3, "date": "2026-03-05 19:00:00",
+}
+
+
+def test_rows_round_trip_through_records():
+    assert VideoRecord.from_mapping(VIDEO_ROW).to_row() == VIDEO_ROW
+    assert CommentRecord.from_mapping(COMMENT_ROW).to_row() == COMMENT_ROW
+
+    scored = {**VIDEO_ROW, "sentiment": "positive", "sentiment_score": 0.6, "engagement_rate": 2.6, "scorer_version": 1}
+    assert VideoRecord.from_mapping(scored).to_row() == scored
+
+
+def test_records_round_trip_through_frames():
+    videos = [VideoRecord.from_mapping({**VIDEO_ROW, "video_id": str(i), "likes": i}) for i in range(3)]
+    comments = [CommentRecord.from_mapping({**COMMENT_ROW, "comment_id": f"c{i}"}) for i in range(3)]
+    assert frame_records(records_frame(videos), VideoRecord) == videos
+    assert frame_records(records_frame(comments), CommentRecord) == comments
+
+
+def test_from_mapping_coerces_like_the_mapper():
+    record = VideoRecord.from_mapping({"video_id": 42, "likes": "7", "views": None, "caption": None})
+    assert (record.video_id, record.likes, record.views, record.caption) == ("42", 7, 0, "")
@@ -0,0 +1,97 @@
+import pytest
+
+from api import response_cache
+from api.local_store import LocalStore
+from api.response_cache import ResponseCache, bump_data_version, etag_matches, make_etag
+
+
+class Clock:
+    def __init__(self, now=1_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = make_etag(b'{"videos":[]}')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_entries_are_keyed_by_params_and_data_version(clock):
+    cache = ResponseCache(ttl=0)
+    key = ResponseCache.make_key("/api/data", [("limit", "10"), ("author", "alice")])
+    etag = cache.put(key, b"body")
+
+    assert cache.get(ResponseCache.make_key("/api/data", [("author", "alice"), ("limit", "10")])) == (b"body", etag)
+    bump_data_version()
+    assert cache.get(ResponseCache.make_key("/api/data", [("limit", "10"), ("author", "alice")])) is None
+
+
+def test_entries_expire_and_evict_oldest_first(clock):
+    cache = ResponseCache(max_entries=2, max_bytes=10, ttl=60)
+    cache.put(("a",), b"1234")
+    cache.put(("b",), b"1234")
+    clock.now += 30
+    assert cache.get(("a",))  # touched, so "b" is now the oldest
+    cache.put(("c",), b"1234")
+    assert cache.get(("b",)) is None
+    assert cache.stats()["evictions"] == 1
+
+    # Over max_bytes: returned an ETag but not kept
+    assert cache.put(("big",), b"x" * 11) == make_etag(b"x" * 11)
+    assert cache.get(("big",)) is None
+
+    clock.now += 31
+    assert cache.get(("a",)) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["bytes"] == 4
+
+
+@pytest.fixture
+def client(index, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    store = LocalStore(":memory:")
+    monkeypatch.setattr(index, "get_storage", lambda: store)
+    store.save_videos([{"video_id": "1", "publish_date": "2026-03-01 10:00:00", "caption": "cat video"}])
+    index.data_changed()
+    yield TestClient(index.app), store
+    store.close()
+
+
+def test_unchanged_data_is_answered_with_304_until_a_write(index, client):
+    client, store = client
+    first = client.get("/api/data")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+
+    hits = index.response_cache.stats()["hits"]
+    again = client.get("/api/data", headers={"If-None-Match": f"W/{etag}"})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert index.response_cache.stats()["hits"] == hits + 1
+
+    # Different query parameters are a different response
+    assert client.get("/api/data", params={"author": "nobody"}, headers={"If-None-Match": etag}).status_code == 200
+
+    store.save_videos([{"video_id": "2", "publish_date": "2026-03-02 10:00:00", "caption": "dog video"}])
+    index.data_changed()
+    changed = client.get("/api/data", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["videos"]) == 2
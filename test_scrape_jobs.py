@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import scrape_jobs
+from api.scrape_jobs import ScrapeJobRegistry, RUNNING, INGESTING, SUCCEEDED, FAILED
+
+
+def parse_events(chunks):
+    """SSE text -> [(id, event, data)], keep-alive comments as (None, 'keep-alive', None)"""
+    events = []
+    for message in "".join(chunks).split("\n\n"):
+        if not message:
+            continue
+        if message.startswith(":"):
+            events.append((None, "keep-alive", None))
+            continue
+        fields = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def collect(registry, job_id, after=0):
+    return [chunk async for chunk in registry.events(job_id, after)]
+
+
+@pytest.fixture
+def registry():
+    return ScrapeJobRegistry(max_jobs=3)
+
+
+def test_stream_follows_updates_from_other_threads_until_the_job_ends(registry):
+    registry.create("run-1", scrape_type="Hashtag", search_input="fyp")
+
+    async def follow():
+        stream = asyncio.ensure_future(collect(registry, "run-1"))
+        await asyncio.sleep(0.05)
+
+        def ingest():
+            registry.update("run-1", RUNNING, apify_status="RUNNING", items_scraped=10)
+            registry.update("run-1", INGESTING, items_fetched=250)
+            registry.update("run-1", SUCCEEDED, videos=250)
+            # Finished jobs ignore late updates
+            registry.update("run-1", items_fetched=999)
+
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        writer.join()
+        return await asyncio.wait_for(stream, 5)
+
+    events = parse_events(asyncio.run(follow()))
+    # The just-created job has no update yet, so the first event is the first update
+    assert [(seq, name) for seq, name, _ in events] == [(1, RUNNING), (2, INGESTING), (3, SUCCEEDED)]
+    last = events[-1][2]
+    assert last["items_scraped"] == 10
+    assert last["items_fetched"] == 250
+    assert last["videos"] == 250
+    assert last["finished_at"] is not None
+    assert registry.stats()["streams"] == 0
+
+
+def test_reconnect_skips_an_unchanged_job_and_replays_a_finished_one(registry, monkeypatch):
+    monkeypatch.setattr(scrape_jobs, "KEEPALIVE_SECS", 0.01)
+    registry.create("run-1")
+    registry.update("run-1", RUNNING)
+
+    async def reconnect():
+        stream = registry.events("run-1", after=1)
+        first = await stream.__anext__()
+        registry.update("run-1", INGESTING)
+        registry.fail("run-1", "boom")
+        return [first] + [chunk async for chunk in stream]
+
+    events = parse_events(asyncio.run(reconnect()))
+    # Nothing new since event 1, so the stream idles with keep-alives until the next update
+    assert events[0] == (None, "keep-alive", None)
+    assert [(seq, name) for seq, name, _ in events if seq is not None] == [(2, INGESTING), (3, FAILED)]
+
+    # A finished job is sent once even when the client has already seen it, then the stream ends
+    events = parse_events(asyncio.run(collect(registry, "run-1", after=99)))
+    assert [(seq, name) for seq, name, _ in events] == [(3, FAILED)]
+    assert events[0][2]["error"] == "boom"
+
+
+def test_trim_drops_finished_jobs_first(registry):
+    for job_id in ("run-1", "run-2", "run-3"):
+        registry.create(job_id)
+    registry.update("run-2", SUCCEEDED)
+    registry.create("run-4")
+
+    assert registry.get("run-2") is None
+    assert [job["id"] for job in registry.recent()] == ["run-4", "run-3", "run-1"]
+
+
+def test_events_endpoint_streams_a_job_and_404s_an_unknown_one(index):
+    index.scrape_jobs.create("run-endpoint", scrape_type="Username", search_input="alice")
+    index.scrape_jobs.update("run-endpoint", RUNNING, items_scraped=5)
+    index.scrape_jobs.update("run-endpoint", SUCCEEDED, videos=5)
+
+    client = TestClient(index.app)
+    with client.stream("GET", "/api/scrape/jobs/run-endpoint/events") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.iter_text())
+    assert [(seq, name) for seq, name, _ in events] == [(2, SUCCEEDED)]
+    assert events[0][2]["search_input"] == "alice"
+
+    assert client.get("/api/scrape/jobs/run-missing/events").status_code == 404
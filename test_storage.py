@@ -0,0 +1,104 @@
+from datetime import datetime
+
+import pytest
+
+from api.local_store import LocalStore
+from api.storage import StorageError, until_bound
+
+
+@pytest.fixture(params=["duckdb", "sqlite"])
+def store(request):
+    store = LocalStore(":memory:", engine=request.param)
+    yield store
+    store.close()
+
+
+def video(video_id, publish_date, **fields):
+    return {"video_id": video_id, "publish_date": publish_date, "caption": f"video {video_id}", **fields}
+
+
+def test_until_bound():
+    assert until_bound("2026-03-05") == (False, "2026-03-06")
+    assert until_bound("2026-12-31") == (False, "2027-01-01")
+    assert until_bound("2026-03-05 12:00:00") == (True, "2026-03-05 12:00:00")
+
+
+def test_date_only_until_includes_the_whole_day(store):
+    store.save_videos([
+        video("1", "2026-03-04 23:59:59"),
+        video("2", "2026-03-05 00:00:00"),
+        video("3", "2026-03-05 18:30:00"),
+        video("4", "2026-03-06 00:00:00"),
+    ])
+    page, _ = store.get_page("videos", since="2026-03-05", until="2026-03-05")
+    assert sorted(page["video_id"]) == ["2", "3"]
+
+    page, _ = store.get_page("videos", until="2026-03-05 12:00:00")
+    assert sorted(page["video_id"]) == ["1", "2"]
+
+
+def test_keyset_cursors_walk_every_row_once_in_order(store):
+    # Ties on publish_date are ordered by video_id
+    dates = ["2026-03-01 10:00:00", "2026-03-02 10:00:00", "2026-03-02 10:00:00", "2026-03-03 10:00:00"]
+    store.save_videos([video(str(i), dates[i % len(dates)]) for i in range(11)])
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.get_page("videos", cursor=cursor, limit=3)
+        seen.extend(zip(page["publish_date"].astype(str), page["video_id"]))
+        if not cursor:
+            break
+    assert len(seen) == 11
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == 11
+
+
+def test_content_hash_skips_unchanged_rows(store):
+    rows = [video("1", "2026-03-01 10:00:00", likes=5), video("2", "2026-03-01 11:00:00", likes=7)]
+    store.save_videos(store.drop_unchanged("videos", [dict(r) for r in rows]))
+
+    assert store.drop_unchanged("videos", [dict(r) for r in rows]) == []
+    # Cover URLs are re-signed on every scrape and do not count as a change
+    assert store.drop_unchanged("videos", [{**rows[0], "thumbnail_url": "https://cdn/x?sig=2"}]) == []
+    changed = store.drop_unchanged("videos", [dict(rows[0]), {**rows[1], "likes": 8}])
+    assert [row["video_id"] for row in changed] == ["2"]
+
+
+def test_watermarks_never_move_backwards(store):
+    store.save_watermarks("Username", {"alice": "2026-03-05 12:00:00"})
+    assert store.save_watermarks("Username", {"alice": "2026-03-01 00:00:00"}) == 0
+    assert store.get_watermarks("Username", ["alice"])["alice"] == datetime(2026, 3, 5, 12)
+
+    store.save_watermarks("Username", {"alice": "2026-03-06 08:00:00", "bob": "2026-02-01 00:00:00"})
+    assert store.get_watermarks("Username", ["alice", "bob", "carol"]) == {
+        "alice": datetime(2026, 3, 6, 8), "bob": datetime(2026, 2, 1),
+    }
+    # Watermarks are kept per scrape type
+    assert store.get_watermarks("Hashtag", ["alice"]) == {}
+
+
+def broken_query(*args, **kwargs):
+    raise RuntimeError("connection timeout")
+
+
+def test_failed_page_read_raises_instead_of_ending_the_walk(store, monkeypatch):
+    store.save_videos([video(str(i), f"2026-03-0{i + 1} 10:00:00") for i in range(4)])
+
+    pages = store.iter_pages("videos", page_size=2)
+    assert len(next(pages)) == 2
+    monkeypatch.setattr(store, "_query_df", broken_query)
+    with pytest.raises(StorageError):
+        next(pages)
+
+
+def test_api_reports_storage_errors_as_503(index, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    store = LocalStore(":memory:")
+    monkeypatch.setattr(index, "get_storage", lambda: store)
+    monkeypatch.setattr(store, "_query_df", broken_query)
+    client = TestClient(index.app)
+    for path in ("/api/data", "/api/data?keywords=dance", "/api/aggregates", "/api/aggregates?keywords=dance"):
+        response = client.get(path)
+        assert response.status_code == 503, path
+        assert "timeout" in response.json()["detail"]
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from api import database
+from api.database import SupabaseManager
+
+
+class FlakyQuery:
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.rows, self.key = [], None
+
+    def upsert(self, rows, on_conflict=None, returning=None):
+        self.rows, self.key = rows, [c.strip() for c in on_conflict.split(",")]
+        return self
+
+    def execute(self):
+        first = self.rows[0]["video_id"]
+        with self.client.lock:
+            self.client.calls.append(first)
+            if self.client.failures.get(first, 0):
+                self.client.failures[first] -= 1
+                raise RuntimeError(f"timeout on {first}")
+            table = self.client.store.setdefault(self.table, {})
+            for row in self.rows:
+                table[tuple(row[c] for c in self.key)] = row
+        return self
+
+
+class FlakyClient:
+    """Upserts into a dict, failing a chunk (keyed by its first video_id) a set number of times"""
+    def __init__(self, failures=None):
+        self.store, self.calls = {}, []
+        self.failures = dict(failures or {})
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return FlakyQuery(self, name)
+
+
+class FlakyPool:
+    def __init__(self, client):
+        self.url, self.key = "memory://", "test"
+        self._client = client
+
+    def client(self):
+        return self._client
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(database.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def rows(n):
+    return [{"video_id": f"v{i:03d}", "views": i} for i in range(n)]
+
+
+def manager(failures=None):
+    return SupabaseManager(pool=FlakyPool(FlakyClient(failures)))
+
+
+def test_failed_chunk_is_retried_with_backoff(sleeps):
+    db = manager({"v010": 2})
+    saved = db.upsert_chunked("videos", rows(25), on_conflict="video_id", batch_size=10, max_workers=3, retries=3)
+
+    assert saved == 25
+    assert len(db.client.store["videos"]) == 25
+    report = sorted(db.last_upsert_report, key=lambda r: r["chunk"])
+    assert [(r["chunk"], r["rows"], r["saved"], r["attempts"]) for r in report] == [(0, 10, 10, 1), (1, 10, 10, 3), (2, 5, 5, 1)]
+    assert all(r["error"] is None for r in report)
+    # Exponential backoff with jitter below one base step
+    assert len(sleeps) == 2
+    assert database.UPSERT_BACKOFF <= sleeps[0] < 2 * database.UPSERT_BACKOFF
+    assert 2 * database.UPSERT_BACKOFF <= sleeps[1] < 3 * database.UPSERT_BACKOFF
+
+
+def test_exhausted_chunk_is_reported_and_the_rest_are_saved(sleeps, capsys):
+    db = manager({"v010": 99})
+    saved = db.upsert_chunked("videos", rows(25), on_conflict="video_id", batch_size=10, max_workers=2, retries=2)
+
+    assert saved == 15
+    assert sorted(db.client.store["videos"]) == [(f"v{i:03d}",) for i in range(25) if not 10 <= i < 20]
+    failed = [r for r in db.last_upsert_report if r["error"]]
+    assert len(failed) == 1
+    assert failed[0]["chunk"] == 1
+    assert failed[0]["saved"] == 0
+    assert failed[0]["attempts"] == 3
+    assert failed[0]["error"] == "timeout on v010"
+    assert db.client.calls.count("v010") == 3
+
+    out = capsys.readouterr().out
+    assert "chunk 1 (10 rows) failed after 3 attempts: timeout on v010" in out
+    assert "Upserted 15/25 videos rows in 3 chunks (1 failed)" in out
+
+
+def test_duplicate_keys_collapse_to_the_last_row_before_chunking(sleeps):
+    db = manager()
+    batch = rows(5) + [{"video_id": "v001", "views": 100}, {"video_id": "v003", "views": 300}]
+    saved = db.upsert_chunked("videos", batch, on_conflict="video_id", batch_size=2, max_workers=1)
+
+    assert saved == 5
+    assert [r["rows"] for r in db.last_upsert_report] == [2, 2, 1]
+    stored = db.client.store["videos"]
+    assert stored[("v001",)]["views"] == 100
+    assert stored[("v003",)]["views"] == 300
+    assert sleeps == []
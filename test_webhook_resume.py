@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from api.local_store import LocalStore
+from api.scraper import TikTokScraper
+from benchmarks.corpus import Corpus
+
+ITEMS = 2500
+PAGE_SIZE = 250
+
+
+class FlakyScraper(TikTokScraper):
+    """Serves a synthetic dataset from memory, failing once when it reaches fail_at"""
+    fail_at = None
+    starts = []
+
+    def __init__(self, token=None):
+        super().__init__(api_token="synthetic")
+
+    async def aiter_dataset_pages(self, dataset_id, page_size=PAGE_SIZE, offset=0):
+        FlakyScraper.starts.append(offset)
+        corpus = Corpus(seed=7, comments_per_video=1)
+        while offset < ITEMS:
+            if offset == FlakyScraper.fail_at:
+                FlakyScraper.fail_at = None
+                raise RuntimeError("dataset read failed")
+            items = list(corpus.items(min(PAGE_SIZE, ITEMS - offset), offset))
+            offset += len(items)
+            yield offset, items
+
+
+@pytest.fixture
+def store(index, monkeypatch):
+    store = LocalStore(":memory:")
+    monkeypatch.setattr(index, "get_storage", lambda: store)
+    monkeypatch.setattr(index, "TikTokScraper", FlakyScraper)
+    FlakyScraper.starts = []
+    yield store
+    store.close()
+
+
+def test_failed_run_resumes_at_checkpoint_and_redelivery_is_skipped(index, store):
+    FlakyScraper.fail_at = 1500
+    with pytest.raises(RuntimeError):
+        asyncio.run(index.process_webhook_results("run-1", "dataset-1", comments_limit=1))
+
+    checkpoint = store.get_ingest_run("run-1")
+    assert checkpoint["status"] == index.RUN_RUNNING
+    assert 0 < checkpoint["dataset_offset"] <= 1500
+
+    result = asyncio.run(index.process_webhook_results("run-1", "dataset-1", comments_limit=1))
+    assert FlakyScraper.starts == [0, checkpoint["dataset_offset"]]
+    assert result["resumed_from"] == checkpoint["dataset_offset"]
+    assert result["offset"] == ITEMS
+    assert result["videos"] == ITEMS
+    assert store.get_ingest_run("run-1")["status"] == index.RUN_DONE
+
+    again = asyncio.run(index.process_webhook_results("run-1", "dataset-1", comments_limit=1))
+    assert again["skipped"] is True
+    assert again["videos"] == ITEMS
+    assert FlakyScraper.starts == [0, checkpoint["dataset_offset"]]
+
+
+@pytest.mark.parametrize("scrape_type, options, cut", [
+    ("Hashtag", {}, False),
+    ("Username", {}, True),
+    ("Username", {"use_watermark": False}, False),
+    ("Hashtag", {"since_date": "2026-06-01"}, True),
+])
+def test_webhook_cutoff_follows_the_request(index, store, scrape_type, options, cut):
+    store.save_watermarks(scrape_type, {"fyp": "2026-06-01 00:00:00"})
+    result = asyncio.run(index.process_webhook_results(
+        f"run-{scrape_type}-{len(options)}", "dataset-1", scrape_type=scrape_type, search_input="fyp", **options
+    ))
+    assert (result["videos"] < ITEMS) is cut
+
+
+class ProfilesScraper(TikTokScraper):
+    """A finished run over several profiles: each profile's videos newest first, one profile after another"""
+    items = []
+
+    def __init__(self, token=None):
+        super().__init__(api_token="synthetic")
+
+    async def aiter_dataset_pages(self, dataset_id, page_size=PAGE_SIZE, offset=0):
+        yield len(self.items), self.items[offset:]
+
+
+def profile_video(video_id, author, day):
+    return {"id": video_id, "text": f"video {video_id}", "authorMeta": {"name": author},
+            "createTime": int(datetime(2026, 6, day, 12).timestamp())}
+
+
+def test_multi_profile_run_is_not_cut_at_the_first_old_video(index, store, monkeypatch):
+    monkeypatch.setattr(index, "TikTokScraper", ProfilesScraper)
+    ProfilesScraper.items = [
+        profile_video("1", "alice", 20), profile_video("2", "alice", 2),
+        profile_video("3", "bob", 21), profile_video("4", "bob", 3),
+    ]
+    result = asyncio.run(index.process_webhook_results(
+        "run-profiles", "dataset-1", scrape_type="Username", search_input="alice, bob", since_date="2026-06-10"
+    ))
+    assert result["videos"] == 2
+    page, _ = store.get_page("videos")
+    assert sorted(page["video_id"]) == ["1", "3"]
+
+    # A single profile is newest first throughout, so its first old video ends the read
+    ProfilesScraper.items = [profile_video("5", "carol", 20), profile_video("6", "carol", 2), profile_video("7", "carol", 25)]
+    result = asyncio.run(index.process_webhook_results(
+        "run-single", "dataset-2", scrape_type="Username", search_input="carol", since_date="2026-06-10"
+    ))
+    assert result["videos"] == 1